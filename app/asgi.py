@@ -5,6 +5,26 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+Deployment with uvicorn, one event loop per process:
+
+    uvicorn app.asgi:application --host 0.0.0.0 --port 8000 \
+        --workers 4 --loop uvloop --http httptools \
+        --limit-concurrency 4000 --backlog 4096 --no-access-log
+
+The async views under /api/async/ keep thousands of requests in flight
+per process. Keep CONN_MAX_AGE at 0 or use a pooler in front of MySQL,
+every request reading with the async ORM opens a connection of its own.
+The row locking service calls share ASYNC_VIEWS['SERVICE_THREADS']
+connections per process, so the database sees at most about
+workers * SERVICE_THREADS of those. The DRF views under /api/ still
+work under uvicorn, each one holding a thread while it runs.
+
+Every client of the balance event stream keeps a request open for as
+long as it listens, and so does a client waiting on the transaction
+change feed. Raise --limit-concurrency by the number of streams and
+waiting polls a process should hold, an idle one costs a task and a
+small buffer.
 """
 
 import os
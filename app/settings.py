@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -137,3 +138,175 @@ AUTH_USER_MODEL = 'core.Seller'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
+
+# Strategy used by RequestService.charge_phone_number:
+#   'locking'     - lock the seller row with SELECT ... FOR UPDATE.
+#   'conditional' - debit with one guarded UPDATE backed by the
+#                   seller_credit_non_negative CHECK constraint.
+CHARGE_MODE = 'locking'
+
+# Maximum number of charges accepted by one bulk charge request.
+BULK_CHARGE_MAX_ITEMS = 1000
+
+# Maximum number of credit requests in one bulk accept or reject call.
+BULK_CREDIT_REQUEST_MAX_ITEMS = 10000
+
+# Opt-in coalescing of concurrent charges of the same seller. A charge
+# arriving while a batch of its seller commits waits WINDOW_MS for others
+# to join, or until MAX_BATCH_SIZE charges are gathered, then the whole
+# batch is committed in one database transaction with a single seller
+# lock. A charge of a seller with nothing committing does not wait.
+CHARGE_COALESCING = {
+    'ENABLED': False,
+    'WINDOW_MS': 3,
+    'MAX_BATCH_SIZE': 50,
+}
+
+# Opt-in sharding of seller credit across CreditBucket rows, see the
+# shard_seller_credit and rebalance_credit_buckets commands. PICK is the
+# order a debit tries the buckets in: 'random' or 'round-robin'. Merge
+# every seller back with `shard_seller_credit <id> 0` before disabling,
+# `manage.py check --database default` and migrate refuse ENABLED False
+# while any seller has buckets.
+CREDIT_BUCKETS = {
+    'ENABLED': False,
+    'PICK': 'random',
+}
+
+# Credit leasing for very hot sellers. Each worker process leases
+# FRACTION of the seller credit and approves charges against it in
+# memory, the ledger rows are written in batches every
+# FLUSH_INTERVAL_MS or FLUSH_BATCH_SIZE charges. Leases are returned
+# after TTL_SECONDS. With WAIT_FOR_FLUSH a charge returns once its
+# ledger row is committed, otherwise the charge APIs answer 202 Accepted
+# with the lease it was approved against, before the row is written.
+CREDIT_LEASING = {
+    'SELLER_IDS': [],
+    'FRACTION': '0.01',
+    'TTL_SECONDS': 30,
+    'FLUSH_INTERVAL_MS': 20,
+    'FLUSH_BATCH_SIZE': 500,
+    'WAIT_FOR_FLUSH': True,
+}
+
+# Idempotency-Key handling of the charge and credit request APIs. Stored
+# responses are cached per process for CACHE_TTL seconds and kept in the
+# database for RETENTION_SECONDS, see the purge_idempotency_keys command.
+# A key claimed by a request that stored no response, because its process
+# died, can be claimed again after LEASE_SECONDS. Keep it above the
+# longest request, a retry taking over a live claim runs the view twice.
+IDEMPOTENCY = {
+    'CACHE_SIZE': 10000,
+    'CACHE_TTL': 300,
+    'RETENTION_SECONDS': 24 * 60 * 60,
+    'LEASE_SECONDS': 60,
+}
+
+# Token -> seller lookups cached by CachedTokenAuthentication. Entries
+# live TTL seconds in a per-process LRU of MAX_SIZE entries, BACKEND may
+# name a cache from CACHES shared by all workers, kept for SHARED_TTL.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 30,
+    'BACKEND': None,
+    'SHARED_TTL': 300,
+}
+
+# Number of ledger rows fetched per query by the transaction export.
+LEDGER_EXPORT_CHUNK_SIZE = 2000
+
+# Balance checkpoints of the seller ledgers, one every INTERVAL
+# transactions. Transactions younger than SETTLE_SECONDS are not
+# checkpointed yet.
+LEDGER_CHECKPOINTS = {
+    'INTERVAL': 1000,
+    'SETTLE_SECONDS': 60,
+}
+
+# The reconcile_credit command. Marks only move over transactions older
+# than SETTLE_SECONDS.
+RECONCILIATION = {
+    'CHUNK_SIZE': 10000,
+    'SETTLE_SECONDS': 60,
+}
+
+# Archive of closed ledger months. archive_ledger exports months older
+# than KEEP_MONTHS to DIRECTORY and may prune them from the hot tables.
+LEDGER_ARCHIVE = {
+    'DIRECTORY': BASE_DIR / 'archive',
+    'KEEP_MONTHS': 3,
+}
+
+# Request metrics served at /metrics, off by default. Timings are
+# recorded for a SAMPLE_RATE fraction of the requests. Every worker
+# process writes its metrics to DIRECTORY at most every FLUSH_SECONDS
+# and /metrics sums the files, set it to a directory shared by the
+# workers of a host and empty it when they restart. None keeps the
+# metrics in the serving process, only fit for a single worker: each
+# scrape would see the worker that served it. TOKEN is the bearer token
+# scrapers must send, without one /metrics answers anyone. `check
+# --deploy` warns about both.
+METRICS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.05,
+    'DIRECTORY': None,
+    'FLUSH_SECONDS': 5,
+    'TOKEN': None,
+}
+
+# Tracking of the sellers waiting most on their row lock, at most
+# CAPACITY sellers are tracked per process. The processes share their
+# sketches through METRICS['DIRECTORY'].
+HOT_SELLERS = {
+    'ENABLED': True,
+    'CAPACITY': 100,
+}
+
+# The async views under /api/async/. Their row locking service calls run
+# in a pool of SERVICE_THREADS threads per process, each holding at most
+# one database connection.
+ASYNC_VIEWS = {
+    'SERVICE_THREADS': 32,
+}
+
+# The transaction change feed. A request to the async feed waits at most
+# MAX_WAIT_SECONDS for new transactions and gets at most MAX_ROWS of
+# them. Only commits of the serving process wake it, commits of other
+# processes are picked up every RECHECK_SECONDS, at the cost of a query
+# per waiting request. Transactions of sellers with credit buckets are
+# held back SHARDED_SETTLE_SECONDS.
+CHANGE_FEED = {
+    'MAX_WAIT_SECONDS': 30,
+    'MAX_ROWS': 500,
+    'RECHECK_SECONDS': 2,
+    'SHARDED_SETTLE_SECONDS': 2,
+}
+
+# Live balance events at /api/async/seller/me/events/. A client gets a
+# comment every HEARTBEAT_SECONDS and is dropped once BUFFER_SIZE events
+# behind. Transactions committed by other processes are published every
+# RECHECK_SECONDS, RECHECK_ROWS at a time, once SETTLE_SECONDS old. None
+# for RECHECK_SECONDS only publishes commits of the serving process.
+BALANCE_EVENTS = {
+    'HEARTBEAT_SECONDS': 15,
+    'BUFFER_SIZE': 64,
+    'RECHECK_SECONDS': 2,
+    'RECHECK_ROWS': 1000,
+    'SETTLE_SECONDS': 1,
+}
+
+# Read replicas of the default database, aliases of DATABASES. List and
+# retrieve of the read APIs and the admin changelists read from them.
+# A seller writing through RequestService reads from the primary for
+# the next PIN_SECONDS, which must exceed the replication lag. Pins are
+# kept per process, at most MAX_PINS, and in the cache named BACKEND so
+# that every worker sees them. BACKEND is required with REPLICAS, the
+# checks refuse to start otherwise.
+REPLICA_ROUTING = {
+    'REPLICAS': [],
+    'PIN_SECONDS': 5,
+    'MAX_PINS': 100000,
+    'BACKEND': None,
+}
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
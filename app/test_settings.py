@@ -0,0 +1,30 @@
+"""
+Settings for running the tests without MySQL.
+
+    python manage.py test --settings=app.test_settings
+
+Two SQLite databases stand in for the primary and a read replica. Under
+test the replica mirrors the primary, like a replica that has caught up,
+and routing to it is turned on by the tests of the replica router.
+"""
+import os
+import tempfile
+
+from app.settings import *  # noqa: F401,F403
+
+_DIRECTORY = tempfile.gettempdir()
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(_DIRECTORY, 'charger.sqlite3'),
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'NAME': os.path.join(_DIRECTORY, 'charger-test.sqlite3')},
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(_DIRECTORY, 'charger-replica.sqlite3'),
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
@@ -20,9 +20,11 @@ from drf_spectacular.views import (
 )
 from django.contrib import admin
 from django.urls import path, include
+from core.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
     path(
         'api/docs/',
@@ -31,4 +33,6 @@ urlpatterns = [
     ),
     path('api/seller/', include('seller.urls')),
     path('api/request/', include('request.urls')),
+    path('api/async/seller/', include('seller.async_urls')),
+    path('api/async/request/', include('request.async_urls')),
 ]
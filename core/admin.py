@@ -1,13 +1,51 @@
 """
 Django admin customization
 """
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.translation import gettext_lazy as _
 from core import models
+from core.routers import is_pinned, pin_to_primary, replica_reads
+from request.contention import HotSellerTracker
+from request.services import RequestService
 
 
-class SellerAdmin(UserAdmin):
+class ReplicaChangeListMixin:
+    """
+    Render the changelist from the read replicas.
+
+    Admins who changed anything in the last PIN_SECONDS read from the
+    primary, so the list they are redirected to shows their change.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET' or is_pinned(request.user.id):
+            if request.method == 'POST':
+                pin_to_primary(request.user.id)
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # the page is rendered here, its queries run in the template.
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+    def changeform_view(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            pin_to_primary(request.user.id)
+        return super().changeform_view(request, *args, **kwargs)
+
+    def delete_view(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            pin_to_primary(request.user.id)
+        return super().delete_view(request, *args, **kwargs)
+
+
+class SellerAdmin(ReplicaChangeListMixin, UserAdmin):
     """Define the admin pages for sellers."""
     ordering = ['id']
     list_display = ['email', 'name', 'about']
@@ -42,23 +80,114 @@ class SellerAdmin(UserAdmin):
         }),
     )
 
+    def get_urls(self):
+        return [
+            path('hot-sellers/',
+                 self.admin_site.admin_view(self.hot_sellers_view),
+                 name='core_seller_hot_sellers'),
+        ] + super().get_urls()
+
+    def hot_sellers_view(self, request):
+        """Show the sellers waiting most on their row lock."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        rows = HotSellerTracker().top(settings.HOT_SELLERS['CAPACITY'])
+        sellers = models.Seller.objects.in_bulk(
+            [row['seller'] for row in rows])
+        for row in rows:
+            row['seller_obj'] = sellers.get(row['seller'])
+        return TemplateResponse(request, 'admin/core/seller/hot_sellers.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': _('Hot sellers'),
+            'rows': rows,
+        })
+
+
+class CreditBucketAdmin(admin.ModelAdmin):
+    list_display = ['seller', 'index', 'credit']
+    ordering = ['seller', 'index']
+
+
+class CreditLeaseAdmin(admin.ModelAdmin):
+    list_display = ['seller', 'owner', 'amount', 'used', 'remaining',
+                    'status', 'created_at', 'expires_at']
+    list_filter = ['status']
+    readonly_fields = ['seller', 'owner', 'amount', 'used', 'status',
+                       'created_at', 'expires_at', 'released_at']
+
+    @admin.display(description=_('Remaining'))
+    def remaining(self, obj):
+        return obj.amount - obj.used
 
-class CreditRequestAdmin(admin.ModelAdmin):
+
+class CreditRequestAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['seller', 'amount', 'status', 'request_time']
+    list_filter = ['status']
+    actions = ['accept_credit_requests', 'reject_credit_requests']
+
+    def report(self, request, results, done):
+        """tell the admin how many requests ended up in each outcome."""
+        processed = sum(isinstance(result, done) for result in results.values())
+        skipped = len(results) - processed
+        self.message_user(request, _(
+            '%(processed)d credit requests processed, %(skipped)d skipped '
+            'as already processed or locked.'
+        ) % {'processed': processed, 'skipped': skipped})
+
+    @admin.action(description=_('Accept selected credit requests'))
+    def accept_credit_requests(self, request, queryset):
+        results = RequestService().bulk_accept_credit_requests(
+            list(queryset.values_list('id', flat=True)))
+        self.report(request, results, models.Transaction)
 
+    @admin.action(description=_('Reject selected credit requests'))
+    def reject_credit_requests(self, request, queryset):
+        results = RequestService().bulk_reject_credit_requests(
+            list(queryset.values_list('id', flat=True)))
+        self.report(request, results, models.CreditRequest)
 
-class ChargeRequestAdmin(admin.ModelAdmin):
+
+class ChargeRequestAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['seller', 'phone_number',
                     'amount', 'request_time']
 
 
-class TransactionAdmin(admin.ModelAdmin):
+class ChargeJobAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ['seller', 'phone_number', 'amount', 'status',
+                    'created_at', 'processed_at']
+    list_filter = ['status']
+
+
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['seller', 'last_transaction_id', 'transaction_time',
+                    'credit']
+
+
+class ReconciliationMarkAdmin(admin.ModelAdmin):
+    list_display = ['seller', 'last_transaction_id', 'credit', 'updated_at']
+
+
+class ArchivedMonthAdmin(admin.ModelAdmin):
+    list_display = ['table', 'month', 'rows', 'path', 'created_at',
+                    'pruned_at']
+    list_filter = ['table']
+
+
+class TransactionAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['seller', 'amount', 'credit_before_transaction',
-                    'credit_after_transaction', 'type', 'detail',
-                    'transaction_time']
+                    'credit_after_transaction', 'type', 'credit_bucket',
+                    'detail', 'transaction_time']
+    raw_id_fields = ['charge_request', 'credit_request']
 
 
 admin.site.register(models.Seller, SellerAdmin)
+admin.site.register(models.CreditBucket, CreditBucketAdmin)
+admin.site.register(models.CreditLease, CreditLeaseAdmin)
 admin.site.register(models.CreditRequest, CreditRequestAdmin)
 admin.site.register(models.ChargeRequest, ChargeRequestAdmin)
 admin.site.register(models.Transaction, TransactionAdmin)
+admin.site.register(models.BalanceCheckpoint, BalanceCheckpointAdmin)
+admin.site.register(models.ReconciliationMark, ReconciliationMarkAdmin)
+admin.site.register(models.ArchivedMonth, ArchivedMonthAdmin)
+admin.site.register(models.ChargeJob, ChargeJobAdmin)
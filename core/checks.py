@@ -0,0 +1,61 @@
+"""
+System checks of the core app settings.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_replica_routing(app_configs, **kwargs):
+    """refuse read replicas without a cache sharing the pins."""
+    config = settings.REPLICA_ROUTING
+    if not config['REPLICAS']:
+        return []
+    alias = config['BACKEND']
+    if alias is None:
+        return [Error(
+            "REPLICA_ROUTING['REPLICAS'] is set without a shared BACKEND.",
+            hint='Pins would only be seen by the worker that wrote, name a '
+                 'cache from CACHES shared by all workers.',
+            id='core.E001',
+        )]
+    if alias not in settings.CACHES:
+        return [Error(
+            f"REPLICA_ROUTING['BACKEND'] names an unknown cache {alias!r}.",
+            id='core.E002',
+        )]
+    if settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"REPLICA_ROUTING['BACKEND'] {alias!r} is not shared by the "
+            'workers.',
+            hint='Use a cache all workers reach, like Redis or Memcached.',
+            id='core.E003',
+        )]
+    return []
+
+
+@register(Tags.security, deploy=True)
+def check_metrics(app_configs, **kwargs):
+    """warn about metrics anyone can scrape or a worker at a time."""
+    config = settings.METRICS
+    if not config['ENABLED']:
+        return []
+    warnings = []
+    if config['TOKEN'] is None:
+        warnings.append(Warning(
+            "METRICS is enabled without a TOKEN, /metrics answers anyone.",
+            id='core.W001',
+        ))
+    if config['DIRECTORY'] is None:
+        warnings.append(Warning(
+            "METRICS is enabled without a DIRECTORY.",
+            hint='Each scrape only sees the worker process serving it, set '
+                 'a directory shared by the workers of the host.',
+            id='core.W002',
+        ))
+    return warnings
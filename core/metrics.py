@@ -0,0 +1,219 @@
+"""
+Request metrics in the Prometheus text format.
+"""
+import bisect
+import contextlib
+import glob
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+# upper bounds of the histogram buckets, per kind of value.
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+HISTOGRAM = 'histogram'
+COUNTER = 'counter'
+
+METRICS = {
+    'http_requests_total': (
+        COUNTER, 'Requests by view, method and status.', None),
+    'http_request_duration_seconds': (
+        HISTOGRAM, 'Wall time of sampled requests.', SECONDS_BUCKETS),
+    'http_request_db_queries': (
+        HISTOGRAM, 'Database queries of sampled requests.', COUNT_BUCKETS),
+    'http_request_db_seconds': (
+        HISTOGRAM, 'Database time of sampled requests.', SECONDS_BUCKETS),
+    'http_request_seller_lock_seconds': (
+        HISTOGRAM, 'Time sampled requests waited for seller row locks.',
+        SECONDS_BUCKETS),
+}
+
+_current = ContextVar('metrics_request', default=None)
+
+
+class RequestMetrics:
+    """The measurements of one sampled request."""
+    __slots__ = ('queries', 'db_seconds', 'lock_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.lock_seconds = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        """a `connection.execute_wrapper` timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+
+def sampling(request_metrics):
+    """make `request_metrics` current, return the token to reset it."""
+    return _current.set(request_metrics)
+
+
+def stop_sampling(token):
+    _current.reset(token)
+
+
+def recording_queries():
+    """
+    return a context manager timing the queries of this thread.
+
+    The queries are added to the request being sampled, if any.
+    """
+    stack = contextlib.ExitStack()
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(
+                request_metrics.record_query))
+    return stack
+
+
+def observe_lock(seller_id, seconds):
+    """a RequestService lock observer adding to the current request."""
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.lock_seconds += seconds
+
+
+class Registry:
+    """
+    The metrics of this process.
+
+    Histograms keep a count per bucket plus the sum and count of the
+    observed values. With METRICS['DIRECTORY'] set every process writes
+    its metrics to a file of its own there at most every FLUSH_SECONDS,
+    and the metrics of all processes are the sum of those files.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._flushed_at = time.monotonic()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0]
+            values[0] += amount
+        self._maybe_flush()
+
+    def observe(self, name, labels, value):
+        bounds = METRICS[name][2]
+        key = (name, labels)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                # one count per bucket and +Inf, then the sum and count.
+                values = self._values[key] = [0] * (len(bounds) + 3)
+            values[bisect.bisect_left(bounds, value)] += 1
+            values[-2] += value
+            values[-1] += 1
+        self._maybe_flush()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _path(self, directory):
+        return os.path.join(directory, f'metrics-{os.getpid()}.json')
+
+    def _maybe_flush(self):
+        config = settings.METRICS
+        if config['DIRECTORY'] is None or \
+                time.monotonic() - self._flushed_at < config['FLUSH_SECONDS']:
+            return
+        self.flush()
+
+    def flush(self):
+        """write the metrics of this process to its file."""
+        directory = settings.METRICS['DIRECTORY']
+        if directory is None:
+            return
+        with self._lock:
+            self._flushed_at = time.monotonic()
+            rows = [[name, list(labels), list(values)]
+                    for (name, labels), values in self._values.items()]
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(directory)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(rows, file)
+        os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        """return the metrics of every process, keyed by (name, labels)."""
+        directory = settings.METRICS['DIRECTORY']
+        if directory is None:
+            with self._lock:
+                return {key: list(values)
+                        for key, values in self._values.items()}
+
+        self.flush()
+        merged = {}
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path) as file:
+                    rows = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, values in rows:
+                if name not in METRICS:
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                total = merged.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+        return merged
+
+    def render(self):
+        """return the metrics of every process in the text format."""
+        by_name = {}
+        for (name, labels), values in self.collect().items():
+            by_name.setdefault(name, []).append((labels, values))
+
+        lines = []
+        for name, (kind, help_text, bounds) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, values in sorted(by_name.get(name, [])):
+                if kind == COUNTER:
+                    lines.append(f'{name}{_labels(labels)} {values[0]}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(bounds + ('+Inf',), values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket'
+                                 f'{_labels(labels + (("le", bound),))} '
+                                 f'{cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {values[-2]}')
+                lines.append(f'{name}_count{_labels(labels)} {values[-1]}')
+        lines.append('# HELP metrics_sample_rate Fraction of requests '
+                     'whose timings are recorded.')
+        lines.append('# TYPE metrics_sample_rate gauge')
+        lines.append(f'metrics_sample_rate {settings.METRICS["SAMPLE_RATE"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"'))
+        for key, value in labels) + '}'
+
+
+registry = Registry()
@@ -0,0 +1,104 @@
+"""
+Middleware shared by the APIs.
+"""
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from core import metrics
+
+
+def _view_name(view_func, method):
+    view_class = getattr(view_func, 'cls', None) \
+        or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None)
+    if actions and method.lower() in actions:
+        return f'{view_class.__name__}.{actions[method.lower()]}'
+    return view_class.__name__
+
+
+class MetricsMiddleware:
+    """
+    Record the metrics of every request by view.
+
+    Every request is counted, the wall time, database queries, database
+    time and seller lock wait are recorded for a SAMPLE_RATE fraction of
+    them so that the overhead stays small under full load. Under ASGI
+    the queries of async views are only seen when they run in the
+    thread pool of the request services.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = settings.METRICS
+        if not config['ENABLED']:
+            return self.get_response(request)
+        if random.random() >= config['SAMPLE_RATE']:
+            response = self.get_response(request)
+            self.count(request, response)
+            return response
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.sampling(request_metrics)
+        started = time.perf_counter()
+        try:
+            with metrics.recording_queries():
+                response = self.get_response(request)
+        finally:
+            metrics.stop_sampling(token)
+        self.observe(request, response, request_metrics,
+                     time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        config = settings.METRICS
+        if not config['ENABLED']:
+            return await self.get_response(request)
+        if random.random() >= config['SAMPLE_RATE']:
+            response = await self.get_response(request)
+            self.count(request, response)
+            return response
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.sampling(request_metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop_sampling(token)
+        self.observe(request, response, request_metrics,
+                     time.perf_counter() - started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = _view_name(view_func, request.method)
+
+    def count(self, request, response):
+        """count the request, return its labels."""
+        labels = (('view', getattr(request, 'metrics_view', 'unmatched')),
+                  ('method', request.method),
+                  ('status', response.status_code))
+        metrics.registry.inc('http_requests_total', labels)
+        return labels
+
+    def observe(self, request, response, request_metrics, seconds):
+        """count a sampled request and record its timings."""
+        labels = self.count(request, response)[:1]
+        registry = metrics.registry
+        registry.observe('http_request_duration_seconds', labels, seconds)
+        registry.observe('http_request_db_queries', labels,
+                         request_metrics.queries)
+        registry.observe('http_request_db_seconds', labels,
+                         request_metrics.db_seconds)
+        registry.observe('http_request_seller_lock_seconds', labels,
+                         request_metrics.lock_seconds)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0015_alter_creditrequest_status'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='seller',
+            constraint=models.CheckConstraint(check=models.Q(('credit__gte', 0)), name='seller_credit_non_negative'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_seller_seller_credit_non_negative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seller',
+            name='credit_bucket_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='credit_bucket',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='type',
+            field=models.CharField(choices=[('Withdraw', 'Withdraw'), ('Deposit', 'Deposit'), ('Transfer', 'Transfer')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='CreditBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_buckets', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='creditbucket',
+            constraint=models.UniqueConstraint(fields=('seller', 'index'), name='credit_bucket_seller_index_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='creditbucket',
+            constraint=models.CheckConstraint(check=models.Q(('credit__gte', 0)), name='credit_bucket_credit_non_negative'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_seller_credit_bucket_count_transaction_credit_bucket_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('used', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('status', models.CharField(choices=[('Active', 'Active'), ('Released', 'Released')], default='Active', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_leases', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['seller', 'status'], name='credit_lease_seller_status_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='creditlease',
+            constraint=models.CheckConstraint(check=models.Q(('used__lte', models.F('amount'))), name='credit_lease_used_within_amount'),
+        ),
+    ]
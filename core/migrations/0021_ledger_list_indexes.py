@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['seller', 'request_time', 'id'], name='creditrequest_seller_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['status', 'request_time'], name='creditrequest_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['request_time', 'id'], name='creditrequest_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['seller', 'transaction_time', 'id'], name='transaction_seller_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_time', 'id'], name='transaction_time_idx'),
+        ),
+    ]
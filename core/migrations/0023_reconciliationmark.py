@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_balancecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('credit', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('chain', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_mark', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_reconciliationmark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='charge_request',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='core.chargerequest'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='credit_request',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='core.creditrequest'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_archivedmonth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seller',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
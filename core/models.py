@@ -1,7 +1,9 @@
 """
 Database models.
 """
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -31,6 +33,11 @@ class SellerManager(BaseUserManager):
 
         return user
 
+    def bump_version(self, *seller_ids):
+        """mark the data shown to sellers as changed."""
+        return self.filter(id__in=seller_ids) \
+            .update(version=models.F('version') + 1)
+
 
 class Seller(AbstractBaseUser, PermissionsMixin):
     """Seller in the system."""
@@ -42,6 +49,10 @@ class Seller(AbstractBaseUser, PermissionsMixin):
                                  null=True,
                                  blank=True,
                                  default=0)
+    credit_bucket_count = models.PositiveSmallIntegerField(default=0)
+    # bumped by changes to the seller's data that write no transaction,
+    # see request.conditional.
+    version = models.PositiveBigIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
@@ -49,6 +60,14 @@ class Seller(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(credit__gte=0),
+                name='seller_credit_non_negative'
+            ),
+        ]
+
     class InsufficientCreditError(Exception):
         def __init__(self, message="Seller credit is insufficient."):
             self.message = message
@@ -58,6 +77,98 @@ class Seller(AbstractBaseUser, PermissionsMixin):
         return self.name
 
 
+class CreditBucket(models.Model):
+    """
+    A slice of a seller's credit.
+
+    Sellers with credit buckets are debited from one bucket at a time,
+    their `Seller.credit` is only an aggregate refreshed on rebalance.
+    """
+    seller = models.ForeignKey('Seller', on_delete=models.CASCADE,
+                               related_name='credit_buckets')
+    index = models.PositiveSmallIntegerField()
+    credit = models.DecimalField(max_digits=10,
+                                 decimal_places=2,
+                                 default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'index'],
+                name='credit_bucket_seller_index_unique'
+            ),
+            models.CheckConstraint(
+                check=models.Q(credit__gte=0),
+                name='credit_bucket_credit_non_negative'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'Credit Bucket - Seller: {self.seller}, '
+            f'Index: {self.index}, '
+            f'Credit: {self.credit}'
+        )
+
+
+class CreditLease(models.Model):
+    """
+    Credit reserved from a seller by one worker process.
+
+    The worker approves charges against the lease in memory and records
+    the credit it has written to the ledger in `used`.
+    """
+    class Status(models.TextChoices):
+        ACTIVE = ('Active', 'Active')
+        RELEASED = ('Released', 'Released')
+
+    seller = models.ForeignKey('Seller', on_delete=models.CASCADE,
+                               related_name='credit_leases')
+    owner = models.CharField(max_length=255)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    used = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.ACTIVE
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(used__lte=models.F('amount')),
+                name='credit_lease_used_within_amount'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'status'],
+                         name='credit_lease_seller_status_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'Credit Lease - Seller: {self.seller}, '
+            f'Owner: {self.owner}, '
+            f'Amount: {self.amount}, '
+            f'Used: {self.used}, '
+            f'Status: {self.get_status_display()}'
+        )
+
+
+class CreditRequestQuerySet(models.QuerySet):
+    """QuerySet of credit requests."""
+
+    def with_transaction(self):
+        """annotate every request with the id of its deposit transaction."""
+        return self.annotate(transaction=models.Subquery(
+            Transaction.objects.filter(credit_request=models.OuterRef('pk'))
+            .order_by('id').values('id')[:1]
+        ))
+
+
 class CreditRequest(models.Model):
     """model for credit requests."""
     class Status(models.TextChoices):
@@ -75,6 +186,18 @@ class CreditRequest(models.Model):
         default=Status.PENDING
     )
 
+    objects = CreditRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['seller', 'request_time', 'id'],
+                         name='creditrequest_seller_time_idx'),
+            models.Index(fields=['status', 'request_time'],
+                         name='creditrequest_status_time_idx'),
+            models.Index(fields=['request_time', 'id'],
+                         name='creditrequest_time_idx'),
+        ]
+
     def __str__(self) -> str:
         return (
             f'Credit Request - Seller: {self.seller}, '
@@ -88,6 +211,11 @@ class CreditRequest(models.Model):
             self.message = message
             super().__init__(self.message)
 
+    class LockedError(Exception):
+        def __init__(self, message="This request is being processed by another transaction."):
+            self.message = message
+            super().__init__(self.message)
+
 
 class ChargeRequest(models.Model):
     """model for charge requests."""
@@ -111,6 +239,7 @@ class Transaction(models.Model):
     class Type(models.TextChoices):
         WITHDRAW = ('Withdraw', 'Withdraw')
         DEPOSIT = ('Deposit', 'Deposit')
+        TRANSFER = ('Transfer', 'Transfer')
 
     seller = models.ForeignKey('seller', on_delete=models.CASCADE)
     amount = models.DecimalField(
@@ -123,9 +252,28 @@ class Transaction(models.Model):
         max_length=10,
         choices=Type.choices
     )
+    credit_bucket = models.PositiveSmallIntegerField(null=True, blank=True)
+    charge_request = models.ForeignKey('ChargeRequest',
+                                       on_delete=models.SET_NULL,
+                                       null=True,
+                                       blank=True,
+                                       related_name='transactions')
+    credit_request = models.ForeignKey('CreditRequest',
+                                       on_delete=models.SET_NULL,
+                                       null=True,
+                                       blank=True,
+                                       related_name='transactions')
     detail = models.TextField()
     transaction_time = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['seller', 'transaction_time', 'id'],
+                         name='transaction_seller_time_idx'),
+            models.Index(fields=['transaction_time', 'id'],
+                         name='transaction_time_idx'),
+        ]
+
     def __str__(self) -> str:
         return (
             f'Transaction Type: {self.get_type_display()}, '
@@ -135,3 +283,156 @@ class Transaction(models.Model):
             f'Detail: {self.detail}, '
             f'Transaction Time: {self.transaction_time}'
         )
+
+
+class BalanceCheckpoint(models.Model):
+    """The ledger balance of a seller right after one of its transactions."""
+    seller = models.ForeignKey('seller', on_delete=models.CASCADE,
+                               related_name='balance_checkpoints')
+    last_transaction_id = models.BigIntegerField()
+    transaction_time = models.DateTimeField()
+    credit = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'last_transaction_id'],
+                name='balance_checkpoint_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'transaction_time'],
+                         name='balance_checkpoint_time_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'Balance Checkpoint - Seller: {self.seller}, '
+            f'Last Transaction: {self.last_transaction_id}, '
+            f'Credit: {self.credit}'
+        )
+
+
+class ReconciliationMark(models.Model):
+    """
+    How far the ledger of a seller has been reconciled.
+
+    `credit` is the ledger balance right after `last_transaction_id`,
+    `chain` the credit_after_transaction of the last row per credit bucket.
+    """
+    seller = models.OneToOneField('seller', on_delete=models.CASCADE,
+                                  related_name='reconciliation_mark')
+    last_transaction_id = models.BigIntegerField(default=0)
+    credit = models.DecimalField(max_digits=10, decimal_places=2,
+                                 null=True, blank=True)
+    chain = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return (
+            f'Reconciliation Mark - Seller: {self.seller}, '
+            f'Last Transaction: {self.last_transaction_id}'
+        )
+
+
+class ArchivedMonth(models.Model):
+    """A closed month of a ledger table exported to an archive file."""
+    class Table(models.TextChoices):
+        TRANSACTION = ('transaction', 'Transaction')
+        CHARGE_REQUEST = ('chargerequest', 'Charge Request')
+
+    table = models.CharField(max_length=20, choices=Table.choices)
+    month = models.DateField()
+    path = models.CharField(max_length=255)
+    rows = models.PositiveIntegerField()
+    first_id = models.BigIntegerField(null=True, blank=True)
+    last_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    pruned_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table', 'month'],
+                name='archived_month_unique'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'Archived Month - Table: {self.get_table_display()}, '
+            f'Month: {self.month:%Y-%m}, '
+            f'Rows: {self.rows}'
+        )
+
+
+class ChargeJob(models.Model):
+    """A charge accepted by the API and waiting for a charge worker."""
+    class Status(models.TextChoices):
+        QUEUED = ('Queued', 'Queued')
+        PROCESSING = ('Processing', 'Processing')
+        SUCCEEDED = ('Succeeded', 'Succeeded')
+        FAILED = ('Failed', 'Failed')
+
+    seller = models.ForeignKey('seller', on_delete=models.CASCADE)
+    phone_number = models.CharField(max_length=20)
+    amount = models.DecimalField(
+        max_digits=10, decimal_places=2)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED
+    )
+    transaction = models.ForeignKey('transaction',
+                                    on_delete=models.SET_NULL,
+                                    null=True,
+                                    blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'],
+                         name='charge_job_status_id_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'Charge Job - Seller: {self.seller}, '
+            f'Phone Number: {self.phone_number}, '
+            f'Amount: {self.amount}, '
+            f'Status: {self.get_status_display()}'
+        )
+
+
+class IdempotencyKey(models.Model):
+    """The response stored for a client supplied Idempotency-Key."""
+    seller = models.ForeignKey('seller', on_delete=models.CASCADE)
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True,
+                                     encoder=DjangoJSONEncoder)
+    # when the request processing the key claimed it, a claim without a
+    # response is taken over after IDEMPOTENCY['LEASE_SECONDS'].
+    claimed_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'scope', 'key'],
+                name='idempotency_key_unique'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f'Idempotency Key - Seller: {self.seller}, '
+            f'Scope: {self.scope}, '
+            f'Key: {self.key}'
+        )
@@ -0,0 +1,111 @@
+"""
+Routing of reads to the read replicas of the default database.
+"""
+import contextlib
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from core.cache import LRUCache
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pins = LRUCache(settings.REPLICA_ROUTING['MAX_PINS'],
+                 settings.REPLICA_ROUTING['PIN_SECONDS'])
+
+
+def _shared_cache():
+    """return the shared cache backend, if one is configured."""
+    alias = settings.REPLICA_ROUTING['BACKEND']
+    return caches[alias] if alias else None
+
+
+def _shared_key(seller_id):
+    return f'replica-pin:{seller_id}'
+
+
+def pin_to_primary(*seller_ids):
+    """read the data of `seller_ids` from the primary for a while."""
+    config = settings.REPLICA_ROUTING
+    if not config['REPLICAS']:
+        return
+    for seller_id in seller_ids:
+        _pins.set(seller_id, True)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set_many({_shared_key(seller_id): True
+                         for seller_id in seller_ids}, config['PIN_SECONDS'])
+
+
+def is_pinned(seller_id):
+    """return whether the seller wrote in the last PIN_SECONDS."""
+    if _pins.get(seller_id):
+        return True
+    shared = _shared_cache()
+    return shared is not None and bool(shared.get(_shared_key(seller_id)))
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """route the reads in the block to the replicas."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads to REPLICA_ROUTING['REPLICAS'] inside replica_reads().
+
+    Everything else stays on the primary: writes, SELECT ... FOR UPDATE,
+    which Django routes as a write, and reads in a transaction of the
+    primary, which must see its own writes. Replicas are never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_ROUTING['REPLICAS']
+        if not replicas or not _replica_reads.get() \
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_ROUTING['REPLICAS']:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Serve the `replica_actions` of a viewset from the read replicas.
+
+    Authentication runs on the primary, a token created a moment ago may
+    not have reached the replicas. Sellers who wrote through
+    RequestService in the last PIN_SECONDS are served from the primary,
+    so they always see their own writes.
+    """
+    replica_actions = ('list', 'retrieve')
+    _replica_token = None
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                _replica_reads.reset(self._replica_token)
+                self._replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not (
+                request.user.is_authenticated
+                and is_pinned(request.user.id)):
+            self._replica_token = _replica_reads.set(True)
@@ -1,11 +1,13 @@
 """
 Tests for the Django admin modifications.
 """
-
+from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
+from core.models import CreditRequest
+from request.contention import HotSellerTracker
 
 
 class AdminSiteTests(TestCase):
@@ -58,3 +60,35 @@ class AdminSiteTests(TestCase):
         self.assertContains(res, 'Password')
         self.assertContains(res, 'Password confirmation')
         self.assertContains(res, 'About')
+
+    def test_accept_credit_requests_action(self):
+        """Test accepting credit requests from the changelist."""
+        self.user.credit = Decimal('0')
+        self.user.save()
+        credit_requests = [
+            CreditRequest.objects.create(seller=self.user,
+                                         amount=Decimal('5.00'))
+            for _ in range(2)]
+        url = reverse('admin:core_creditrequest_changelist')
+
+        res = self.client.post(url, {
+            'action': 'accept_credit_requests',
+            '_selected_action': [r.id for r in credit_requests],
+        })
+
+        self.assertEqual(res.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.credit, Decimal('10.00'))
+
+    def test_hot_sellers_page(self):
+        """Test the hot sellers page lists contended sellers."""
+        tracker = HotSellerTracker()
+        tracker.clear()
+        tracker.observe(self.user.id, 0.02)
+        url = reverse('admin:core_seller_hot_sellers')
+
+        res = self.client.get(url)
+
+        tracker.clear()
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, self.user.email)
@@ -0,0 +1,40 @@
+"""
+Tests for in-process caches.
+"""
+from unittest import mock
+from django.test import SimpleTestCase
+from core.cache import LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+    """Test the LRU cache."""
+
+    def test_least_recently_used_evicted(self):
+        """Test the oldest unused entry is evicted when full."""
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        """Test entries are gone after the ttl."""
+        cache = LRUCache(max_size=2, ttl=10)
+        with mock.patch('core.cache.time.monotonic', return_value=100):
+            cache.set('a', 1)
+        with mock.patch('core.cache.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get('a'))
+
+        self.assertEqual(len(cache), 0)
+
+    def test_delete(self):
+        """Test deleting an entry."""
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.delete('a')
+
+        self.assertIsNone(cache.get('a'))
@@ -0,0 +1,135 @@
+"""
+Tests for the request metrics.
+"""
+import json
+import os
+import tempfile
+from decimal import Decimal
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core import metrics
+from core.checks import check_metrics
+from core.models import Seller
+
+METRICS_URL = reverse('metrics')
+CHARGE_URL = reverse('request:charge-phone-number')
+
+
+def metrics_settings(**overrides):
+    return override_settings(METRICS={
+        'ENABLED': True,
+        'SAMPLE_RATE': 1.0,
+        'DIRECTORY': None,
+        'FLUSH_SECONDS': 5,
+        'TOKEN': None,
+        **overrides,
+    })
+
+
+@metrics_settings()
+class RegistryTests(SimpleTestCase):
+    """Test the metrics registry."""
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_render_histogram(self):
+        """Test histograms are rendered with cumulative buckets."""
+        labels = (('view', 'ChargePhoneNumberViewSet'),)
+        self.registry.observe('http_request_duration_seconds', labels, 0.003)
+        self.registry.observe('http_request_duration_seconds', labels, 0.2)
+
+        text = self.registry.render()
+
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_duration_seconds_bucket{view='
+                      '"ChargePhoneNumberViewSet",le="0.0025"} 0', text)
+        self.assertIn('http_request_duration_seconds_bucket{view='
+                      '"ChargePhoneNumberViewSet",le="0.005"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view='
+                      '"ChargePhoneNumberViewSet",le="+Inf"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{view='
+                      '"ChargePhoneNumberViewSet"} 2', text)
+
+    def test_processes_are_summed(self):
+        """Test the files of all processes are summed."""
+        labels = (('view', 'MeView'), ('method', 'GET'), ('status', 200))
+        with tempfile.TemporaryDirectory() as directory, \
+                metrics_settings(DIRECTORY=directory):
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as file:
+                json.dump([['http_requests_total',
+                            [list(label) for label in labels], [5]]], file)
+            self.registry.inc('http_requests_total', labels, 2)
+
+            text = self.registry.render()
+
+        self.assertIn('http_requests_total{view="MeView",method="GET",'
+                      'status="200"} 7', text)
+
+
+@metrics_settings()
+class MetricsMiddlewareTests(TestCase):
+    """Test the metrics middleware and endpoint."""
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.seller = Seller.objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def charge(self):
+        return self.client.post(CHARGE_URL, {
+            'phone_number': '+989114412191', 'amount': '1.00'})
+
+    def test_sampled_request(self):
+        """Test a sampled request records its timings by view."""
+        self.charge()
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('http_requests_total{view="ChargePhoneNumberViewSet",'
+                      'method="POST",status="200"} 1', text)
+        self.assertIn('http_request_seller_lock_seconds_count'
+                      '{view="ChargePhoneNumberViewSet"} 1', text)
+        self.assertNotIn('http_request_db_queries_bucket'
+                         '{view="ChargePhoneNumberViewSet",le="+Inf"} 0',
+                         text)
+
+    @metrics_settings(SAMPLE_RATE=0.0)
+    def test_unsampled_request(self):
+        """Test requests that are not sampled are only counted."""
+        self.charge()
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('http_requests_total{view="ChargePhoneNumberViewSet",'
+                      'method="POST",status="200"} 1', text)
+        self.assertNotIn('http_request_duration_seconds_count', text)
+
+    @metrics_settings(ENABLED=False)
+    def test_disabled(self):
+        """Test the endpoint is not served while metrics are off."""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_deploy_check(self):
+        """Test scrapes without a token or a shared directory are flagged."""
+        self.assertEqual(
+            [warning.id for warning in check_metrics(None)],
+            ['core.W001', 'core.W002'])
+        with metrics_settings(TOKEN='secret', DIRECTORY='/tmp/metrics'):
+            self.assertEqual(check_metrics(None), [])
+
+    @metrics_settings(TOKEN='secret')
+    def test_token_required(self):
+        """Test the endpoint asks for the scrape token when one is set."""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 401)
+
+        res = self.client.get(METRICS_URL,
+                              HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
@@ -1,6 +1,7 @@
 """
 Tests for models.
 """
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
@@ -56,6 +57,14 @@ class ModelTests(TestCase):
         self.assertTrue(seller.is_superuser)
         self.assertTrue(seller.is_staff)
 
+    def test_seller_credit_can_not_be_negative(self):
+        """Test the database rejects a negative seller credit."""
+        seller = create_seller()
+        seller.credit = Decimal('-0.01')
+
+        with self.assertRaises(IntegrityError):
+            seller.save()
+
     def test_create_credit_request(self):
         """Test creating a credit request successfull."""
         seller = create_seller()
@@ -0,0 +1,143 @@
+"""
+Tests for the read replica router.
+"""
+from decimal import Decimal
+from unittest import skipUnless
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core import routers
+from core.checks import check_replica_routing
+from core.models import Seller
+from request.services import RequestService
+from seller import authentication
+
+TRANSACTION_URL = reverse('request:transaction-list')
+CHANGES_URL = reverse('request:transaction-changes')
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, 'needs a replica database, see app/test_settings.py')
+@override_settings(REPLICA_ROUTING={'REPLICAS': ['replica'],
+                                    'PIN_SECONDS': 5, 'MAX_PINS': 100,
+                                    'BACKEND': None})
+class ReplicaRouterTests(TransactionTestCase):
+    """Test reads are sent to the replica and writes to the primary."""
+    # the test runner sets up every database named here, skipped or not.
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        routers._pins.clear()
+        self.seller = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def get(self, url):
+        """return the response and the number of queries per database."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, len(primary), len(replica)
+
+    def test_routing(self):
+        """Test only plain reads in replica_reads() use the replica."""
+        self.assertEqual(Seller.objects.all().db, 'default')
+        with routers.replica_reads():
+            self.assertEqual(Seller.objects.all().db, 'replica')
+            self.assertEqual(Seller.objects.select_for_update().db,
+                             'default')
+            with transaction.atomic():
+                self.assertEqual(Seller.objects.all().db, 'default')
+        self.assertEqual(Seller.objects.all().db, 'default')
+
+    def test_list_reads_from_replica(self):
+        """Test the transaction list is served by the replica."""
+        _, primary, replica = self.get(TRANSACTION_URL)
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_authentication_reads_from_primary(self):
+        """Test the token is looked up on the primary, the list on replica."""
+        token = Token.objects.create(user=self.seller)
+        authentication._tokens.clear()
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            res = self.client.get(TRANSACTION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(any('authtoken_token' in query['sql']
+                            for query in primary.captured_queries))
+        self.assertFalse(any('authtoken_token' in query['sql']
+                             for query in replica.captured_queries))
+        self.assertGreater(len(replica), 0)
+
+    def test_writer_reads_from_primary(self):
+        """Test a seller who just charged reads their charge on the primary."""
+        transaction_obj = RequestService().charge_phone_number(
+            self.seller.id, '+989120000000', Decimal('1.00'))
+
+        res, primary, replica = self.get(TRANSACTION_URL)
+
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+        self.assertEqual(res.data['results'][0]['id'], transaction_obj.id)
+
+    def test_other_actions_read_from_primary(self):
+        """Test actions besides list and retrieve use the primary."""
+        _, primary, replica = self.get(CHANGES_URL)
+
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_admin_changelist(self):
+        """Test the admin changelist is rendered from the replica."""
+        admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testadmin123')
+        self.client.force_login(admin_user)
+        url = reverse('admin:core_transaction_changelist')
+
+        _, _, replica = self.get(url)
+        self.assertGreater(replica, 0)
+
+        self.client.post(url, {'action': 'delete_selected',
+                               '_selected_action': []})
+        _, _, replica = self.get(url)
+        self.assertEqual(replica, 0)
+
+
+class ReplicaRoutingCheckTests(SimpleTestCase):
+    """Test the replicas are refused without a shared pin cache."""
+
+    def check(self, **config):
+        routing = {'REPLICAS': ['replica'], 'PIN_SECONDS': 5,
+                   'MAX_PINS': 100, 'BACKEND': None, **config}
+        caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://localhost:6379'},
+        }
+        with override_settings(REPLICA_ROUTING=routing, CACHES=caches):
+            return [error.id for error in check_replica_routing(None)]
+
+    def test_check(self):
+        """Test BACKEND must name a cache shared by the workers."""
+        self.assertEqual(self.check(REPLICAS=[]), [])
+        self.assertEqual(self.check(), ['core.E001'])
+        self.assertEqual(self.check(BACKEND='missing'), ['core.E002'])
+        self.assertEqual(self.check(BACKEND='default'), ['core.E003'])
+        self.assertEqual(self.check(BACKEND='shared'), [])
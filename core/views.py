@@ -0,0 +1,27 @@
+"""
+Views shared by the APIs.
+"""
+import hmac
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+from core import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Serve the request metrics of every worker in the Prometheus format.
+
+    When METRICS['TOKEN'] is set scrapers must send it as a bearer token.
+    """
+    if not settings.METRICS['ENABLED']:
+        raise Http404
+    token = settings.METRICS['TOKEN']
+    if token is not None:
+        expected = f'Bearer {token}'
+        if not hmac.compare_digest(
+                request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    return HttpResponse(metrics.registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class RequestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'request'
+
+    def ready(self):
+        from request import checks  # noqa: F401
+        from core import metrics
+        from request.contention import HotSellerTracker
+        from request.services import RequestService
+        service = RequestService()
+        service.add_lock_observer(metrics.observe_lock)
+        service.add_lock_observer(HotSellerTracker().observe)
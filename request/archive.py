@@ -0,0 +1,162 @@
+"""Archive of closed ledger months."""
+import gzip
+import json
+import os
+from datetime import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from core.models import (
+    ArchivedMonth,
+    BalanceCheckpoint,
+    ChargeRequest,
+    Transaction
+)
+from request import export
+from request.ledger import LedgerService
+
+TABLES = {
+    ArchivedMonth.Table.TRANSACTION: (
+        Transaction, 'transaction_time', export.EXPORT_FIELDS),
+    ArchivedMonth.Table.CHARGE_REQUEST: (
+        ChargeRequest, 'request_time',
+        ['id', 'seller_id', 'phone_number', 'amount', 'request_time']),
+}
+
+
+class ArchiveMismatchError(Exception):
+    def __init__(self, message="The table no longer matches its archive file, archive the month again."):
+        self.message = message
+        super().__init__(self.message)
+
+
+def month_start(year, month):
+    """return the first instant of a month in the current timezone."""
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return timezone.make_aware(datetime(year, month, 1))
+
+
+def month_range(month):
+    """return the [start, end) bounds of the month of date `month`."""
+    return (month_start(month.year, month.month),
+            month_start(month.year, month.month + 1))
+
+
+def month_rows(table, month):
+    """return the rows of `table` in the month of date `month`."""
+    model, time_field, _ = TABLES[table]
+    start, end = month_range(month)
+    return model.objects.filter(**{f'{time_field}__gte': start,
+                                   f'{time_field}__lt': end})
+
+
+def archive_month(table, month, chunk_size):
+    """
+    Export a month of `table` to a gzipped NDJSON file.
+
+    The file is written next to its final path and renamed once complete,
+    so an archive file is never seen half written.
+    """
+    _, time_field, fields = TABLES[table]
+    directory = settings.LEDGER_ARCHIVE['DIRECTORY'] / table
+    os.makedirs(directory, exist_ok=True)
+    path = directory / f'{month:%Y-%m}.ndjson.gz'
+
+    stats = {'rows': 0, 'first_id': None, 'last_id': None}
+
+    def tracked(rows):
+        for row in rows:
+            stats['rows'] += 1
+            stats['first_id'] = min(stats['first_id'] or row['id'], row['id'])
+            stats['last_id'] = max(stats['last_id'] or row['id'], row['id'])
+            yield row
+
+    rows = export.iter_rows(month_rows(table, month), chunk_size,
+                            fields, time_field)
+    with open(f'{path}.tmp', 'wb') as file:
+        for chunk in export.gzipped(export.buffered(
+                export.iter_ndjson(tracked(rows)))):
+            file.write(chunk)
+    os.replace(f'{path}.tmp', path)
+
+    archived, _ = ArchivedMonth.objects.update_or_create(
+        table=table, month=month,
+        defaults={'path': str(path), **stats}
+    )
+    return archived
+
+
+def _checkpoint_boundary(month):
+    """
+    checkpoint every seller at its last transaction of the month.
+
+    The checkpoints inside the month are dropped, they would replay
+    transactions that are about to be pruned.
+    """
+    service = LedgerService()
+    rows = month_rows(ArchivedMonth.Table.TRANSACTION, month)
+    kept = []
+    for seller_id, last_id in rows.values('seller_id') \
+            .annotate(last_id=Max('id')).values_list('seller_id', 'last_id'):
+        transaction_time = Transaction.objects.values_list(
+            'transaction_time', flat=True).get(id=last_id)
+        checkpoint, _ = BalanceCheckpoint.objects.get_or_create(
+            seller_id=seller_id,
+            last_transaction_id=last_id,
+            defaults={
+                'transaction_time': transaction_time,
+                'credit': service.get_credit_at(seller_id, transaction_time),
+            }
+        )
+        kept.append(checkpoint.id)
+
+    start, end = month_range(month)
+    BalanceCheckpoint.objects.filter(
+        transaction_time__gte=start, transaction_time__lt=end
+    ).exclude(id__in=kept).delete()
+
+
+def prune_month(archived, chunk_size):
+    """
+    Delete the rows of an archived month from the hot table.
+
+    Rows are deleted in chunks of `chunk_size`, each in its own database
+    transaction, so no delete holds locks for long.
+    """
+    model, _, _ = TABLES[archived.table]
+    rows = month_rows(archived.table, archived.month)
+    if rows.count() != archived.rows:
+        raise ArchiveMismatchError
+
+    if archived.table == ArchivedMonth.Table.TRANSACTION:
+        _checkpoint_boundary(archived.month)
+
+    while True:
+        ids = list(rows.order_by('id').values_list('id', flat=True)
+                   [:chunk_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            model.objects.filter(id__in=ids).delete()
+
+    archived.pruned_at = timezone.now()
+    archived.save(update_fields=['pruned_at'])
+    return archived
+
+
+def find_archived(table, pk):
+    """
+    return the archived row `pk` of `table`, or None.
+
+    Only the files whose id range covers `pk` are read. Rows are written
+    with their id first, so lines are matched without parsing them.
+    """
+    prefix = json.dumps({'id': pk})[:-1] + ','
+    for archived in ArchivedMonth.objects.filter(
+            table=table, first_id__lte=pk, last_id__gte=pk).order_by('month'):
+        with gzip.open(archived.path, 'rt') as file:
+            for line in file:
+                if line.startswith(prefix):
+                    return json.loads(line)
+    return None
@@ -0,0 +1,25 @@
+"""
+URL mapping for the async request API.
+"""
+from django.urls import path
+from request import async_views
+
+app_name = 'async-request'
+
+urlpatterns = [
+    path('credit-request',
+         async_views.CreateCreditRequestView.as_view(),
+         name='credit-request'),
+    path('charge-phone-number',
+         async_views.ChargePhoneNumberView.as_view(),
+         name='charge-phone-number'),
+    path('transaction/',
+         async_views.TransactionView.as_view(),
+         name='transaction-list'),
+    path('transaction/changes/',
+         async_views.TransactionChangesView.as_view(),
+         name='transaction-changes'),
+    path('transaction/<int:pk>/',
+         async_views.TransactionView.as_view(),
+         name='transaction-detail'),
+]
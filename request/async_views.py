@@ -0,0 +1,246 @@
+"""
+Async views of the charge, credit request and read APIs.
+
+They answer the same requests as their DRF counterparts in
+request.views, served under /api/async/ by an ASGI server, see
+app/asgi.py. Reads use the async ORM. The atomic parts of RequestService
+hold row locks in a transaction, they run in a thread pool of
+ASYNC_VIEWS['SERVICE_THREADS'] threads that bounds the database
+connections they use, however many requests are in flight.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.fields import FloatField, IntegerField
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from core import metrics
+from core.models import (
+    Seller,
+    Transaction
+)
+from request import serializers
+from request.buckets import CreditBucketService
+from request.changes import TransactionFeed, get_changes
+from request.idempotency import aidempotent
+from request.leasing import PendingCharge
+from request.pagination import TransactionPagination
+from request.read_serializers import ValuesSerializer
+from request.services import RequestService
+from seller.authentication import CachedTokenAuthentication
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_VIEWS['SERVICE_THREADS'],
+                thread_name_prefix='async-service')
+        return _pool
+
+
+def _call(func, args):
+    """run `func` in a pool thread like a request of its own."""
+    close_old_connections()
+    try:
+        with metrics.recording_queries():
+            return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args):
+    """
+    Run a blocking call in the service thread pool and wait for it.
+
+    The call sees the context variables of the caller, so the metrics of
+    the request being sampled include its queries and lock waits.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_pool(), functools.partial(context.run, _call, func, args))
+
+
+class AsyncAPIView(View):
+    """
+    A token authenticated JSON view with async handlers.
+
+    Handlers get a DRF Request for its parsed data and query params, and
+    return `(data, status)` or a response of their own. APIExceptions are
+    answered like DRF does.
+    """
+    http_method_names = ['get', 'post']
+    authentication = CachedTokenAuthentication()
+    renderer = JSONRenderer()
+    serializer_class = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if request.method.lower() not in self.http_method_names \
+                or handler is None:
+            response = self.render(
+                {'detail': f'Method "{request.method}" not allowed.'},
+                status.HTTP_405_METHOD_NOT_ALLOWED)
+            response['Allow'] = ', '.join(self._allowed_methods())
+            return response
+
+        request = Request(request, parsers=[JSONParser()])
+        try:
+            identity = await self.authentication.aauthenticate(request)
+            if identity is None:
+                raise exceptions.NotAuthenticated
+            request.user, request.auth = identity
+            result = await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = self.render(self.error_data(exc), exc.status_code)
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = self.authentication.keyword
+            return response
+        if isinstance(result, HttpResponseBase):
+            return result
+        return self.render(*result)
+
+    def error_data(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            return exc.detail
+        return {'detail': exc.detail}
+
+    def render(self, data, response_status):
+        return HttpResponse(self.renderer.render(data),
+                            status=response_status,
+                            content_type='application/json')
+
+
+class ChargePhoneNumberView(AsyncAPIView):
+    serializer_class = serializers.ChargePhoneNumberSerializer
+    # retries may switch between this view and the DRF one.
+    idempotency_scope = 'ChargePhoneNumberViewSet'
+
+    @aidempotent
+    async def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid(raise_exception=True):
+            phone_number = serializer.validated_data['phone_number']
+            amount = serializer.validated_data['amount']
+            try:
+                return await run_in_pool(self.charge, request.user.id,
+                                         phone_number, amount)
+            except Seller.InsufficientCreditError:
+                response = {
+                    'error': 'Insufficient credit.',
+                    'message': 'The requested process requires more credit than available.'
+                }
+                return response, status.HTTP_402_PAYMENT_REQUIRED
+
+    def charge(self, seller_id, phone_number, amount):
+        transaction = RequestService().charge_phone_number(
+            seller_id, phone_number, amount)
+        if isinstance(transaction, PendingCharge):
+            return serializers.PendingChargeSerializer(transaction).data, \
+                status.HTTP_202_ACCEPTED
+        return self.serializer_class(transaction).data, status.HTTP_200_OK
+
+
+class CreateCreditRequestView(AsyncAPIView):
+    serializer_class = serializers.CreateCreditRequestSerializer
+    idempotency_scope = 'CreateCreditRequestViewSet'
+
+    @aidempotent
+    async def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid(raise_exception=True):
+            credit_request = await RequestService().acreate_credit_request(
+                request.user, serializer.validated_data['amount'])
+            output_serializer = self.serializer_class(credit_request)
+            return output_serializer.data, status.HTTP_201_CREATED
+
+
+class TransactionView(AsyncAPIView):
+    """List the transactions of a seller or retrieve one of them."""
+    serializer_class = serializers.TransactionSerializer
+    pagination_class = TransactionPagination
+    fields_query_param = 'fields'
+
+    def get_queryset(self, request):
+        if request.user.is_staff:
+            return Transaction.objects.all()
+        return Transaction.objects.filter(seller=request.user)
+
+    def get_values_serializer(self, request):
+        fields = request.query_params.get(self.fields_query_param)
+        if fields is not None:
+            fields = [name for name in fields.split(',') if name]
+        return ValuesSerializer(self.serializer_class, fields,
+                                {'request': request})
+
+    async def get(self, request, pk=None):
+        serializer = self.get_values_serializer(request)
+        columns = dict.fromkeys(['id', *serializer.columns,
+                                 self.pagination_class.time_field])
+        queryset = self.get_queryset(request).values(*columns)
+
+        if pk is not None:
+            try:
+                row = await queryset.aget(id=pk)
+            except Transaction.DoesNotExist:
+                raise exceptions.NotFound
+            return serializer.to_representation(row), status.HTTP_200_OK
+
+        paginator = self.pagination_class()
+        rows = await paginator.apaginate_queryset(queryset, request)
+        return {
+            'next': paginator.get_next_link(),
+            'results': serializer.many(rows),
+        }, status.HTTP_200_OK
+
+
+class TransactionChangesView(TransactionView):
+    """
+    Return the seller's transactions after the `since` cursor.
+
+    When there are none yet, wait up to `wait` seconds for new ones.
+    `next` is the cursor to ask for the following ones with. A waiting
+    request holds neither a thread nor a database connection.
+    """
+    http_method_names = ['get']
+
+    async def get(self, request):
+        config = settings.CHANGE_FEED
+        since = IntegerField(min_value=0).run_validation(
+            request.query_params.get('since', 0))
+        wait = FloatField(
+            min_value=0, max_value=config['MAX_WAIT_SECONDS']
+        ).run_validation(request.query_params.get('wait', 0))
+
+        serializer = self.get_values_serializer(request)
+        seller_id = request.user.id
+        sharded = await run_in_pool(CreditBucketService().is_sharded,
+                                    seller_id)
+
+        async def fetch():
+            return await run_in_pool(get_changes, seller_id, since,
+                                     serializer.columns, sharded)
+
+        rows = await TransactionFeed().wait_for(seller_id, fetch, wait)
+        return {
+            'next': rows[-1]['id'] if rows else since,
+            'results': serializer.many(rows),
+        }, status.HTTP_200_OK
@@ -0,0 +1,269 @@
+"""Services for sellers whose credit is sharded across credit buckets."""
+import itertools
+import random
+from decimal import Decimal, ROUND_DOWN
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Sum
+from core.models import (
+    Seller,
+    CreditBucket,
+    ChargeRequest,
+    Transaction
+)
+from request.changes import transactions_written
+from request.locks import timed_lock
+
+CENT = Decimal('0.01')
+
+
+def split_credit(total, count):
+    """split `total` into `count` shares that differ by at most a cent."""
+    share = (total / count).quantize(CENT, rounding=ROUND_DOWN)
+    shares = [share] * count
+    remainder = total - share * count
+    for index in range(int(remainder / CENT)):
+        shares[index] += CENT
+    return shares
+
+
+class CreditBucketService:
+    """
+    A singleton service providing methods for
+        - Sharding seller credit across credit buckets
+        - Depositing to and withdrawing from a single bucket
+        - Rebalancing the buckets of a seller.
+
+    Moving credit between buckets is recorded with Transfer transactions,
+    so the credit_before/credit_after chain holds per bucket.
+    """
+    _instance = None
+    _round_robin = itertools.count()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CreditBucketService, cls).__new__(cls)
+        return cls._instance
+
+    def is_sharded(self, seller_id):
+        """
+        return whether the seller credit lives in credit buckets.
+
+        Like the deposit paths this only looks at credit_bucket_count,
+        CREDIT_BUCKETS['ENABLED'] gates sharding more sellers, not the
+        buckets that already exist.
+        """
+        return Seller.objects.filter(id=seller_id) \
+            .values_list('credit_bucket_count', flat=True).get() > 0
+
+    def _lock_seller(self, seller_id):
+        """
+        lock the seller row.
+
+        Paths that lock credit buckets and touch the seller row lock the
+        seller first, so they queue up in the same order as
+        shard_seller_credit and RequestService.
+        """
+        return Seller.objects.get_queryset() \
+            .filter(id=seller_id).select_for_update().get()
+
+    def get_credit(self, seller_id):
+        """return the sum of the seller's credit buckets."""
+        return CreditBucket.objects.filter(seller_id=seller_id) \
+            .aggregate(credit=Sum('credit'))['credit'] or Decimal('0')
+
+    def shard_seller_credit(self, seller_id, bucket_count):
+        """
+        Split the seller credit across `bucket_count` buckets.
+
+        A count of zero merges the buckets back into the seller row.
+        """
+        if bucket_count and not settings.CREDIT_BUCKETS['ENABLED']:
+            raise ImproperlyConfigured(
+                'Enable CREDIT_BUCKETS to shard seller credit.')
+
+        with transaction.atomic():
+            with timed_lock(seller_id):
+                seller = self._lock_seller(seller_id)
+                buckets = list(CreditBucket.objects.filter(seller=seller)
+                               .order_by('index').select_for_update())
+
+            if buckets:
+                balances = {bucket.index: bucket.credit for bucket in buckets}
+            else:
+                balances = {None: seller.credit}
+            total = sum(balances.values(), Decimal('0'))
+
+            if bucket_count:
+                targets = dict(enumerate(split_credit(total, bucket_count)))
+            else:
+                targets = {None: total}
+            self._write_transfers(seller.id, balances, targets)
+
+            buckets = {bucket.index: bucket for bucket in buckets}
+            for index, credit in targets.items():
+                if index is None:
+                    continue
+                bucket = buckets.pop(index, None)
+                if bucket is None:
+                    CreditBucket.objects.create(
+                        seller=seller, index=index, credit=credit)
+                else:
+                    bucket.credit = credit
+                    bucket.save(update_fields=['credit'])
+            CreditBucket.objects.filter(
+                id__in=[bucket.id for bucket in buckets.values()]).delete()
+
+            seller.credit = total
+            seller.credit_bucket_count = bucket_count
+            seller.save(update_fields=['credit', 'credit_bucket_count'])
+
+    def rebalance(self, seller_id, reserve=None):
+        """
+        Even out the credit buckets of a seller.
+
+        When `reserve` is given as (index, amount) that bucket keeps
+        `amount` on top of its even share. Seller.credit is refreshed
+        with the aggregated credit.
+        """
+        with transaction.atomic():
+            with timed_lock(seller_id):
+                self._lock_seller(seller_id)
+                buckets = list(CreditBucket.objects
+                               .filter(seller_id=seller_id)
+                               .order_by('index').select_for_update())
+            if not buckets:
+                return buckets
+            balances = {bucket.index: bucket.credit for bucket in buckets}
+            total = sum(balances.values(), Decimal('0'))
+
+            reserved_index, reserved = reserve or (None, Decimal('0'))
+            targets = dict(zip(balances, split_credit(total - reserved,
+                                                      len(buckets))))
+            if reserved_index is not None:
+                targets[reserved_index] += reserved
+            self._write_transfers(seller_id, balances, targets)
+
+            for bucket in buckets:
+                if bucket.credit != targets[bucket.index]:
+                    bucket.credit = targets[bucket.index]
+                    bucket.save(update_fields=['credit'])
+            Seller.objects.filter(id=seller_id).update(credit=total)
+            return buckets
+
+    def _write_transfers(self, seller_id, balances, targets):
+        """record moving credit from `balances` to `targets`."""
+        transactions_written(seller_id)
+        Transaction.objects.bulk_create([
+            Transaction(
+                seller_id=seller_id,
+                amount=targets.get(index, 0) - balances.get(index, 0),
+                credit_before_transaction=balances.get(index, 0),
+                credit_after_transaction=targets.get(index, 0),
+                type=Transaction.Type.TRANSFER,
+                credit_bucket=index,
+                detail=f'CreditBucketRebalance-{seller_id}'
+            )
+            for index in sorted(balances.keys() | targets.keys(),
+                                key=lambda index: -1 if index is None else index)
+            if targets.get(index, 0) != balances.get(index, 0)
+        ])
+
+    def _pick_order(self, credits):
+        """return bucket indexes in the order a debit should try them."""
+        indexes = sorted(credits)
+        if settings.CREDIT_BUCKETS['PICK'] == 'round-robin':
+            start = next(self._round_robin) % len(indexes)
+            return indexes[start:] + indexes[:start]
+        random.shuffle(indexes)
+        return indexes
+
+    def withdraw(self, seller_id, request_factory, amount):
+        """
+        Withdraw `amount` from a bucket that can cover it.
+
+        Every attempt locks a single bucket in its own transaction. When
+        no bucket is large enough on its own, the seller and then all
+        buckets are locked and rebalanced so that one of them is.
+        `request_factory` creates the request the transaction refers to.
+        """
+        credits = dict(CreditBucket.objects.filter(seller_id=seller_id)
+                       .values_list('index', 'credit'))
+        for index in self._pick_order(credits):
+            if credits[index] < amount:
+                continue
+            with transaction.atomic():
+                with timed_lock(seller_id):
+                    bucket = CreditBucket.objects.select_for_update() \
+                        .filter(seller_id=seller_id, index=index,
+                                credit__gte=amount).first()
+                if bucket is not None:
+                    return self._withdraw(bucket, request_factory(), amount)
+
+        with transaction.atomic():
+            with timed_lock(seller_id):
+                self._lock_seller(seller_id)
+                buckets = list(CreditBucket.objects
+                               .filter(seller_id=seller_id)
+                               .order_by('index').select_for_update())
+            if sum((bucket.credit for bucket in buckets),
+                   Decimal('0')) < amount:
+                raise Seller.InsufficientCreditError
+            richest = max(buckets, key=lambda bucket: bucket.credit)
+            buckets = self.rebalance(seller_id,
+                                     reserve=(richest.index, amount))
+            bucket = next(bucket for bucket in buckets
+                          if bucket.index == richest.index)
+            return self._withdraw(bucket, request_factory(), amount)
+
+    def _withdraw(self, bucket, request, amount):
+        """withdraw from a locked bucket."""
+        transactions_written(bucket.seller_id)
+        transaction_obj = Transaction.objects.create(
+            seller_id=bucket.seller_id,
+            amount=-amount,
+            credit_before_transaction=bucket.credit,
+            credit_after_transaction=bucket.credit-amount,
+            type=Transaction.Type.WITHDRAW,
+            credit_bucket=bucket.index,
+            charge_request=request,
+            detail=f'{request.__class__.__name__}-{request.id}'
+        )
+        bucket.credit -= amount
+        bucket.save(update_fields=['credit'])
+        return transaction_obj
+
+    def deposit(self, request):
+        """deposit the requested amount into the seller's poorest bucket."""
+        index = CreditBucket.objects.filter(seller_id=request.seller_id) \
+            .order_by('credit', 'index').values_list('index', flat=True)[0]
+        with timed_lock(request.seller_id):
+            bucket = CreditBucket.objects.select_for_update() \
+                .get(seller_id=request.seller_id, index=index)
+        transactions_written(bucket.seller_id)
+        transaction_obj = Transaction.objects.create(
+            seller_id=bucket.seller_id,
+            amount=request.amount,
+            credit_before_transaction=bucket.credit,
+            credit_after_transaction=bucket.credit+request.amount,
+            type=Transaction.Type.DEPOSIT,
+            credit_bucket=bucket.index,
+            credit_request=request,
+            detail=f'{request.__class__.__name__}-{request.id}'
+        )
+        bucket.credit += request.amount
+        bucket.save(update_fields=['credit'])
+        return transaction_obj
+
+    def charge_phone_number(self, seller_id, phone_number, amount):
+        """Charge the specified phone number from a credit bucket."""
+        return self.withdraw(
+            seller_id,
+            lambda: ChargeRequest.objects.create(
+                seller_id=seller_id,
+                phone_number=phone_number,
+                amount=amount
+            ),
+            amount
+        )
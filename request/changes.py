@@ -0,0 +1,100 @@
+"""Change feed of the seller ledgers."""
+import asyncio
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.models import Transaction
+
+
+def transactions_written(*seller_ids):
+    """wake the feed readers of `seller_ids` once the writes commit."""
+    feed = TransactionFeed()
+    transaction.on_commit(lambda: feed.notify(seller_ids))
+
+
+def get_changes(seller_id, since, columns, sharded):
+    """return the values of the seller's transactions after `since`."""
+    config = settings.CHANGE_FEED
+    queryset = Transaction.objects.filter(seller_id=seller_id, id__gt=since)
+    if sharded:
+        # transactions of sellers with credit buckets are written under
+        # different locks and may commit out of id order, rows are only
+        # handed out once the ones before them had time to commit.
+        queryset = queryset.filter(
+            transaction_time__lt=timezone.now() - timedelta(
+                seconds=config['SHARDED_SETTLE_SECONDS']))
+    return list(queryset.order_by('id').values(
+        *dict.fromkeys(['id', *columns]))[:config['MAX_ROWS']])
+
+
+class TransactionFeed:
+    """
+    A singleton waking readers of a seller's ledger on new transactions.
+
+    Readers wait on an asyncio.Event of their event loop, commits from any
+    thread of the process set it. A reader registers for its seller
+    before looking for new rows, so a commit between its query and its
+    wait is not missed. Commits of other processes wake nobody here,
+    waiting readers look again every CHANGE_FEED['RECHECK_SECONDS'], so
+    they see those up to RECHECK_SECONDS late.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TransactionFeed, cls).__new__(cls)
+            cls._instance._setup()
+        return cls._instance
+
+    def _setup(self):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+
+    def notify(self, seller_ids):
+        """wake the readers waiting on any of `seller_ids`."""
+        with self._lock:
+            waiters = [waiter for seller_id in seller_ids
+                       for waiter in self._waiters.pop(seller_id, ())]
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # the loop of the reader is closed.
+                pass
+
+    async def wait_for(self, seller_id, fetch, timeout):
+        """
+        return the first non empty result of `await fetch()`.
+
+        `fetch` is awaited again whenever a transaction of the seller is
+        committed in this process, and at least every RECHECK_SECONDS,
+        until `timeout` seconds have passed. Returns the last, empty,
+        result then.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        recheck = settings.CHANGE_FEED['RECHECK_SECONDS']
+        while True:
+            waiter = (loop, asyncio.Event())
+            with self._lock:
+                self._waiters[seller_id].add(waiter)
+            try:
+                rows = await fetch()
+                remaining = deadline - loop.time()
+                if rows or remaining <= 0:
+                    return rows
+                try:
+                    await asyncio.wait_for(waiter[1].wait(),
+                                           min(remaining, recheck))
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                with self._lock:
+                    waiters = self._waiters.get(seller_id)
+                    if waiters is not None:
+                        waiters.discard(waiter)
+                        if not waiters:
+                            del self._waiters[seller_id]
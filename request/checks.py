@@ -0,0 +1,30 @@
+"""
+System checks of the request app settings.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from core.models import Seller
+
+
+@register(Tags.database)
+def check_credit_buckets(app_configs, databases=None, **kwargs):
+    """refuse CREDIT_BUCKETS['ENABLED'] False while sellers have buckets."""
+    if settings.CREDIT_BUCKETS['ENABLED'] or \
+            DEFAULT_DB_ALIAS not in (databases or ()):
+        return []
+    try:
+        sharded = list(Seller.objects.using(DEFAULT_DB_ALIAS)
+                       .filter(credit_bucket_count__gt=0)
+                       .values_list('id', flat=True)[:10])
+    except DatabaseError:
+        # the tables are not migrated yet.
+        return []
+    if not sharded:
+        return []
+    return [Error(
+        'CREDIT_BUCKETS is disabled while sellers have credit buckets.',
+        hint='Merge them back with `shard_seller_credit <id> 0` first, '
+             f'sellers: {", ".join(map(str, sharded))}.',
+        id='request.E001',
+    )]
@@ -0,0 +1,88 @@
+"""Coalescing of concurrent charges of the same seller."""
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+
+class _Batch:
+    """Charges of one seller waiting to be committed together."""
+
+    def __init__(self):
+        self.charges = []
+        self.futures = []
+        self.full = threading.Event()
+
+
+class ChargeCoalescer:
+    """
+    Gather concurrent charges of a seller into one batch.
+
+    The first charge of a seller becomes the leader of a new batch. When
+    no batch of the seller is being committed it commits right away,
+    alone, so an uncontended seller pays no wait. Otherwise it waits up
+    to `window` seconds, or until `max_batch_size` charges have joined,
+    then commits the whole batch with one call to
+    `execute(seller_id, charges)`. `execute` returns one result per
+    charge, a result that is an exception is raised in its own caller.
+    """
+
+    def __init__(self, execute, window, max_batch_size):
+        self.execute = execute
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._batches = {}
+        self._committing = Counter()
+
+    def submit(self, seller_id, phone_number, amount):
+        """Charge in the current batch of the seller and wait for it."""
+        future = Future()
+        with self._lock:
+            batch = self._batches.get(seller_id)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._batches[seller_id] = _Batch()
+            batch.charges.append({
+                'phone_number': phone_number,
+                'amount': amount,
+            })
+            batch.futures.append(future)
+            if len(batch.charges) >= self.max_batch_size:
+                del self._batches[seller_id]
+                batch.full.set()
+
+        if is_leader:
+            with self._lock:
+                contended = self._committing[seller_id] > 0
+            if contended:
+                batch.full.wait(self.window)
+            with self._lock:
+                if self._batches.get(seller_id) is batch:
+                    del self._batches[seller_id]
+                self._committing[seller_id] += 1
+            try:
+                self._flush(seller_id, batch)
+            finally:
+                with self._lock:
+                    self._committing[seller_id] -= 1
+                    if not self._committing[seller_id]:
+                        del self._committing[seller_id]
+
+        return future.result()
+
+    def _flush(self, seller_id, batch):
+        """Commit a closed batch and hand every caller its result."""
+        try:
+            results = self.execute(seller_id, batch.charges)
+        except BaseException as exc:
+            for future in batch.futures:
+                future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+
+        for future, result in zip(batch.futures, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,68 @@
+"""Conditional GET for the views sellers poll."""
+import hashlib
+from django.db.models import OuterRef, Subquery
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from core.models import Seller, Transaction
+
+
+def get_seller_state(seller_id):
+    """
+    return a token changing with everything a seller can read, or None.
+
+    It is Seller.version, bumped by changes that write no transaction,
+    with the id of the seller's latest transaction, read in one query of
+    two index lookups. Transactions of a seller are written under its
+    row lock so they commit in id order, except for sellers with credit
+    buckets, which get None.
+    """
+    row = Seller.objects.filter(id=seller_id).values_list(
+        'version', 'credit_bucket_count',
+        Subquery(Transaction.objects.filter(seller_id=OuterRef('id'))
+                 .order_by('-id').values('id')[:1])
+    ).first()
+    if row is None or row[1]:
+        return None
+    version, _, transaction_id = row
+    return f'{version}.{transaction_id or 0}'
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET with 304 Not Modified while the seller's data is unchanged.
+
+    The ETag is derived from the seller state and the full path of the
+    request, so a matching If-None-Match is answered without running the
+    view's query or serializers. Staff read across sellers and always get
+    a full response.
+    """
+
+    def get_etag(self, request):
+        if request.user.is_staff:
+            return None
+        state = get_seller_state(request.user.id)
+        if state is None:
+            return None
+        path = hashlib.blake2b(request.get_full_path().encode(),
+                               digest_size=8).hexdigest()
+        return f'"{request.user.id}.{state}.{path}"'
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag is not None and \
+                etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if etag is not None and response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,157 @@
+"""Tracking of the most contended seller rows."""
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+from django.conf import settings
+
+# upper bounds of the lock wait histogram of a tracked seller, from
+# 100us growing by a quarter up to about 30 seconds.
+WAIT_BOUNDS = tuple(0.0001 * 1.25 ** i for i in range(57))
+
+
+class _Entry:
+    """A tracked seller."""
+    __slots__ = ('seller_id', 'weight', 'error', 'locks', 'histogram')
+
+    def __init__(self, seller_id, error=0.0):
+        self.seller_id = seller_id
+        self.weight = error
+        self.error = error
+        self.locks = 0
+        self.histogram = [0] * (len(WAIT_BOUNDS) + 1)
+
+    def dump(self):
+        return [self.seller_id, self.weight, self.error, self.locks,
+                self.histogram]
+
+
+def _percentile(histogram, locks, fraction):
+    if not locks:
+        return None
+    rank = math.ceil(locks * fraction)
+    seen = 0
+    for bound, count in zip(WAIT_BOUNDS, histogram):
+        seen += count
+        if seen >= rank:
+            return round(bound, 6)
+    return round(WAIT_BOUNDS[-1], 6)
+
+
+class HotSellerTracker:
+    """
+    A singleton Space-Saving sketch of the sellers waiting most on locks.
+
+    At most HOT_SELLERS['CAPACITY'] sellers are tracked whatever the
+    number of sellers. A seller showing up when the sketch is full takes
+    the place of the tracked seller with the least lock wait and inherits
+    its wait as `error`, so a tracked seller's wait is overestimated by
+    at most its error and any seller waiting more than the smallest
+    tracked wait is tracked. The sketches of all worker processes are
+    summed through files in METRICS['DIRECTORY'] like the metrics.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HotSellerTracker, cls).__new__(cls)
+            cls._instance._setup()
+        return cls._instance
+
+    def _setup(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._flushed_at = time.monotonic()
+
+    def observe(self, seller_id, seconds):
+        """a RequestService lock observer adding to the seller's wait."""
+        config = settings.HOT_SELLERS
+        if not config['ENABLED']:
+            return
+        with self._lock:
+            entry = self._entries.get(seller_id)
+            if entry is None:
+                error = 0.0
+                if len(self._entries) >= config['CAPACITY']:
+                    victim = min(self._entries.values(),
+                                 key=lambda entry: entry.weight)
+                    del self._entries[victim.seller_id]
+                    error = victim.weight
+                entry = self._entries[seller_id] = _Entry(seller_id, error)
+            entry.weight += seconds
+            entry.locks += 1
+            entry.histogram[bisect.bisect_left(WAIT_BOUNDS, seconds)] += 1
+        self._maybe_flush()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _path(self, directory):
+        return os.path.join(directory, f'hot-sellers-{os.getpid()}.json')
+
+    def _maybe_flush(self):
+        config = settings.METRICS
+        if config['DIRECTORY'] is None or \
+                time.monotonic() - self._flushed_at < config['FLUSH_SECONDS']:
+            return
+        self.flush()
+
+    def flush(self):
+        """write the sketch of this process to its file."""
+        directory = settings.METRICS['DIRECTORY']
+        if directory is None:
+            return
+        with self._lock:
+            self._flushed_at = time.monotonic()
+            rows = [entry.dump() for entry in self._entries.values()]
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(directory)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(rows, file)
+        os.replace(f'{path}.tmp', path)
+
+    def _collect(self):
+        """return the rows of every process."""
+        directory = settings.METRICS['DIRECTORY']
+        if directory is None:
+            with self._lock:
+                return [entry.dump() for entry in self._entries.values()]
+
+        self.flush()
+        rows = []
+        for path in glob.glob(os.path.join(directory, 'hot-sellers-*.json')):
+            try:
+                with open(path) as file:
+                    rows.extend(json.load(file))
+            except (OSError, ValueError):
+                continue
+        return rows
+
+    def top(self, limit):
+        """return the `limit` sellers with the most lock wait."""
+        merged = {}
+        for seller_id, weight, error, locks, histogram in self._collect():
+            entry = merged.get(seller_id)
+            if entry is None:
+                entry = merged[seller_id] = _Entry(seller_id)
+            entry.weight += weight
+            entry.error += error
+            entry.locks += locks
+            entry.histogram = [a + b for a, b in
+                               zip(entry.histogram, histogram)]
+
+        entries = sorted(merged.values(), key=lambda entry: entry.weight,
+                         reverse=True)[:limit]
+        return [{
+            'seller': entry.seller_id,
+            'locks': entry.locks,
+            'lock_wait_seconds': round(entry.weight, 6),
+            'error_seconds': round(entry.error, 6),
+            'p50': _percentile(entry.histogram, entry.locks, 0.50),
+            'p95': _percentile(entry.histogram, entry.locks, 0.95),
+            'p99': _percentile(entry.histogram, entry.locks, 0.99),
+        } for entry in entries]
@@ -0,0 +1,173 @@
+"""
+Live balance events of the sellers.
+
+RequestService publishes the balance after every deposit and withdraw it
+commits to the subscribers of the seller in this process. A poller per
+process publishes the transactions committed by other processes every
+BALANCE_EVENTS['RECHECK_SECONDS'] while anyone is subscribed.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from core.models import Transaction
+from request.serializers import BalanceEventSerializer
+
+EVENT_COLUMNS = ('id', 'seller_id', 'credit_after_transaction', 'amount',
+                 'type')
+# the longest pause of the poller after consecutive failures.
+MAX_BACKOFF_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+def balance_changed(*transaction_objs):
+    """publish the balance after `transaction_objs` once they commit."""
+    broker = BalanceBroker()
+    objs = [obj for obj in transaction_objs
+            if broker.has_subscribers(obj.seller_id)]
+    if objs:
+        events = [(obj.seller_id, BalanceEventSerializer(obj).data)
+                  for obj in objs]
+        transaction.on_commit(lambda: broker.publish(events))
+
+
+class Subscriber:
+    """The buffer of balance events of one client."""
+    __slots__ = ('seller_id', 'loop', 'queue', 'last_id', 'dropped')
+
+    def __init__(self, seller_id, loop):
+        self.seller_id = seller_id
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.last_id = 0
+        self.dropped = False
+
+    def deliver(self, event):
+        """
+        queue `event` unless the client has already seen a newer one.
+
+        A client more than BUFFER_SIZE events behind is dropped, its queue
+        ends with None.
+        """
+        if self.dropped or event['transaction_id'] <= self.last_id:
+            return
+        self.last_id = event['transaction_id']
+        if self.queue.qsize() >= settings.BALANCE_EVENTS['BUFFER_SIZE']:
+            self.dropped = True
+            event = None
+        self.queue.put_nowait(event)
+
+
+class BalanceBroker:
+    """
+    A singleton fan-out of balance events to the subscribed clients.
+
+    Subscribers live on an event loop and get their events through it,
+    publishing from any thread. With nobody subscribed to a seller
+    publishing is a dict lookup.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(BalanceBroker, cls).__new__(cls)
+            cls._instance._setup()
+        return cls._instance
+
+    def _setup(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._poller = None
+
+    def has_subscribers(self, seller_id):
+        return seller_id in self._subscribers
+
+    def subscribe(self, seller_id):
+        """return a Subscriber of the seller on the running loop."""
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(seller_id, loop)
+        with self._lock:
+            self._subscribers.setdefault(seller_id, set()).add(subscriber)
+            if settings.BALANCE_EVENTS['RECHECK_SECONDS'] is not None and (
+                    self._poller is None or self._poller.done()
+                    or self._poller.get_loop() is not loop):
+                # the poller outlives the request, it runs in a context
+                # of its own.
+                self._poller = contextvars.Context().run(
+                    loop.create_task, self._poll())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.seller_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.seller_id]
+
+    def publish(self, events):
+        """deliver `(seller_id, event)` pairs to their subscribers."""
+        with self._lock:
+            deliveries = [(subscriber, event) for seller_id, event in events
+                          for subscriber in
+                          self._subscribers.get(seller_id, ())]
+        for subscriber, event in deliveries:
+            try:
+                subscriber.loop.call_soon_threadsafe(
+                    subscriber.deliver, event)
+            except RuntimeError:
+                # the loop of the subscriber is closed.
+                self.unsubscribe(subscriber)
+
+    def _fetch(self, last_id):
+        config = settings.BALANCE_EVENTS
+        # ids are taken before commit, rows of other sellers may still
+        # show up below the newest one for SETTLE_SECONDS.
+        settled = timezone.now() - timedelta(seconds=config['SETTLE_SECONDS'])
+        return list(Transaction.objects
+                    .filter(id__gt=last_id, credit_bucket__isnull=True,
+                            transaction_time__lt=settled)
+                    .exclude(type=Transaction.Type.TRANSFER)
+                    .order_by('id').values(*EVENT_COLUMNS)
+                    [:config['RECHECK_ROWS']])
+
+    async def _poll(self):
+        """
+        publish transactions of subscribed sellers committed elsewhere.
+
+        A failing round is logged and retried, after a pause doubling up
+        to MAX_BACKOFF_SECONDS while the failures go on.
+        """
+        # imported here, the async views depend on RequestService.
+        from request.async_views import run_in_pool
+        config = settings.BALANCE_EVENTS
+        last_id = None
+        backoff = config['RECHECK_SECONDS']
+        while self._subscribers:
+            try:
+                if last_id is None:
+                    last_id = (await run_in_pool(
+                        Transaction.objects.aggregate, Max('id'))
+                    )['id__max'] or 0
+                rows = await run_in_pool(self._fetch, last_id)
+                if rows:
+                    last_id = rows[-1]['id']
+                    self.publish([
+                        (row['seller_id'], BalanceEventSerializer(row).data)
+                        for row in rows
+                        if self.has_subscribers(row['seller_id'])
+                    ])
+            except Exception:
+                logger.exception('Polling balance events failed.')
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                continue
+            backoff = config['RECHECK_SECONDS']
+            if len(rows) < config['RECHECK_ROWS']:
+                await asyncio.sleep(config['RECHECK_SECONDS'])
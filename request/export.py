@@ -0,0 +1,118 @@
+"""Streaming export of the ledger."""
+import csv
+import json
+import zlib
+from decimal import Decimal
+from datetime import datetime
+from django.db.models import Q
+from django.utils import timezone
+
+EXPORT_FIELDS = [
+    'id',
+    'seller_id',
+    'amount',
+    'credit_before_transaction',
+    'credit_after_transaction',
+    'type',
+    'credit_bucket',
+    'charge_request_id',
+    'credit_request_id',
+    'detail',
+    'transaction_time',
+]
+FLUSH_SIZE = 64 * 1024
+
+
+def _convert(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return value
+
+
+def iter_rows(queryset, chunk_size, fields=EXPORT_FIELDS,
+              time_field='transaction_time'):
+    """
+    Yield the rows of `queryset` in (`time_field`, id) order as dicts.
+
+    Rows are fetched in keyset chunks over (`time_field`, id): MySQL
+    drivers buffer a whole result set even for QuerySet.iterator(), one
+    bounded query per chunk keeps memory flat on every backend.
+    """
+    queryset = queryset.order_by(time_field, 'id').values(*fields)
+    position = None
+    while True:
+        chunk = queryset
+        if position is not None:
+            time, pk = position
+            chunk = chunk.filter(Q(**{f'{time_field}__gt': time})
+                                 | Q(**{time_field: time, 'id__gt': pk}))
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield {field: _convert(row[field]) for field in fields}
+        if len(rows) < chunk_size:
+            return
+        position = rows[-1][time_field], rows[-1]['id']
+
+
+def accepts_gzip(accept_encoding):
+    """return whether an Accept-Encoding header value allows gzip."""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+class _Echo:
+    """a file-like object handing back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def buffered(lines):
+    """join lines into chunks, the first line is sent on its own."""
+    buffer = []
+    size = 0
+    first = True
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if first or size >= FLUSH_SIZE:
+            yield ''.join(buffer).encode()
+            buffer = []
+            size = 0
+            first = False
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
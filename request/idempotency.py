@@ -0,0 +1,205 @@
+"""Idempotency-Key support for POST API views."""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from core.cache import LRUCache
+from core.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+_responses = LRUCache(settings.IDEMPOTENCY['CACHE_SIZE'],
+                      settings.IDEMPOTENCY['CACHE_TTL'])
+
+
+def _request_hash(request):
+    """return a fingerprint of the request payload."""
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(request_hash, stored):
+    """return the stored outcome, unless the payload changed."""
+    stored_hash, response_status, response_body = stored
+    if stored_hash != request_hash:
+        response = {
+            'error': 'Idempotency key reused.',
+            'message': 'The idempotency key was already used with a different request.'
+        }
+        return response, status.HTTP_422_UNPROCESSABLE_ENTITY, False
+    return response_body, response_status, True
+
+
+def _invalid_key(key):
+    """return the outcome refusing `key`, or None when it is valid."""
+    if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        response = {
+            'error': 'Invalid idempotency key.',
+            'message': 'The idempotency key must be at most 255 characters.'
+        }
+        return response, status.HTTP_400_BAD_REQUEST, False
+    return None
+
+
+def claim(seller_id, scope, key, request_hash):
+    """
+    claim `key` for a request, return `(record, outcome)`.
+
+    `record` is the claimed IdempotencyKey, or None when the key is not
+    free and `outcome` is the `(data, status, replayed)` to answer with.
+    """
+    outcome = _invalid_key(key)
+    if outcome is not None:
+        return None, outcome
+
+    cache_key = (seller_id, scope, key)
+    stored = _responses.get(cache_key)
+    if stored is not None:
+        return None, _replay(request_hash, stored)
+
+    try:
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.get_or_create(
+                seller_id=seller_id, scope=scope, key=key,
+                defaults={'request_hash': request_hash}
+            )
+    except IntegrityError:
+        record = IdempotencyKey.objects.get(
+            seller_id=seller_id, scope=scope, key=key)
+        created = False
+
+    if created:
+        return record, None
+    if record.response_status is None:
+        if _take_over(record, request_hash):
+            return record, None
+        response = {
+            'error': 'Request in progress.',
+            'message': 'A request with this idempotency key is still being processed.'
+        }
+        return None, (response, status.HTTP_409_CONFLICT, False)
+    stored = (record.request_hash, record.response_status,
+              record.response_body)
+    _responses.set(cache_key, stored)
+    return None, _replay(request_hash, stored)
+
+
+def _take_over(record, request_hash):
+    """claim a key whose claim ran out of LEASE_SECONDS, return success."""
+    now = timezone.now()
+    lease = timedelta(seconds=settings.IDEMPOTENCY['LEASE_SECONDS'])
+    if record.claimed_at > now - lease:
+        return False
+    claimed = IdempotencyKey.objects.filter(
+        id=record.id, response_status__isnull=True,
+        claimed_at=record.claimed_at
+    ).update(claimed_at=now, request_hash=request_hash)
+    record.claimed_at = now
+    record.request_hash = request_hash
+    return bool(claimed)
+
+
+def finish(record, response_status, response_body):
+    """
+    store the response of a claimed key, or free it after a failure.
+
+    Nothing is written once the claim was taken over by another request.
+    """
+    claim = IdempotencyKey.objects.filter(
+        id=record.id, response_status__isnull=True,
+        claimed_at=record.claimed_at)
+    if response_status is None or response_status >= 500:
+        claim.delete()
+        return
+    if not claim.update(response_status=response_status,
+                        response_body=response_body):
+        return
+    _responses.set((record.seller_id, record.scope, record.key),
+                   (record.request_hash, response_status, response_body))
+
+
+def _scope(view):
+    return getattr(view, 'idempotency_scope', None) \
+        or view.__class__.__name__
+
+
+def _response(outcome):
+    data, response_status, replayed = outcome
+    response = Response(data=data, status=response_status)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """
+    Make a POST handler replay its response for a repeated Idempotency-Key.
+
+    The first request with a key claims it with a row in IdempotencyKey,
+    a concurrent request with the same key gets 409 until the first one
+    finishes. Finished responses are replayed from an in-process cache,
+    or from the table when the cache misses, without running the view.
+    Server errors are not stored so the client can retry them. Views
+    sharing an `idempotency_scope` share their keys.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        record, outcome = claim(request.user.id, _scope(self), key,
+                                _request_hash(request))
+        if outcome is not None:
+            return _response(outcome)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            finish(record, None, None)
+            raise
+        finish(record, response.status_code, response.data)
+        return response
+
+    return wrapper
+
+
+def aidempotent(handler):
+    """
+    `idempotent` for the handlers of AsyncAPIView returning (data, status).
+
+    The key is claimed and the response stored in the service thread pool.
+    """
+    @functools.wraps(handler)
+    async def wrapper(self, request, *args, **kwargs):
+        # imported here, request.async_views imports this module.
+        from request.async_views import run_in_pool
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return await handler(self, request, *args, **kwargs)
+
+        record, outcome = await run_in_pool(
+            claim, request.user.id, _scope(self), key, _request_hash(request))
+        if outcome is not None:
+            data, response_status, replayed = outcome
+            response = self.render(data, response_status)
+            if replayed:
+                response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            data, response_status = await handler(self, request, *args,
+                                                  **kwargs)
+        except BaseException:
+            await run_in_pool(finish, record, None, None)
+            raise
+        await run_in_pool(finish, record, response_status, data)
+        return data, response_status
+
+    return wrapper
@@ -0,0 +1,314 @@
+"""Credit leasing for very hot sellers."""
+import atexit
+import os
+import socket
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from datetime import timedelta
+from decimal import Decimal, ROUND_DOWN
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from core.models import (
+    Seller,
+    CreditLease,
+    ChargeRequest,
+    Transaction
+)
+from request.locks import timed_lock
+
+CENT = Decimal('0.01')
+
+
+def is_leased(seller_id):
+    """return whether charges of the seller are approved against leases."""
+    return seller_id in settings.CREDIT_LEASING['SELLER_IDS']
+
+
+def get_outstanding_credit(seller_id):
+    """return the credit of a seller held by active leases and not used."""
+    return CreditLease.objects.filter(
+        seller_id=seller_id, status=CreditLease.Status.ACTIVE
+    ).aggregate(
+        credit=Sum(F('amount') - F('used'))
+    )['credit'] or Decimal('0')
+
+
+def release_lease(lease_id):
+    """return the unused credit of a lease to its seller."""
+    with transaction.atomic():
+        seller_id = CreditLease.objects.values_list(
+            'seller_id', flat=True).get(id=lease_id)
+        with timed_lock(seller_id):
+            seller = Seller.objects.get_queryset() \
+                .filter(id=seller_id).select_for_update().get()
+            lease = CreditLease.objects.select_for_update().get(id=lease_id)
+        if lease.status != CreditLease.Status.ACTIVE:
+            return lease
+
+        seller.credit += lease.amount - lease.used
+        seller.version = F('version') + 1
+        seller.save(update_fields=['credit', 'version'])
+        lease.status = CreditLease.Status.RELEASED
+        lease.released_at = timezone.now()
+        lease.save(update_fields=['status', 'released_at'])
+        return lease
+
+
+class _Lease:
+    """The in-memory side of a lease held by this process."""
+
+    def __init__(self, lease):
+        self.id = lease.id
+        self.remaining = lease.amount
+        self.expires_at = lease.expires_at
+
+    def covers(self, amount):
+        return self.remaining >= amount and self.expires_at > timezone.now()
+
+
+class PendingCharge:
+    """
+    A charge approved against a lease and not written yet.
+
+    Returned instead of its Transaction when WAIT_FOR_FLUSH is off, the
+    flusher writes it to the ledger within FLUSH_INTERVAL_MS.
+    """
+
+    def __init__(self, seller_id, lease_id, phone_number, amount):
+        self.seller_id = seller_id
+        self.lease_id = lease_id
+        self.phone_number = phone_number
+        self.amount = amount
+        self.future = Future()
+
+
+class CreditLeaseManager:
+    """
+    A singleton approving charges of leased sellers without the seller lock.
+
+    The process leases a slice of the seller credit in one locked
+    transaction and approves charges against it in memory. A background
+    thread writes the approved charges in batches, it locks the seller
+    row once per batch so credit_before/credit_after follow ledger order.
+    Leases are returned when they run out, expire or the process exits.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CreditLeaseManager, cls).__new__(cls)
+            cls._instance._setup()
+        return cls._instance
+
+    def _setup(self):
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._seller_locks = defaultdict(threading.Lock)
+        self._leases = {}
+        self._pending = []
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._flusher = None
+
+    def charge(self, seller_id, phone_number, amount):
+        """
+        Approve a charge against the seller's lease.
+
+        Returns its Transaction once written, or the PendingCharge right
+        away when WAIT_FOR_FLUSH is off.
+        """
+        config = settings.CREDIT_LEASING
+        while True:
+            with self._lock:
+                lease = self._leases.get(seller_id)
+                if lease is not None and lease.covers(amount):
+                    lease.remaining -= amount
+                    charge = PendingCharge(seller_id, lease.id, phone_number,
+                                           amount)
+                    self._pending.append(charge)
+                    batch_full = \
+                        len(self._pending) >= config['FLUSH_BATCH_SIZE']
+                    break
+            self._renew(seller_id, amount)
+
+        self._start_flusher()
+        if batch_full:
+            self._wake.set()
+        if not config['WAIT_FOR_FLUSH']:
+            return charge
+        return charge.future.result()
+
+    def _renew(self, seller_id, amount):
+        """replace the seller's lease by one that covers `amount`."""
+        with self._lock:
+            seller_lock = self._seller_locks[seller_id]
+        with seller_lock:
+            with self._lock:
+                lease = self._leases.get(seller_id)
+                if lease is not None and lease.covers(amount):
+                    return
+                self._leases.pop(seller_id, None)
+            if lease is not None:
+                self.flush()
+                release_lease(lease.id)
+
+            lease = self._acquire(seller_id, amount)
+            with self._lock:
+                self._leases[seller_id] = lease
+
+    def _acquire(self, seller_id, amount):
+        """lease a slice of the seller credit that covers `amount`."""
+        config = settings.CREDIT_LEASING
+        with transaction.atomic():
+            with timed_lock(seller_id):
+                seller = Seller.objects.get_queryset() \
+                    .filter(id=seller_id).select_for_update().get()
+            if seller.credit < amount:
+                raise Seller.InsufficientCreditError
+
+            share = (seller.credit * Decimal(config['FRACTION'])) \
+                .quantize(CENT, rounding=ROUND_DOWN)
+            lease_amount = min(seller.credit, max(amount, share))
+            seller.credit -= lease_amount
+            seller.version = F('version') + 1
+            seller.save(update_fields=['credit', 'version'])
+            return _Lease(CreditLease.objects.create(
+                seller=seller,
+                owner=self.owner,
+                amount=lease_amount,
+                expires_at=timezone.now() + timedelta(
+                    seconds=config['TTL_SECONDS'])
+            ))
+
+    def flush(self):
+        """write every approved charge to the ledger."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+
+            charges_by_seller = defaultdict(list)
+            for charge in pending:
+                charges_by_seller[charge.seller_id].append(charge)
+
+            for seller_id, charges in charges_by_seller.items():
+                try:
+                    transactions = self._write(seller_id, charges)
+                except Exception as exc:
+                    with self._lock:
+                        for charge in charges:
+                            lease = self._leases.get(seller_id)
+                            if lease is not None and lease.id == charge.lease_id:
+                                lease.remaining += charge.amount
+                    for charge in charges:
+                        charge.future.set_exception(exc)
+                else:
+                    for charge, transaction_obj in zip(charges, transactions):
+                        charge.future.set_result(transaction_obj)
+
+    def _write(self, seller_id, charges):
+        """write charges of one seller with a single seller lock."""
+        from request.services import RequestService
+        service = RequestService()
+
+        with transaction.atomic():
+            with timed_lock(seller_id):
+                seller = Seller.objects.get_queryset() \
+                    .filter(id=seller_id).select_for_update().get()
+            credit = seller.credit + get_outstanding_credit(seller_id)
+
+            used = defaultdict(Decimal)
+            for charge in charges:
+                used[charge.lease_id] += charge.amount
+            for lease_id, amount in used.items():
+                recorded = CreditLease.objects.filter(
+                    id=lease_id,
+                    status=CreditLease.Status.ACTIVE,
+                    used__lte=F('amount') - amount
+                ).update(used=F('used') + amount)
+                if not recorded:
+                    raise Seller.InsufficientCreditError(
+                        'Credit lease was released before the charge '
+                        'was recorded.')
+
+            requests = service._bulk_create_for_sellers(ChargeRequest, [
+                ChargeRequest(
+                    seller_id=seller_id,
+                    phone_number=charge.phone_number,
+                    amount=charge.amount
+                ) for charge in charges
+            ])
+            transactions = []
+            for request in requests:
+                transactions.append(Transaction(
+                    seller_id=seller_id,
+                    amount=-request.amount,
+                    credit_before_transaction=credit,
+                    credit_after_transaction=credit-request.amount,
+                    type=Transaction.Type.WITHDRAW,
+                    charge_request=request,
+                    detail=f'{request.__class__.__name__}-{request.id}'
+                ))
+                credit -= request.amount
+            return service._bulk_create_for_sellers(Transaction, transactions)
+
+    def _release_expired(self):
+        """return leases that expired while nobody charged against them."""
+        now = timezone.now()
+        with self._lock:
+            expired = [seller_id for seller_id, lease in self._leases.items()
+                       if lease.expires_at <= now]
+        for seller_id in expired:
+            with self._lock:
+                seller_lock = self._seller_locks[seller_id]
+            with seller_lock:
+                with self._lock:
+                    lease = self._leases.get(seller_id)
+                    if lease is None or lease.expires_at > now:
+                        continue
+                    del self._leases[seller_id]
+                self.flush()
+                release_lease(lease.id)
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._stopped.clear()
+            self._flusher = threading.Thread(
+                target=self._run, name='credit-lease-flusher', daemon=True)
+            self._flusher.start()
+        atexit.register(self.shutdown)
+
+    def _run(self):
+        interval = settings.CREDIT_LEASING['FLUSH_INTERVAL_MS'] / 1000
+        try:
+            while not self._stopped.is_set():
+                self._wake.wait(interval)
+                self._wake.clear()
+                close_old_connections()
+                self.flush()
+                self._release_expired()
+        finally:
+            connection.close()
+
+    def shutdown(self):
+        """Stop the flusher, write pending charges and return all leases."""
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            self._stopped.set()
+            self._wake.set()
+            flusher.join()
+            atexit.unregister(self.shutdown)
+
+        # without leases nothing new is approved, so the flush writes
+        # every charge approved against the leases it returns.
+        with self._lock:
+            leases, self._leases = list(self._leases.values()), {}
+        self.flush()
+        for lease in leases:
+            release_lease(lease.id)
@@ -0,0 +1,114 @@
+"""Balance checkpoints of the seller ledgers."""
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from core.models import (
+    Seller,
+    ArchivedMonth,
+    BalanceCheckpoint,
+    Transaction
+)
+from request.leasing import get_outstanding_credit
+
+
+class LedgerPrunedError(Exception):
+    """The ledger rows of the requested time were pruned."""
+
+
+class LedgerService:
+    """
+    A singleton service answering balance questions from the ledger.
+
+    A checkpoint holds the ledger balance of a seller every INTERVAL
+    transactions, so the balance at any time is one seek to the nearest
+    checkpoint plus a replay of at most INTERVAL transactions.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(LedgerService, cls).__new__(cls)
+        return cls._instance
+
+    def checkpoint(self, seller_id):
+        """
+        Add the checkpoints missing from the settled part of the ledger.
+
+        Transactions newer than SETTLE_SECONDS are left for a later run,
+        ids are allocated before commit so a lower id may still show up.
+        """
+        config = settings.LEDGER_CHECKPOINTS
+        interval = config['INTERVAL']
+        rows = Transaction.objects.filter(
+            seller_id=seller_id,
+            transaction_time__lt=timezone.now() - timedelta(
+                seconds=config['SETTLE_SECONDS'])
+        ).order_by('id')
+
+        last = BalanceCheckpoint.objects.filter(seller_id=seller_id) \
+            .order_by('-last_transaction_id').first()
+        if last is not None:
+            credit, last_id = last.credit, last.last_transaction_id
+        else:
+            credit = rows.values_list(
+                'credit_before_transaction', flat=True).first()
+            if credit is None:
+                return []
+            last_id = 0
+
+        checkpoints = []
+        while True:
+            chunk = list(rows.filter(id__gt=last_id).values_list(
+                'id', 'amount', 'transaction_time')[:interval])
+            if len(chunk) < interval:
+                return checkpoints
+            credit += sum(amount for _, amount, _ in chunk)
+            last_id, _, transaction_time = chunk[-1]
+            checkpoints.append(BalanceCheckpoint.objects.create(
+                seller_id=seller_id,
+                last_transaction_id=last_id,
+                transaction_time=transaction_time,
+                credit=credit
+            ))
+
+    def get_credit_at(self, seller_id, at):
+        """
+        return the ledger balance of the seller at time `at`.
+
+        Raises LedgerPrunedError when `at` falls in or before the last
+        pruned month, the hot table no longer holds its transactions.
+        """
+        # imported here, request.archive depends on this module.
+        from request.archive import month_range
+        pruned = ArchivedMonth.objects.filter(
+            table=ArchivedMonth.Table.TRANSACTION, pruned_at__isnull=False
+        ).order_by('-month').values_list('month', flat=True).first()
+        if pruned is not None and at < month_range(pruned)[1]:
+            raise LedgerPrunedError
+
+        rows = Transaction.objects.filter(
+            seller_id=seller_id, transaction_time__lte=at)
+        checkpoint = BalanceCheckpoint.objects.filter(
+            seller_id=seller_id, transaction_time__lte=at
+        ).order_by('-transaction_time', '-last_transaction_id').first()
+
+        if checkpoint is not None:
+            credit = checkpoint.credit
+            rows = rows.filter(
+                id__gt=checkpoint.last_transaction_id,
+                transaction_time__gte=checkpoint.transaction_time - timedelta(
+                    seconds=settings.LEDGER_CHECKPOINTS['SETTLE_SECONDS'])
+            )
+        else:
+            credit = Transaction.objects.filter(seller_id=seller_id) \
+                .order_by('id') \
+                .values_list('credit_before_transaction', flat=True).first()
+            if credit is None:
+                seller = Seller.objects.only('credit').get(id=seller_id)
+                return (seller.credit or Decimal('0')) \
+                    + get_outstanding_credit(seller_id)
+
+        return credit + (rows.aggregate(amount=Sum('amount'))['amount']
+                         or Decimal('0'))
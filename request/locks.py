@@ -0,0 +1,30 @@
+"""Timing of the row locks taken on a seller's credit."""
+import contextlib
+import time
+
+_observers = []
+
+
+def add_lock_observer(observer):
+    """
+    Call `observer(seller_id, seconds)` after every timed_lock block.
+
+    `seconds` is the time the SELECT ... FOR UPDATE of the block took,
+    including the wait for other transactions holding the rows.
+    """
+    _observers.append(observer)
+
+
+def remove_lock_observer(observer):
+    _observers.remove(observer)
+
+
+@contextlib.contextmanager
+def timed_lock(seller_id):
+    """report the time the block takes to lock rows of the seller."""
+    started = time.perf_counter()
+    yield
+    if _observers:
+        seconds = time.perf_counter() - started
+        for observer in _observers:
+            observer(seller_id, seconds)
@@ -0,0 +1,67 @@
+"""
+Django command to archive closed months of the ledger tables.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from core.models import ArchivedMonth
+from request import archive
+
+
+class Command(BaseCommand):
+    """Django command to archive and prune ledger months."""
+    help = ('Export closed months of transactions and charge requests to '
+            'gzipped NDJSON files, optionally pruning them afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months', type=int,
+            default=settings.LEDGER_ARCHIVE['KEEP_MONTHS'],
+            help='Number of months before the current one left alone.')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Delete archived months from the tables.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.localtime()
+        cutoff = archive.month_start(now.year,
+                                     now.month - options['keep_months'])
+        archived_count = pruned_count = 0
+
+        # transactions go first, pruning charge requests nulls the
+        # charge_request of the transactions still pointing at them.
+        for table in (ArchivedMonth.Table.TRANSACTION,
+                      ArchivedMonth.Table.CHARGE_REQUEST):
+            model, time_field, _ = archive.TABLES[table]
+            oldest = model.objects.aggregate(oldest=Min(time_field))['oldest']
+            if oldest is None:
+                continue
+            oldest = timezone.localtime(oldest)
+            start = archive.month_start(oldest.year, oldest.month)
+            months = []
+            while start < cutoff:
+                months.append(start.date())
+                start = archive.month_start(start.year, start.month + 1)
+
+            for month in months:
+                archived = ArchivedMonth.objects.filter(
+                    table=table, month=month).first()
+                if archived is None:
+                    if not archive.month_rows(table, month).exists():
+                        continue
+                    archived = archive.archive_month(
+                        table, month, options['chunk_size'])
+                    archived_count += 1
+                    self.stdout.write(f'Archived {archived}.')
+                if options['prune'] and archived.pruned_at is None:
+                    try:
+                        archive.prune_month(archived, options['chunk_size'])
+                    except archive.ArchiveMismatchError as exc:
+                        raise CommandError(f'{archived}: {exc.message}')
+                    pruned_count += 1
+                    self.stdout.write(f'Pruned {archived}.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived_count} and pruned {pruned_count} months.'))
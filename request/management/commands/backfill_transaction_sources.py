@@ -0,0 +1,72 @@
+"""
+Django command to link old transactions to the request they came from.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from core.models import (
+    ChargeRequest,
+    CreditRequest,
+    Transaction
+)
+
+SOURCES = {
+    'ChargeRequest': (ChargeRequest, 'charge_request_id'),
+    'CreditRequest': (CreditRequest, 'credit_request_id'),
+}
+
+
+class Command(BaseCommand):
+    """Django command to backfill Transaction source requests."""
+    help = ('Set charge_request/credit_request of transactions from their '
+            'detail, in chunks. Safe to stop and run again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--after-id', type=int, default=0,
+            help='Resume after this transaction id.')
+
+    def handle(self, *args, **options):
+        rows = Transaction.objects.filter(
+            charge_request__isnull=True,
+            credit_request__isnull=True
+        ).filter(
+            Q(detail__startswith='ChargeRequest-')
+            | Q(detail__startswith='CreditRequest-')
+        ).order_by('id')
+
+        last_id = options['after_id']
+        linked = 0
+        while True:
+            chunk = list(rows.filter(id__gt=last_id).only('id', 'detail')
+                         [:options['chunk_size']])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            linked += self.link(chunk)
+            self.stdout.write(f'Linked {linked} transactions, '
+                              f'last id {last_id}.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Linked {linked} transactions to their requests.'))
+
+    def link(self, chunk):
+        """link a chunk of transactions, skipping deleted requests."""
+        wanted = {name: {} for name in SOURCES}
+        for transaction_obj in chunk:
+            name, _, pk = transaction_obj.detail.partition('-')
+            if pk.isdigit():
+                wanted[name][transaction_obj.id] = int(pk)
+
+        updated = []
+        for name, (model, field) in SOURCES.items():
+            existing = set(model.objects.filter(
+                id__in=wanted[name].values()).values_list('id', flat=True))
+            for transaction_obj in chunk:
+                pk = wanted[name].get(transaction_obj.id)
+                if pk in existing:
+                    setattr(transaction_obj, field, pk)
+                    updated.append(transaction_obj)
+        Transaction.objects.bulk_update(
+            updated, ['charge_request', 'credit_request'])
+        return len(updated)
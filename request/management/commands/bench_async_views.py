@@ -0,0 +1,137 @@
+"""
+Django command to compare the async views with the DRF views.
+"""
+import asyncio
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from rest_framework.authtoken.models import Token
+from core.models import Seller, Transaction
+
+ENDPOINTS = {
+    'me': ('get', 'seller/me/', None),
+    'transactions': ('get', 'request/transaction/', {'page_size': 50}),
+    'charge': ('post', 'request/charge-phone-number',
+               {'phone_number': '+989110000000', 'amount': '1.00'}),
+}
+
+
+def _percentile(latencies, fraction):
+    index = min(len(latencies) - 1, int(len(latencies) * fraction))
+    return latencies[index] * 1000
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the async views."""
+    help = ('Send the same requests through the WSGI handler from threads '
+            'and through the ASGI handler from concurrent tasks, report '
+            'requests/s and latency of both.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS,
+                            default=list(ENDPOINTS))
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=[1, 16, 64],
+                            help='Threads for WSGI, tasks for ASGI.')
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        seller = Seller.objects.create_user(
+            email='bench-async-views@example.com',
+            credit=Decimal('1000000.00'))
+        token = Token.objects.create(user=seller)
+        Transaction.objects.bulk_create([
+            Transaction(
+                seller=seller,
+                amount=Decimal('1.00'),
+                credit_before_transaction=Decimal(i),
+                credit_after_transaction=Decimal(i + 1),
+                type=Transaction.Type.DEPOSIT
+            ) for i in range(100)
+        ])
+        headers = {'authorization': f'Token {token.key}'}
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS \
+            and settings.ALLOWED_HOSTS[0] != '*' else 'localhost'
+        try:
+            self.stdout.write('endpoint      handler  concurrency    req/s'
+                              '    p50ms    p99ms  errors')
+            for endpoint in options['endpoints']:
+                for concurrency in options['concurrency']:
+                    for handler, run in (('wsgi', self.run_wsgi),
+                                         ('asgi', self.run_asgi)):
+                        seconds, results = run(
+                            ENDPOINTS[endpoint], concurrency,
+                            options['requests'], headers, host)
+                        latencies = sorted(latency for latency, _ in results)
+                        errors = sum(status_code >= 400
+                                     for _, status_code in results)
+                        self.stdout.write(
+                            f'{endpoint:<14}{handler:<9}{concurrency:>11}'
+                            f'{len(results) / seconds:>9.0f}'
+                            f'{_percentile(latencies, 0.50):>9.2f}'
+                            f'{_percentile(latencies, 0.99):>9.2f}'
+                            f'{errors:>8}')
+        finally:
+            seller.delete()
+
+    def run_wsgi(self, endpoint, concurrency, requests, headers, host):
+        method, path, data = endpoint
+        results = []
+        lock = threading.Lock()
+        counts = iter(range(requests))
+
+        def work():
+            client = Client(raise_request_exception=False, SERVER_NAME=host)
+            send = getattr(client, method)
+            kwargs = {'content_type': 'application/json'} \
+                if method == 'post' else {}
+            try:
+                while True:
+                    with lock:
+                        if next(counts, None) is None:
+                            return
+                    started = time.perf_counter()
+                    response = send(f'/api/{path}', data, headers=headers,
+                                    **kwargs)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        results.append((elapsed, response.status_code))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, results
+
+    def run_asgi(self, endpoint, concurrency, requests, headers, host):
+        method, path, data = endpoint
+        results = []
+
+        async def work(counts):
+            client = AsyncClient(raise_request_exception=False,
+                                 SERVER_NAME=host)
+            send = getattr(client, method)
+            kwargs = {'content_type': 'application/json'} \
+                if method == 'post' else {}
+            for _ in counts:
+                started = time.perf_counter()
+                response = await send(f'/api/async/{path}', data,
+                                      headers=headers, **kwargs)
+                results.append((time.perf_counter() - started,
+                                response.status_code))
+
+        async def main():
+            counts = iter(range(requests))
+            await asyncio.gather(*[work(counts) for _ in range(concurrency)])
+
+        started = time.perf_counter()
+        asyncio.run(main())
+        return time.perf_counter() - started, results
@@ -0,0 +1,61 @@
+"""
+Django command to measure charge throughput against the bucket count.
+"""
+import threading
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from core.models import Seller
+from request.buckets import CreditBucketService
+from request.services import RequestService
+
+
+class Command(BaseCommand):
+    """Django command to benchmark sharded seller credit."""
+    help = 'Charge one seller from many threads for several bucket counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buckets', type=int, nargs='+',
+                            default=[0, 1, 2, 4, 8, 16])
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--charges', type=int, default=100,
+                            help='Charges per thread.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('buckets  charges/s')
+        with override_settings(CREDIT_BUCKETS={'ENABLED': True,
+                                               'PICK': 'random'}):
+            for bucket_count in options['buckets']:
+                rate = self.run(bucket_count, options['threads'],
+                                options['charges'])
+                self.stdout.write(f'{bucket_count:>7}  {rate:>9.1f}')
+
+    def run(self, bucket_count, thread_count, charges):
+        seller = Seller.objects.create_user(
+            email=f'bench-buckets-{bucket_count}@example.com',
+            credit=Decimal(thread_count * charges)
+        )
+        CreditBucketService().shard_seller_credit(seller.id, bucket_count)
+        service = RequestService()
+
+        def charge():
+            try:
+                for _ in range(charges):
+                    service.charge_phone_number(
+                        seller.id, '+989110000000', Decimal('1.00'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=charge)
+                   for _ in range(thread_count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        seller.delete()
+        return thread_count * charges / elapsed
@@ -0,0 +1,76 @@
+"""
+Django command to compare the read serializers with the values() fast path.
+"""
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from core.models import (
+    Seller,
+    CreditRequest,
+    Transaction
+)
+from request import serializers
+from request.read_serializers import ValuesSerializer
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the read serializers."""
+    help = 'Render the same rows through both read paths and report rows/s.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        seller = Seller.objects.create_user(
+            email='bench-read-serializers@example.com', name='Bench')
+        try:
+            Transaction.objects.bulk_create([
+                Transaction(
+                    seller=seller,
+                    amount=Decimal('1.00'),
+                    credit_before_transaction=Decimal(i),
+                    credit_after_transaction=Decimal(i + 1),
+                    type=Transaction.Type.DEPOSIT,
+                    detail=f'Bench-{i}'
+                ) for i in range(rows)
+            ], batch_size=1000)
+            CreditRequest.objects.bulk_create([
+                CreditRequest(seller=seller, amount=Decimal('1.00'))
+                for _ in range(rows)
+            ], batch_size=1000)
+
+            self.stdout.write('serializer          serializer rows/s  '
+                              'values rows/s  speedup')
+            for serializer_class, queryset in (
+                (serializers.TransactionSerializer,
+                 Transaction.objects.filter(seller=seller)),
+                (serializers.CreditRequestSerializer,
+                 CreditRequest.objects.with_transaction()
+                 .filter(seller=seller)),
+            ):
+                slow = self.measure(options['repeat'], lambda: JSONRenderer()
+                                    .render(serializer_class(
+                                        queryset, many=True).data))
+                values_serializer = ValuesSerializer(serializer_class)
+                fast = self.measure(options['repeat'], lambda: JSONRenderer()
+                                    .render(values_serializer.many(
+                                        queryset.values(
+                                            *values_serializer.columns))))
+                self.stdout.write(
+                    f'{serializer_class.__name__:<24}{rows / slow:>13.0f}'
+                    f'{rows / fast:>15.0f}{slow / fast:>9.1f}x')
+        finally:
+            seller.delete()
+
+    def measure(self, repeat, render):
+        """return the best time of `repeat` renders."""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,357 @@
+"""
+Django command to benchmark RequestService under concurrent load.
+"""
+import bisect
+import itertools
+import json
+import multiprocessing
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+from core.models import (
+    Seller,
+    CreditRequest,
+    Transaction
+)
+from request.leasing import get_outstanding_credit
+from request.reconciliation import reconcile_seller
+from request.services import RequestService
+
+OPERATIONS = ['charge', 'accept', 'reject']
+
+# upper bounds of the latency histogram buckets, in milliseconds.
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+CHARGE_AMOUNT = Decimal('1.00')
+CREDIT_REQUEST_AMOUNT = Decimal('5.00')
+
+
+def _percentile(latencies, fraction):
+    if not latencies:
+        return None
+    index = min(len(latencies) - 1, int(len(latencies) * fraction))
+    return round(latencies[index] * 1000, 3)
+
+
+def _histogram(latencies):
+    counts = Counter(bisect.bisect_left(HISTOGRAM_BOUNDS, latency * 1000)
+                     for latency in latencies)
+    labels = [f'<={bound}ms' for bound in HISTOGRAM_BOUNDS] \
+        + [f'>{HISTOGRAM_BOUNDS[-1]}ms']
+    return {label: counts[i] for i, label in enumerate(labels) if counts[i]}
+
+
+def _run(operation, seller_id, request_id, max_retries, stats):
+    """run one operation, retrying it after deadlocks and lock timeouts."""
+    service = RequestService()
+    for attempt in itertools.count():
+        started = time.perf_counter()
+        try:
+            if operation == 'charge':
+                service.charge_phone_number(
+                    seller_id, '+989110000000', CHARGE_AMOUNT)
+            elif operation == 'accept':
+                service.accept_credit_request(request_id)
+            else:
+                service.reject_credit_request(request_id)
+        except Seller.InsufficientCreditError:
+            # a rejected charge is neither throughput nor a latency sample.
+            stats['insufficient_credit'] += 1
+            return
+        except CreditRequest.AlreadyProcessedError:
+            stats['already_processed'] += 1
+            return
+        except OperationalError as exc:
+            message = str(exc).lower()
+            stats['deadlocks' if 'deadlock' in message
+                  else 'lock_timeouts'] += 1
+            if attempt < max_retries:
+                stats['retries'] += 1
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+                continue
+            stats['failures'] += 1
+            return
+        stats['latencies'][operation].append(
+            time.perf_counter() - started)
+        stats[f'{operation}_done'] += 1
+        return
+
+
+def _worker(args):
+    """run the operations of one process over `threads` threads."""
+    schedules, max_retries = args
+    stats = Counter()
+    stats['latencies'] = {operation: [] for operation in OPERATIONS}
+    stats['lock_wait'] = 0.0
+    stats_lock = threading.Lock()
+
+    def observe(seller_id, seconds):
+        with stats_lock:
+            stats['lock_wait'] += seconds
+            stats['locks'] += 1
+
+    def run(schedule):
+        thread_stats = Counter()
+        thread_stats['latencies'] = {operation: []
+                                     for operation in OPERATIONS}
+        try:
+            for operation, seller_id, request_id in schedule:
+                _run(operation, seller_id, request_id, max_retries,
+                     thread_stats)
+        finally:
+            connection.close()
+        with stats_lock:
+            for operation, latencies in \
+                    thread_stats.pop('latencies').items():
+                stats['latencies'][operation].extend(latencies)
+            stats.update(thread_stats)
+
+    service = RequestService()
+    service.add_lock_observer(observe)
+    try:
+        threads = [threading.Thread(target=run, args=(schedule,))
+                   for schedule in schedules]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        service.remove_lock_observer(observe)
+    return stats
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the request service."""
+    help = ('Drive charge_phone_number, accept_credit_request and '
+            'reject_credit_request from many threads and processes, '
+            'report throughput, latency, lock wait and deadlocks, and '
+            'check the seller credit invariants.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, nargs='+', default=[8],
+                            help='Threads per process.')
+        parser.add_argument('--processes', type=int, nargs='+', default=[1])
+        parser.add_argument('--zipf-s', type=float, nargs='+', default=[0.0],
+                            help='Seller skew, 0 is uniform.')
+        parser.add_argument('--charge-mode', nargs='+',
+                            choices=['locking', 'conditional'],
+                            default=['locking'])
+        parser.add_argument('--sellers', type=int, default=100)
+        parser.add_argument('--operations', type=int, default=200,
+                            help='Operations per thread.')
+        parser.add_argument('--mix', default='charge=70,accept=20,reject=10',
+                            help='Weights of the operations.')
+        parser.add_argument('--credit', type=Decimal,
+                            default=Decimal('1000.00'))
+        parser.add_argument('--max-retries', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true',
+                            help='Print the full report as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            mix = {operation: int(weight) for operation, weight in (
+                item.split('=') for item in options['mix'].split(','))}
+        except ValueError:
+            raise CommandError('--mix takes operation=weight pairs.')
+        unknown = set(mix) - set(OPERATIONS)
+        if unknown:
+            raise CommandError(f'Unknown operations: {", ".join(unknown)}')
+        options['mix'] = mix
+
+        reports = []
+        for charge_mode, processes, threads, zipf_s in itertools.product(
+                options['charge_mode'], options['processes'],
+                options['threads'], options['zipf_s']):
+            with override_settings(CHARGE_MODE=charge_mode):
+                report = self.bench(processes, threads, zipf_s, options)
+            report.update(charge_mode=charge_mode, processes=processes,
+                          threads=threads, zipf_s=zipf_s)
+            reports.append(report)
+            if not options['json']:
+                self.write_row(report, header=len(reports) == 1)
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+        failed = [report for report in reports if report['violations']]
+        if failed:
+            raise CommandError(
+                'Credit invariants violated: '
+                + json.dumps([report['violations'] for report in failed]))
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {len(reports)} configurations, invariants hold.'))
+
+    def write_row(self, report, header):
+        if header:
+            self.stdout.write(
+                'mode         procs threads zipf    ops/s   p50ms   p95ms'
+                '   p99ms  lockwait%  deadlocks  timeouts  retries'
+                '  rejected')
+        latency = report['latency']['all']
+        self.stdout.write(
+            f'{report["charge_mode"]:<12}{report["processes"]:>6}'
+            f'{report["threads"]:>8}{report["zipf_s"]:>5.1f}'
+            f'{report["operations_per_second"]:>9.0f}'
+            f'{latency["p50"] or 0:>8.2f}{latency["p95"] or 0:>8.2f}'
+            f'{latency["p99"] or 0:>8.2f}'
+            f'{report["lock_wait_percent"]:>11.1f}'
+            f'{report["deadlocks"]:>11}{report["lock_timeouts"]:>10}'
+            f'{report["retries"]:>9}{report["insufficient_credit"]:>10}')
+
+    def bench(self, processes, threads, zipf_s, options):
+        Seller.objects.bulk_create([
+            Seller(email=f'bench-service-{i}@example.com',
+                   credit=options['credit'])
+            for i in range(options['sellers'])
+        ])
+        seller_ids = list(Seller.objects.filter(
+            email__startswith='bench-service-')
+            .order_by('id').values_list('id', flat=True))
+        try:
+            schedules = self.schedule(seller_ids, processes * threads,
+                                      zipf_s, options)
+            started = time.perf_counter()
+            if processes > 1:
+                # forked workers must not share the parent's connections.
+                connections.close_all()
+                context = multiprocessing.get_context('fork')
+                with context.Pool(processes) as pool:
+                    results = pool.map(_worker, [
+                        (schedules[i * threads:(i + 1) * threads],
+                         options['max_retries'])
+                        for i in range(processes)])
+            else:
+                results = [_worker((schedules, options['max_retries']))]
+            seconds = time.perf_counter() - started
+            return self.report(results, seconds, processes * threads,
+                               seller_ids, options)
+        finally:
+            Seller.objects.filter(id__in=seller_ids).delete()
+
+    def schedule(self, seller_ids, workers, zipf_s, options):
+        """
+        return the operations of every thread.
+
+        Sellers are drawn from a Zipf distribution, a few sellers get most
+        of the operations when `zipf_s` is above 0. Every accept and
+        reject gets its own pending credit request.
+        """
+        rng = random.Random(options['seed'])
+        hot = rng.sample(seller_ids, len(seller_ids))
+        cumulative = list(itertools.accumulate(
+            1 / rank ** zipf_s for rank in range(1, len(hot) + 1)))
+        operations, weights = zip(*options['mix'].items())
+
+        schedules = []
+        credit_requests = []
+        for _ in range(workers):
+            schedule = []
+            for _ in range(options['operations']):
+                operation = rng.choices(operations, weights)[0]
+                seller_id = hot[bisect.bisect(
+                    cumulative, rng.random() * cumulative[-1])]
+                if operation != 'charge':
+                    credit_requests.append(CreditRequest(
+                        seller_id=seller_id, amount=CREDIT_REQUEST_AMOUNT))
+                schedule.append([operation, seller_id, None])
+            schedules.append(schedule)
+
+        credit_requests = iter(RequestService()._bulk_create_for_sellers(
+            CreditRequest, credit_requests))
+        for schedule in schedules:
+            for item in schedule:
+                if item[0] != 'charge':
+                    item[2] = next(credit_requests).id
+        return schedules
+
+    def report(self, results, seconds, workers, seller_ids, options):
+        stats = Counter()
+        latencies = {operation: [] for operation in OPERATIONS}
+        lock_wait = 0.0
+        for result in results:
+            for operation, values in result.pop('latencies').items():
+                latencies[operation].extend(values)
+            lock_wait += result.pop('lock_wait')
+            stats.update(result)
+        latencies['all'] = list(itertools.chain(*latencies.values()))
+
+        done = sum(stats[f'{operation}_done'] for operation in OPERATIONS)
+        report = {
+            'seconds': round(seconds, 3),
+            'operations': done,
+            'operations_per_second': done / seconds if seconds else 0,
+            'insufficient_credit': stats['insufficient_credit'],
+            'already_processed': stats['already_processed'],
+            'deadlocks': stats['deadlocks'],
+            'lock_timeouts': stats['lock_timeouts'],
+            'retries': stats['retries'],
+            'failures': stats['failures'],
+            'locks': stats['locks'],
+            'lock_wait_seconds': round(lock_wait, 3),
+            'lock_wait_percent': 100 * lock_wait / (seconds * workers)
+            if seconds else 0,
+            'latency': {},
+        }
+        for operation, values in latencies.items():
+            values.sort()
+            report['latency'][operation] = {
+                'count': len(values),
+                'p50': _percentile(values, 0.50),
+                'p95': _percentile(values, 0.95),
+                'p99': _percentile(values, 0.99),
+                'histogram': _histogram(values),
+            }
+        report['violations'] = self.check_invariants(seller_ids, stats, options)
+        return report
+
+    def check_invariants(self, seller_ids, stats, options):
+        """return the violated credit invariants of the bench sellers."""
+        violations = []
+
+        def violation(check, expected, actual, seller=None):
+            violations.append({'seller': seller, 'check': check,
+                               'expected': str(expected),
+                               'actual': str(actual)})
+
+        requests = CreditRequest.objects.filter(seller_id__in=seller_ids) \
+            .with_transaction()
+        for status, operation in ((CreditRequest.Status.ACCEPTED, 'accept'),
+                                  (CreditRequest.Status.REJECTED, 'reject')):
+            count = requests.filter(status=status).count()
+            if count != stats[f'{operation}_done']:
+                violation(f'{operation}ed requests',
+                          stats[f'{operation}_done'], count)
+        charges = Transaction.objects.filter(
+            seller_id__in=seller_ids, type=Transaction.Type.WITHDRAW).count()
+        if charges != stats['charge_done']:
+            violation('charges', stats['charge_done'], charges)
+        for request in requests:
+            accepted = request.status == CreditRequest.Status.ACCEPTED
+            if (request.transaction is not None) != accepted:
+                violation('credit request transaction', accepted,
+                          request.transaction, request.seller_id)
+
+        for seller in Seller.objects.filter(id__in=seller_ids):
+            credit = seller.credit + get_outstanding_credit(seller.id)
+            deposits = sum(requests.filter(
+                seller_id=seller.id, status=CreditRequest.Status.ACCEPTED
+            ).values_list('amount', flat=True))
+            charges = sum(Transaction.objects.filter(
+                seller_id=seller.id, type=Transaction.Type.WITHDRAW
+            ).values_list('amount', flat=True))
+            expected = options['credit'] + deposits + charges
+            if credit != expected:
+                violation('credit', expected, credit, seller.id)
+            if credit < 0:
+                violation('non negative credit', 0, credit, seller.id)
+            result = reconcile_seller(seller.id, 10000, full=True)
+            for discrepancy in result['discrepancies']:
+                violation(f'ledger {discrepancy["kind"]}',
+                          discrepancy['expected'], discrepancy['actual'],
+                          seller.id)
+        return violations
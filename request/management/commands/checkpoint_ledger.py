@@ -0,0 +1,25 @@
+"""
+Django command to add balance checkpoints to the seller ledgers.
+"""
+from django.core.management.base import BaseCommand
+from core.models import Seller
+from request.ledger import LedgerService
+
+
+class Command(BaseCommand):
+    """Django command to checkpoint seller ledgers."""
+    help = 'Add the balance checkpoints missing from the seller ledgers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('seller_ids', nargs='*', type=int,
+                            help='Sellers to checkpoint, all by default.')
+
+    def handle(self, *args, **options):
+        seller_ids = options['seller_ids'] or Seller.objects \
+            .order_by('id').values_list('id', flat=True).iterator()
+        service = LedgerService()
+        count = 0
+        for seller_id in seller_ids:
+            count += len(service.checkpoint(seller_id))
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {count} balance checkpoints.'))
@@ -0,0 +1,26 @@
+"""
+Django command to delete old idempotency keys.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Django command to purge idempotency keys."""
+    help = 'Delete idempotency keys older than the retention period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int,
+            default=settings.IDEMPOTENCY['RETENTION_SECONDS'],
+            help='Age in seconds of the keys to delete.')
+
+    def handle(self, *args, **options):
+        deadline = timezone.now() - timedelta(seconds=options['older_than'])
+        count, _ = IdempotencyKey.objects.filter(
+            created_at__lt=deadline).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {count} idempotency keys.'))
@@ -0,0 +1,28 @@
+"""
+Django command to even out the credit buckets of sellers.
+"""
+from django.core.management.base import BaseCommand
+from core.models import Seller
+from request.buckets import CreditBucketService
+
+
+class Command(BaseCommand):
+    """Django command to rebalance credit buckets."""
+    help = 'Even out credit buckets and refresh the aggregated Seller.credit.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seller', type=int, action='append',
+                            help='Only rebalance these sellers.')
+
+    def handle(self, *args, **options):
+        sellers = Seller.objects.filter(credit_bucket_count__gt=0)
+        if options['seller']:
+            sellers = sellers.filter(id__in=options['seller'])
+
+        service = CreditBucketService()
+        count = 0
+        for seller_id in sellers.values_list('id', flat=True).iterator():
+            service.rebalance(seller_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebalanced credit buckets of {count} sellers.'))
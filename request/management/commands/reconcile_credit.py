@@ -0,0 +1,70 @@
+"""
+Django command to reconcile seller credit against the ledger.
+"""
+import json
+import multiprocessing
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.models import Seller
+from request.reconciliation import reconcile_seller
+
+
+def _reconcile(args):
+    return reconcile_seller(*args)
+
+
+class Command(BaseCommand):
+    """Django command to reconcile seller credit."""
+    help = ('Check Seller.credit against the sum of the ledger and the '
+            'credit_before/credit_after chain, print a JSON report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('seller_ids', nargs='*', type=int,
+                            help='Sellers to reconcile, all by default.')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of processes reconciling sellers in parallel.')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.RECONCILIATION['CHUNK_SIZE'],
+            help='Number of transactions fetched per query.')
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Reconcile from the first transaction, ignoring the marks.')
+
+    def handle(self, *args, **options):
+        seller_ids = options['seller_ids'] or list(
+            Seller.objects.order_by('id').values_list('id', flat=True))
+        tasks = [(seller_id, options['chunk_size'], options['full'])
+                 for seller_id in seller_ids]
+
+        started = time.monotonic()
+        if options['workers'] > 1:
+            # forked workers must not share the parent's connections.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['workers']) as pool:
+                results = list(pool.imap_unordered(_reconcile, tasks))
+        else:
+            results = [_reconcile(task) for task in tasks]
+        seconds = time.monotonic() - started
+
+        transactions = sum(result['transactions'] for result in results)
+        report = {
+            'sellers': len(results),
+            'transactions': transactions,
+            'seconds': round(seconds, 3),
+            'transactions_per_second': round(transactions / seconds)
+            if seconds else None,
+            'workers': options['workers'],
+            'full': options['full'],
+            'discrepancy_count': sum(result['discrepancy_count']
+                                     for result in results),
+            'discrepancies': [discrepancy for result in sorted(
+                results, key=lambda result: result['seller'])
+                for discrepancy in result['discrepancies']],
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,32 @@
+"""
+Django command to return credit leases abandoned by dead workers.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import CreditLease
+from request.leasing import release_lease
+
+
+class Command(BaseCommand):
+    """Django command to release expired credit leases."""
+    help = 'Return the unused credit of leases that expired a grace period ago.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int,
+            default=settings.CREDIT_LEASING['TTL_SECONDS'],
+            help='Seconds a lease may stay active after it expired.')
+
+    def handle(self, *args, **options):
+        deadline = timezone.now() - timedelta(seconds=options['grace'])
+        leases = CreditLease.objects.filter(
+            status=CreditLease.Status.ACTIVE, expires_at__lt=deadline)
+
+        count = 0
+        for lease_id in leases.values_list('id', flat=True):
+            release_lease(lease_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Released {count} credit leases.'))
@@ -0,0 +1,39 @@
+"""
+Django command to charge the jobs queued by the async charge API.
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from request.queue import ChargeQueue
+
+
+class Command(BaseCommand):
+    """Django command to drain the charge queue."""
+    help = 'Claim queued charge jobs with SKIP LOCKED and charge them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help='Seconds to sleep while the queue is empty.')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Requeue jobs claimed this many seconds ago.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        queue = ChargeQueue()
+        processed = 0
+        while True:
+            close_old_connections()
+            queue.requeue_stale(options['stale_after'])
+            jobs = queue.claim(options['batch_size'])
+            if jobs:
+                queue.process(jobs)
+                processed += len(jobs)
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} charge jobs.'))
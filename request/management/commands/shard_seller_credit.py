@@ -0,0 +1,27 @@
+"""
+Django command to split a seller's credit across credit buckets.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from request.buckets import CreditBucketService
+
+
+class Command(BaseCommand):
+    """Django command to shard seller credit."""
+    help = 'Split the credit of a seller across N credit buckets, 0 merges them back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('seller_id', type=int)
+        parser.add_argument('bucket_count', type=int)
+
+    def handle(self, *args, **options):
+        if options['bucket_count'] < 0:
+            raise CommandError('bucket_count can not be negative.')
+        try:
+            CreditBucketService().shard_seller_credit(
+                options['seller_id'], options['bucket_count'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f'Seller {options["seller_id"]} now has '
+            f'{options["bucket_count"]} credit buckets.'))
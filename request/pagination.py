@@ -0,0 +1,138 @@
+"""
+Pagination classes for requests API Views.
+"""
+import base64
+import binascii
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest first pagination over (`time_field`, id).
+
+    The cursor holds the position of the last row of the previous page,
+    so every page is one index range scan of `page_size` + 1 rows no
+    matter how deep it is, and no COUNT(*) is run.
+    """
+    time_field = None
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset fetching the page with the async ORM."""
+        return self.set_page(
+            [row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_page_queryset(self, queryset, request):
+        """return the unevaluated query of the page, one row past it."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(f'-{self.time_field}', '-id')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            time, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{self.time_field}__lt': time})
+                | Q(**{self.time_field: time, 'id__lt': pk})
+            )
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        """keep the position of the page fetched, return its rows."""
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, row):
+        """return the (time, id) of a model instance or a values() row."""
+        if isinstance(row, dict):
+            return row[self.time_field], row['id']
+        return getattr(row, self.time_field), row.id
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        time, pk = self.get_position(self.last_row)
+        cursor = base64.urlsafe_b64encode(
+            json.dumps([time.isoformat(), pk]).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            time, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            time = parse_datetime(time)
+            pk = int(pk)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if time is None:
+            raise NotFound(self.invalid_cursor_message)
+        return time, pk
+
+
+class TransactionPagination(KeysetPagination):
+    time_field = 'transaction_time'
+
+
+class CreditRequestPagination(KeysetPagination):
+    time_field = 'request_time'
@@ -0,0 +1,128 @@
+"""Database-backed work queue for asynchronous charges."""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from core.models import (
+    Seller,
+    ChargeJob
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ChargeQueue:
+    """
+    A singleton service providing methods for
+        - Enqueueing charges accepted by the API
+        - Claiming queued charges with SELECT ... FOR UPDATE SKIP LOCKED
+        - Charging claimed jobs grouped by seller.
+
+    A job's charge and its final status are committed together, so a
+    worker dying between claim and commit leaves the job in Processing
+    and `requeue_stale` puts it back in the queue. A worker only charges
+    jobs still holding its own claim, a job requeued while a slow worker
+    had it is charged by whoever claimed it last.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ChargeQueue, cls).__new__(cls)
+        return cls._instance
+
+    def enqueue(self, seller_id, phone_number, amount):
+        """save a charge for the workers."""
+        return ChargeJob.objects.create(
+            seller_id=seller_id,
+            phone_number=phone_number,
+            amount=amount
+        )
+
+    def claim(self, batch_size):
+        """claim up to `batch_size` queued jobs for this worker."""
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = list(ChargeJob.objects
+                        .select_for_update(skip_locked=True)
+                        .filter(status=ChargeJob.Status.QUEUED)
+                        .order_by('id')[:batch_size])
+            ChargeJob.objects.filter(id__in=[job.id for job in jobs]).update(
+                status=ChargeJob.Status.PROCESSING,
+                claimed_at=now
+            )
+        for job in jobs:
+            job.status = ChargeJob.Status.PROCESSING
+            job.claimed_at = now
+        return jobs
+
+    def requeue_stale(self, seconds):
+        """put back jobs claimed more than `seconds` ago and not finished."""
+        return ChargeJob.objects.filter(
+            status=ChargeJob.Status.PROCESSING,
+            claimed_at__lt=timezone.now() - timedelta(seconds=seconds)
+        ).update(status=ChargeJob.Status.QUEUED, claimed_at=None)
+
+    def process(self, jobs):
+        """charge claimed jobs, one transaction and seller lock per seller."""
+        from request.services import RequestService
+        service = RequestService()
+
+        jobs_by_seller = defaultdict(list)
+        for job in jobs:
+            jobs_by_seller[job.seller_id].append(job)
+
+        for seller_id, seller_jobs in jobs_by_seller.items():
+            try:
+                with transaction.atomic():
+                    owned = self._lock_owned(seller_jobs)
+                    if not owned:
+                        continue
+                    results = service.bulk_charge_phone_numbers(
+                        seller_id,
+                        [{'phone_number': job.phone_number,
+                          'amount': job.amount} for job in owned],
+                        all_or_nothing=False
+                    )
+                    self._finish(owned, results)
+            except Seller.DoesNotExist as exc:
+                with transaction.atomic():
+                    owned = self._lock_owned(seller_jobs)
+                    self._finish(owned, [exc] * len(owned))
+            except Exception:
+                logger.exception('Charging the jobs of seller %s failed, '
+                                 'releasing them.', seller_id)
+                self._release(seller_jobs)
+
+    def _lock_owned(self, jobs):
+        """lock the `jobs` still claimed by this worker, in id order."""
+        claims = {job.id: job.claimed_at for job in jobs}
+        locked = ChargeJob.objects.select_for_update() \
+            .filter(id__in=claims, status=ChargeJob.Status.PROCESSING) \
+            .order_by('id')
+        return [job for job in locked if job.claimed_at == claims[job.id]]
+
+    def _release(self, jobs):
+        """put the `jobs` still claimed by this worker back in the queue."""
+        for job in jobs:
+            ChargeJob.objects.filter(
+                id=job.id,
+                status=ChargeJob.Status.PROCESSING,
+                claimed_at=job.claimed_at
+            ).update(status=ChargeJob.Status.QUEUED, claimed_at=None)
+
+    def _finish(self, jobs, results):
+        """record the outcome of each job."""
+        now = timezone.now()
+        for job, result in zip(jobs, results):
+            job.processed_at = now
+            if isinstance(result, Exception):
+                job.status = ChargeJob.Status.FAILED
+                job.error = getattr(result, 'message', None) \
+                    or result.__class__.__name__
+            else:
+                job.status = ChargeJob.Status.SUCCEEDED
+                job.transaction = result
+        ChargeJob.objects.bulk_update(
+            jobs, ['status', 'transaction', 'error', 'processed_at'])
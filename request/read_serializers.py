@@ -0,0 +1,160 @@
+"""
+Read only fast path for the list and retrieve APIs.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+def _decimal_converter(field):
+    exponent = -field.decimal_places
+
+    def convert(value):
+        if value.as_tuple().exponent == exponent:
+            return '{:f}'.format(value)
+        return field.to_representation(value)
+    return convert
+
+
+def _datetime_converter(tz):
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field):
+    """
+    return a function giving the output of `field` for a database value.
+
+    None stands for the identity, values() rows already hold what the
+    field would output.
+    """
+    if isinstance(field, serializers.DecimalField):
+        coerce_to_string = getattr(field, 'coerce_to_string',
+                                   api_settings.COERCE_DECIMAL_TO_STRING)
+        if not coerce_to_string or field.localize:
+            return field.to_representation
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        tz = getattr(field, 'timezone', None) or field.default_timezone()
+        if not isinstance(output_format, str) \
+                or output_format.lower() != ISO_8601 or tz is None:
+            return field.to_representation
+        return _datetime_converter(tz)
+    if isinstance(field, serializers.ChoiceField):
+        choices = field.choice_strings_to_values
+        return lambda value: choices.get(str(value), value)
+    if isinstance(field, (serializers.CharField,
+                          serializers.IntegerField,
+                          serializers.BooleanField,
+                          serializers.PrimaryKeyRelatedField)):
+        return None
+    raise ImproperlyConfigured(
+        f'{field.__class__.__name__} is not supported by ValuesSerializer.')
+
+
+class ValuesSerializer:
+    """
+    Turn `.values()` rows into the output of a read serializer.
+
+    The plan of columns and converters is built once from the fields of
+    `serializer_class`, nested serializers become joined columns so no
+    query is run per row. `fields` limits the top level fields.
+    """
+
+    def __init__(self, serializer_class, fields=None, context=None):
+        serializer = serializer_class(context=context or {})
+        readable = {name: field for name, field in serializer.fields.items()
+                    if not field.write_only}
+        if fields is not None:
+            unknown = [name for name in fields if name not in readable]
+            if unknown:
+                raise ValidationError(
+                    {'fields': f'Unknown fields: {", ".join(unknown)}'})
+            readable = {name: field for name, field in readable.items()
+                        if name in fields}
+        self.columns = []
+        self.plan = self._build(readable, '')
+
+    def _build(self, fields, prefix):
+        plan = []
+        for name, field in fields.items():
+            column = prefix + field.source.replace('.', '__')
+            if isinstance(field, serializers.BaseSerializer):
+                nested = {name: field for name, field in field.fields.items()
+                          if not field.write_only}
+                self.columns.append(f'{column}__pk')
+                plan.append((name, f'{column}__pk',
+                             self._build(nested, f'{column}__')))
+            else:
+                self.columns.append(column)
+                plan.append((name, column, _converter(field)))
+        return plan
+
+    def _represent(self, plan, row):
+        data = {}
+        for name, column, convert in plan:
+            value = row[column]
+            if isinstance(convert, list):
+                data[name] = None if value is None \
+                    else self._represent(convert, row)
+            elif value is not None and convert is not None:
+                data[name] = convert(value)
+            else:
+                data[name] = value
+        return data
+
+    def to_representation(self, row):
+        return self._represent(self.plan, row)
+
+    def many(self, rows):
+        return [self._represent(self.plan, row) for row in rows]
+
+
+class FastReadMixin:
+    """
+    Serve list and retrieve from `.values()` rows.
+
+    The output matches `serializer_class`, a comma separated `fields`
+    query parameter picks a subset of the fields.
+    """
+    fields_query_param = 'fields'
+
+    def get_values_serializer(self):
+        fields = self.request.query_params.get(self.fields_query_param)
+        if fields is not None:
+            fields = [name for name in fields.split(',') if name]
+        return ValuesSerializer(self.get_serializer_class(), fields,
+                                self.get_serializer_context())
+
+    def get_values_queryset(self, serializer):
+        columns = ['id', *serializer.columns]
+        time_field = getattr(self.paginator, 'time_field', None)
+        if time_field is not None:
+            columns.append(time_field)
+        return self.filter_queryset(self.get_queryset()) \
+            .values(*dict.fromkeys(columns))
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        queryset = self.get_values_queryset(serializer)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            self.get_values_queryset(serializer),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(serializer.to_representation(row))
@@ -0,0 +1,159 @@
+"""Reconciliation of seller credit against the ledger."""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.models import (
+    Seller,
+    ReconciliationMark,
+    Transaction
+)
+from request.buckets import CreditBucketService
+from request.leasing import get_outstanding_credit
+
+MAX_DISCREPANCIES = 100
+
+
+def _cents(value):
+    return int(value * 100)
+
+
+def _amount(cents):
+    return str(Decimal(cents).scaleb(-2))
+
+
+class _Ledger:
+    """The running state of a seller ledger being reconciled."""
+
+    def __init__(self, seller_id, mark=None):
+        self.seller_id = seller_id
+        self.last_id = 0
+        self.balance = None
+        self.tails = {}
+        if mark is not None:
+            self.last_id = mark.last_transaction_id
+            if mark.credit is not None:
+                self.balance = _cents(mark.credit)
+            self.tails = {key: _cents(Decimal(value))
+                          for key, value in mark.chain.items()}
+        self.transactions = 0
+        self.discrepancy_count = 0
+        self.discrepancies = []
+        self.settle()
+
+    def settle(self):
+        """remember the current state as the one the mark moves to."""
+        self.settled = self.last_id, self.balance, dict(self.tails)
+
+    def report(self, kind, transaction_id=None, bucket=None,
+               expected=None, actual=None):
+        self.discrepancy_count += 1
+        if len(self.discrepancies) < MAX_DISCREPANCIES:
+            self.discrepancies.append({
+                'seller': self.seller_id,
+                'transaction': transaction_id,
+                'bucket': bucket,
+                'kind': kind,
+                'expected': expected,
+                'actual': actual,
+            })
+
+    def check(self, rows):
+        """check a chunk of rows in id order as whole columns."""
+        ids, amounts, befores, afters, buckets = zip(*rows)
+        amounts = [_cents(value) for value in amounts]
+        befores = [_cents(value) for value in befores]
+        afters = [_cents(value) for value in afters]
+
+        if self.balance is None:
+            self.balance = befores[0]
+        self.balance += sum(amounts)
+        self.transactions += len(ids)
+
+        for i in [i for i, (amount, before, after)
+                  in enumerate(zip(amounts, befores, afters))
+                  if after - before != amount]:
+            self.report('amount', ids[i], buckets[i],
+                        _amount(afters[i] - befores[i]), _amount(amounts[i]))
+
+        # credit_before of a row continues credit_after of the previous
+        # row written against the same credit bucket.
+        positions = defaultdict(list)
+        for i, bucket in enumerate(buckets):
+            positions['' if bucket is None else str(bucket)].append(i)
+        for key, indexes in positions.items():
+            previous = [self.tails.get(key)] + [afters[i] for i in indexes[:-1]]
+            for i, tail in zip(indexes, previous):
+                if tail is not None and befores[i] != tail:
+                    self.report('chain', ids[i], buckets[i],
+                                _amount(tail), _amount(befores[i]))
+            self.tails[key] = afters[indexes[-1]]
+        self.last_id = ids[-1]
+
+    def save_mark(self):
+        last_id, balance, tails = self.settled
+        values = {
+            'last_transaction_id': last_id,
+            'credit': None if balance is None else Decimal(balance).scaleb(-2),
+            'chain': {key: _amount(value) for key, value in tails.items()},
+            'updated_at': timezone.now(),
+        }
+        if not ReconciliationMark.objects.filter(
+                seller_id=self.seller_id).update(**values):
+            ReconciliationMark.objects.create(seller_id=self.seller_id,
+                                              **values)
+
+
+def reconcile_seller(seller_id, chunk_size, full=False):
+    """
+    Reconcile the ledger of a seller from its mark and move the mark.
+
+    The seller credit and its ledger are read in one transaction so that
+    they come from the same snapshot under REPEATABLE READ. The mark only
+    moves over chunks older than SETTLE_SECONDS, ids are allocated before
+    commit so a lower id may still show up in the newest rows.
+    """
+    settled = timezone.now() - timedelta(
+        seconds=settings.RECONCILIATION['SETTLE_SECONDS'])
+    with transaction.atomic():
+        mark = None
+        if not full:
+            mark = ReconciliationMark.objects \
+                .filter(seller_id=seller_id).first()
+        ledger = _Ledger(seller_id, mark)
+
+        seller = Seller.objects.only('credit', 'credit_bucket_count') \
+            .get(id=seller_id)
+        if seller.credit_bucket_count:
+            credit = CreditBucketService().get_credit(seller_id)
+        else:
+            credit = seller.credit or Decimal('0')
+        credit += get_outstanding_credit(seller_id)
+
+        rows = Transaction.objects.filter(seller_id=seller_id).order_by('id')
+        settling = True
+        while True:
+            chunk = list(rows.filter(id__gt=ledger.last_id).values_list(
+                'id', 'amount', 'credit_before_transaction',
+                'credit_after_transaction', 'credit_bucket',
+                'transaction_time')[:chunk_size])
+            if not chunk:
+                break
+            ledger.check([row[:5] for row in chunk])
+            settling = settling and max(row[5] for row in chunk) < settled
+            if settling:
+                ledger.settle()
+
+        if ledger.balance is not None and ledger.balance != _cents(credit):
+            ledger.report('balance', expected=_amount(ledger.balance),
+                          actual=str(credit))
+    ledger.save_mark()
+
+    return {
+        'seller': seller_id,
+        'transactions': ledger.transactions,
+        'discrepancy_count': ledger.discrepancy_count,
+        'discrepancies': ledger.discrepancies,
+    }
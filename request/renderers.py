@@ -0,0 +1,37 @@
+"""
+Renderers for the streamed ledger exports.
+
+The export itself streams its rows, these renderers take part in
+content negotiation and render error responses.
+"""
+import csv
+import io
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data) + '\n').encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """Render an error as a header line of its keys and a line of values."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(data)
+        writer.writerow([' '.join(map(str, value))
+                         if isinstance(value, list) else value
+                         for value in data.values()])
+        return output.getvalue().encode()
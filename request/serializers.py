@@ -2,8 +2,10 @@
 Serializers for requests API Views.
 """
 from rest_framework import serializers
+from django.conf import settings
 from django.core.validators import MinValueValidator
 from core.models import (
+    ChargeJob,
     CreditRequest,
     Transaction
 )
@@ -31,9 +33,10 @@ class AcceptCreditRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = ['id', 'request_id', 'seller', 'amount', 'credit_before_transaction',
-                  'credit_after_transaction', 'type', 'detail']
+                  'credit_after_transaction', 'type', 'credit_request', 'detail']
         read_only_fields = ['id', 'seller', 'amount', 'credit_before_transaction',
-                            'credit_after_transaction', 'type', 'detail']
+                            'credit_after_transaction', 'type', 'credit_request',
+                            'detail']
 
 
 class RejectCreditRequestSerializer(serializers.ModelSerializer):
@@ -49,6 +52,14 @@ class RejectCreditRequestSerializer(serializers.ModelSerializer):
         read_only_fields = ['seller', 'amount', 'request_time', 'status']
 
 
+class BulkCreditRequestSerializer(serializers.Serializer):
+    request_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_CREDIT_REQUEST_MAX_ITEMS
+    )
+
+
 class ChargePhoneNumberSerializer(serializers.ModelSerializer):
     phone_number = serializers.CharField(max_length=20, write_only=True)
 
@@ -56,7 +67,9 @@ class ChargePhoneNumberSerializer(serializers.ModelSerializer):
         model = Transaction
         fields = '__all__'
         read_only_fields = ['id', 'seller', 'credit_before_transaction',
-                            'credit_after_transaction', 'type', 'detail']
+                            'credit_after_transaction', 'type',
+                            'credit_bucket', 'charge_request',
+                            'credit_request', 'detail']
         extra_kwargs = {
             'amount': {
                 'validators': [
@@ -67,8 +80,37 @@ class ChargePhoneNumberSerializer(serializers.ModelSerializer):
         }
 
 
+class PendingChargeSerializer(serializers.Serializer):
+    status = serializers.SerializerMethodField()
+    lease = serializers.IntegerField(source='lease_id')
+    phone_number = serializers.CharField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+    def get_status(self, charge):
+        return 'pending'
+
+
+class ChargeItemSerializer(serializers.Serializer):
+    phone_number = serializers.CharField(max_length=20)
+    amount = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(limit_value=0.01)]
+    )
+
+
+class BulkChargePhoneNumberSerializer(serializers.Serializer):
+    charges = serializers.ListField(
+        child=ChargeItemSerializer(),
+        allow_empty=False,
+        max_length=settings.BULK_CHARGE_MAX_ITEMS
+    )
+    all_or_nothing = serializers.BooleanField(default=True)
+
+
 class CreditRequestSerializer(serializers.ModelSerializer):
     seller = SellerSerializer()
+    transaction = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CreditRequest
@@ -80,3 +122,46 @@ class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = '__all__'
+
+
+class BalanceSerializer(serializers.Serializer):
+    at = serializers.DateTimeField()
+    seller = serializers.IntegerField(required=False)
+    credit = serializers.DecimalField(max_digits=10, decimal_places=2,
+                                      read_only=True)
+
+
+class BalanceEventSerializer(serializers.Serializer):
+    credit = serializers.DecimalField(source='credit_after_transaction',
+                                      max_digits=10, decimal_places=2)
+    transaction_id = serializers.IntegerField(source='id')
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    type = serializers.CharField()
+
+
+class HotSellerSerializer(serializers.Serializer):
+    seller = serializers.IntegerField()
+    locks = serializers.IntegerField()
+    lock_wait_seconds = serializers.FloatField()
+    error_seconds = serializers.FloatField()
+    p50 = serializers.FloatField(allow_null=True)
+    p95 = serializers.FloatField(allow_null=True)
+    p99 = serializers.FloatField(allow_null=True)
+
+
+class ChargeJobSerializer(serializers.ModelSerializer):
+    transaction = TransactionSerializer(read_only=True)
+
+    class Meta:
+        model = ChargeJob
+        fields = '__all__'
+        read_only_fields = ['seller', 'status', 'error', 'created_at',
+                            'claimed_at', 'processed_at']
+        extra_kwargs = {
+            'amount': {
+                'validators': [
+                    MinValueValidator(
+                        limit_value=0.01)
+                ]
+            },
+        }
@@ -1,11 +1,27 @@
 """Services for request API Views."""
+import contextlib
+import threading
+from collections import defaultdict
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F
 from core.models import (
     Seller,
     CreditRequest,
     ChargeRequest,
     Transaction
 )
+from core.routers import pin_to_primary
+from request import locks
+from request.buckets import CreditBucketService
+from request.changes import transactions_written
+from request.coalescing import ChargeCoalescer
+from request.events import balance_changed
+from request.leasing import (
+    CreditLeaseManager,
+    get_outstanding_credit,
+    is_leased
+)
 
 
 class RequestService:
@@ -15,43 +31,111 @@ class RequestService:
         - Charge phone numbers.
     """
     _instance = None
+    _coalescer = None
+    _coalescer_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(RequestService, cls).__new__(cls)
         return cls._instance
 
+    def get_coalescer(self):
+        """return the charge coalescer, created on first use."""
+        with self._coalescer_lock:
+            if RequestService._coalescer is None:
+                config = settings.CHARGE_COALESCING
+                RequestService._coalescer = ChargeCoalescer(
+                    lambda seller_id, charges: self.bulk_charge_phone_numbers(
+                        seller_id, charges, all_or_nothing=False),
+                    window=config['WINDOW_MS'] / 1000,
+                    max_batch_size=config['MAX_BATCH_SIZE']
+                )
+            return RequestService._coalescer
+
+    def add_lock_observer(self, observer):
+        """
+        Call `observer(seller_id, seconds)` after every lock of seller,
+        credit bucket or credit lease rows, see request.locks.
+        """
+        locks.add_lock_observer(observer)
+
+    def remove_lock_observer(self, observer):
+        locks.remove_lock_observer(observer)
+
+    def _lock_seller(self, seller_id):
+        """lock the seller row and report the wait to the lock observers."""
+        with locks.timed_lock(seller_id):
+            return Seller.objects.get_queryset() \
+                .filter(id=seller_id).select_for_update().get()
+
     def create_credit_request(self, seller_id, amount):
         """save seller's credit request"""
-        request = CreditRequest.objects.create(
-            seller_id=seller_id,
+        pin_to_primary(seller_id)
+        with transaction.atomic():
+            request = CreditRequest.objects.create(
+                seller_id=seller_id,
+                amount=amount
+            )
+            Seller.objects.bump_version(seller_id)
+        return request
+
+    async def acreate_credit_request(self, seller, amount):
+        """save seller's credit request with the async ORM."""
+        pin_to_primary(seller.id)
+        request = await CreditRequest.objects.acreate(
+            seller=seller,
             amount=amount
         )
+        # bumped once the request is committed, so no version is ever
+        # handed out for data without it.
+        await Seller.objects.filter(id=seller.id) \
+            .aupdate(version=F('version') + 1)
         return request
 
+    def _ledger_offset(self, seller_id):
+        """
+        return the credit a seller has on top of Seller.credit.
+
+        Credit leased by workers is taken off Seller.credit but still
+        belongs to the seller, the ledger keeps counting it.
+        """
+        if is_leased(seller_id):
+            return get_outstanding_credit(seller_id)
+        return 0
+
     def ـdeposit(self, seller, request):
         """depositing to the seller credit."""
-        return Transaction.objects.create(
+        credit = seller.credit + self._ledger_offset(seller.id)
+        transactions_written(seller.id)
+        transaction_obj = Transaction.objects.create(
             seller=request.seller,
             amount=request.amount,
-            credit_before_transaction=seller.credit,
-            credit_after_transaction=seller.credit+request.amount,
+            credit_before_transaction=credit,
+            credit_after_transaction=credit+request.amount,
             type=Transaction.Type.DEPOSIT,
+            credit_request=request,
             detail=f'{request.__class__.__name__}-{request.id}'
         )
+        balance_changed(transaction_obj)
+        return transaction_obj
 
     def ـwithdraw(self, seller, request):
         """withdraw from seller credit."""
         if request.seller.credit < request.amount:
             raise Seller.InsufficientCreditError
-        return Transaction.objects.create(
+        credit = seller.credit + self._ledger_offset(seller.id)
+        transactions_written(seller.id)
+        transaction_obj = Transaction.objects.create(
             seller=seller,
             amount=-request.amount,
-            credit_before_transaction=seller.credit,
-            credit_after_transaction=seller.credit-request.amount,
+            credit_before_transaction=credit,
+            credit_after_transaction=credit-request.amount,
             type=Transaction.Type.WITHDRAW,
+            charge_request=request,
             detail=f'{request.__class__.__name__}-{request.id}'
         )
+        balance_changed(transaction_obj)
+        return transaction_obj
 
     def accept_credit_request(self, request_id):
         """accept credit request and add requested amount to seller credit"""
@@ -61,14 +145,17 @@ class RequestService:
             if request.status != CreditRequest.Status.PENDING:
                 raise CreditRequest.AlreadyProcessedError
 
+            pin_to_primary(request.seller_id)
             request.status = CreditRequest.Status.ACCEPTED
             request.save()
-            seller = Seller.objects.get_queryset() \
-                .filter(id=request.seller.id).select_for_update().get()
+            if request.seller.credit_bucket_count:
+                return CreditBucketService().deposit(request)
+
+            seller = self._lock_seller(request.seller.id)
 
             transaction_obj = self.ـdeposit(seller, request)
             seller.credit += request.amount
-            seller.save()
+            seller.save(update_fields=['credit'])
             return transaction_obj
 
     def reject_credit_request(self, request_id):
@@ -80,15 +167,153 @@ class RequestService:
             if request.status != CreditRequest.Status.PENDING:
                 raise CreditRequest.AlreadyProcessedError
 
+            pin_to_primary(request.seller_id)
             request.status = CreditRequest.Status.REJECTED
             request.save()
+            Seller.objects.bump_version(request.seller_id)
             return request
 
+    def _lock_pending_credit_requests(self, request_ids):
+        """
+        lock the pending credit requests among `request_ids`.
+
+        Rows locked by another transaction are skipped. Returns the locked
+        pending requests in (seller, id) order and the outcome of every
+        other id.
+        """
+        requests = list(CreditRequest.objects.filter(id__in=request_ids)
+                        .select_for_update(skip_locked=True)
+                        .order_by('seller_id', 'id'))
+        found = {request.id for request in requests}
+        existing = set(CreditRequest.objects.filter(
+            id__in=set(request_ids) - found).values_list('id', flat=True))
+
+        results = {}
+        for request_id in request_ids:
+            if request_id in found:
+                continue
+            if request_id in existing:
+                results[request_id] = CreditRequest.LockedError()
+            else:
+                results[request_id] = CreditRequest.DoesNotExist()
+
+        pending = []
+        for request in requests:
+            if request.status != CreditRequest.Status.PENDING:
+                results[request.id] = CreditRequest.AlreadyProcessedError()
+            else:
+                pending.append(request)
+        return pending, results
+
+    def bulk_accept_credit_requests(self, request_ids):
+        """
+        Accept many credit requests with one credit update per seller.
+
+        Returns a dict from request id to its deposit Transaction or to
+        the AlreadyProcessedError, LockedError or DoesNotExist instance
+        describing why it was not accepted.
+        """
+        with transaction.atomic():
+            pending, results = self._lock_pending_credit_requests(request_ids)
+            if not pending:
+                return results
+
+            CreditRequest.objects.filter(
+                id__in=[request.id for request in pending]
+            ).update(status=CreditRequest.Status.ACCEPTED)
+
+            pin_to_primary(*{request.seller_id for request in pending})
+            requests_by_seller = defaultdict(list)
+            for request in pending:
+                request.status = CreditRequest.Status.ACCEPTED
+                requests_by_seller[request.seller_id].append(request)
+            # one lock per seller, in id order, so every wait is
+            # reported against the seller it was for.
+            sellers = [self._lock_seller(seller_id)
+                       for seller_id in sorted(requests_by_seller)]
+
+            transactions = []
+            accepted_ids = []
+            bucket_service = CreditBucketService()
+            for seller in sellers:
+                requests = requests_by_seller[seller.id]
+                if seller.credit_bucket_count:
+                    for request in requests:
+                        results[request.id] = bucket_service.deposit(request)
+                    continue
+
+                credit = seller.credit + self._ledger_offset(seller.id)
+                for request in requests:
+                    transactions.append(Transaction(
+                        seller=seller,
+                        amount=request.amount,
+                        credit_before_transaction=credit,
+                        credit_after_transaction=credit+request.amount,
+                        type=Transaction.Type.DEPOSIT,
+                        credit_request=request,
+                        detail=f'{request.__class__.__name__}-{request.id}'
+                    ))
+                    accepted_ids.append(request.id)
+                    credit += request.amount
+                seller.credit += sum(request.amount for request in requests)
+                seller.save(update_fields=['credit'])
+
+            transactions = self._bulk_create_for_sellers(
+                Transaction, transactions)
+            results.update(zip(accepted_ids, transactions))
+            return results
+
+    def bulk_reject_credit_requests(self, request_ids):
+        """
+        Reject many credit requests with a single update.
+
+        Returns a dict from request id to the rejected CreditRequest or to
+        the AlreadyProcessedError, LockedError or DoesNotExist instance
+        describing why it was not rejected.
+        """
+        with transaction.atomic():
+            pending, results = self._lock_pending_credit_requests(request_ids)
+            CreditRequest.objects.filter(
+                id__in=[request.id for request in pending]
+            ).update(status=CreditRequest.Status.REJECTED)
+            pin_to_primary(*{request.seller_id for request in pending})
+            Seller.objects.bump_version(
+                *{request.seller_id for request in pending})
+            for request in pending:
+                request.status = CreditRequest.Status.REJECTED
+                results[request.id] = request
+            return results
+
     def charge_phone_number(self, seller_id, phone_number, amount):
-        """Charge the specified phone number."""
+        """
+        Charge the specified phone number.
+
+        Charges of leased sellers may return a PendingCharge, see
+        CreditLeaseManager.charge.
+        """
+        pin_to_primary(seller_id)
+        if is_leased(seller_id):
+            return CreditLeaseManager().charge(seller_id, phone_number, amount)
+
+        bucket_service = CreditBucketService()
+        if bucket_service.is_sharded(seller_id):
+            return bucket_service.charge_phone_number(
+                seller_id, phone_number, amount)
+
+        if settings.CHARGE_COALESCING['ENABLED']:
+            return self.get_coalescer().submit(seller_id, phone_number, amount)
+
+        if settings.CHARGE_MODE == 'conditional':
+            return self._conditional_charge_phone_number(
+                seller_id, phone_number, amount)
+
         with transaction.atomic():
-            seller = Seller.objects.get_queryset() \
-                .filter(id=seller_id).select_for_update().get()
+            seller = self._lock_seller(seller_id)
+            if seller.credit_bucket_count:
+                # sharded after is_sharded was read, the credit is in
+                # the buckets now.
+                return bucket_service.charge_phone_number(
+                    seller_id, phone_number, amount)
 
             request = ChargeRequest.objects.create(
                 seller=seller,
@@ -97,6 +322,154 @@ class RequestService:
             )
             transaction_obj = self.ـwithdraw(seller, request)
             seller.credit -= amount
-            seller.save()
+            seller.save(update_fields=['credit'])
+
+            return transaction_obj
+
+    def bulk_charge_phone_numbers(self, seller_id, charges,
+                                  all_or_nothing=True):
+        """
+        Charge many phone numbers with one seller lock.
+
+        `charges` is a list of dicts with `phone_number` and `amount`.
+        Returns one item per charge, either its Transaction or the
+        InsufficientCreditError it failed with. When `all_or_nothing`
+        is set a single failing charge raises and nothing is written.
+        """
+        pin_to_primary(seller_id)
+        bucket_service = CreditBucketService()
+        if bucket_service.is_sharded(seller_id):
+            return self._bulk_charge_buckets(
+                bucket_service, seller_id, charges, all_or_nothing)
+
+        with transaction.atomic():
+            seller = self._lock_seller(seller_id)
+            if seller.credit_bucket_count:
+                return self._bulk_charge_buckets(
+                    bucket_service, seller_id, charges, all_or_nothing)
+
+            results = []
+            credit = seller.credit
+            for charge in charges:
+                if credit < charge['amount']:
+                    if all_or_nothing:
+                        raise Seller.InsufficientCreditError
+                    results.append(Seller.InsufficientCreditError())
+                    continue
+                results.append((credit, charge))
+                credit -= charge['amount']
 
+            offset = self._ledger_offset(seller.id)
+            accepted = [item for item in results if isinstance(item, tuple)]
+            requests = self._bulk_create_for_sellers(ChargeRequest, [
+                ChargeRequest(
+                    seller=seller,
+                    phone_number=charge['phone_number'],
+                    amount=charge['amount']
+                ) for _, charge in accepted
+            ])
+            transactions = self._bulk_create_for_sellers(Transaction, [
+                Transaction(
+                    seller=seller,
+                    amount=-request.amount,
+                    credit_before_transaction=offset+credit_before,
+                    credit_after_transaction=offset+credit_before-request.amount,
+                    type=Transaction.Type.WITHDRAW,
+                    charge_request=request,
+                    detail=f'{request.__class__.__name__}-{request.id}'
+                ) for (credit_before, _), request in zip(accepted, requests)
+            ])
+
+            if transactions:
+                seller.credit = credit
+                seller.save(update_fields=['credit'])
+
+            transactions = iter(transactions)
+            return [
+                next(transactions) if isinstance(item, tuple) else item
+                for item in results
+            ]
+
+    def _bulk_charge_buckets(self, bucket_service, seller_id, charges,
+                             all_or_nothing):
+        """bulk charge a seller with credit buckets one charge at a time."""
+        with transaction.atomic() if all_or_nothing \
+                else contextlib.nullcontext():
+            results = []
+            for charge in charges:
+                try:
+                    results.append(bucket_service.charge_phone_number(
+                        seller_id, charge['phone_number'], charge['amount']))
+                except Seller.InsufficientCreditError as exc:
+                    if all_or_nothing:
+                        raise
+                    results.append(exc)
+            return results
+
+    def _bulk_create_for_sellers(self, model, objs):
+        """
+        bulk_create rows of locked sellers and make sure they got ids.
+
+        MySQL does not return primary keys from a multi-row INSERT, but
+        while a seller row is locked nobody else inserts rows for it,
+        so the newest rows of each seller are the ones just created.
+        """
+        objs = model.objects.bulk_create(objs)
+        if model is Transaction:
+            transactions_written(*{obj.seller_id for obj in objs})
+        if objs and objs[0].pk is None:
+            objs_by_seller = defaultdict(list)
+            for obj in objs:
+                objs_by_seller[obj.seller_id].append(obj)
+            for seller_id, seller_objs in objs_by_seller.items():
+                ids = model.objects.filter(seller_id=seller_id) \
+                    .order_by('-id') \
+                    .values_list('id', flat=True)[:len(seller_objs)]
+                for obj, pk in zip(seller_objs, reversed(list(ids))):
+                    obj.pk = pk
+        if model is Transaction:
+            balance_changed(*objs)
+        return objs
+
+    def _conditional_charge_phone_number(self, seller_id, phone_number, amount):
+        """
+        Charge the specified phone number with a single guarded UPDATE.
+
+        The seller row is never read under SELECT ... FOR UPDATE, the
+        debit only succeeds while the credit covers the amount and the
+        affected row count tells whether it did.
+        """
+        with transaction.atomic():
+            debited = Seller.objects.filter(id=seller_id, credit_bucket_count=0,
+                                            credit__gte=amount) \
+                .update(credit=F('credit') - amount)
+            if not debited:
+                bucket_count = Seller.objects.filter(id=seller_id) \
+                    .values_list('credit_bucket_count', flat=True).first()
+                if bucket_count is None:
+                    raise Seller.DoesNotExist
+                if bucket_count:
+                    return CreditBucketService().charge_phone_number(
+                        seller_id, phone_number, amount)
+                raise Seller.InsufficientCreditError
+
+            credit = Seller.objects.filter(id=seller_id) \
+                .values_list('credit', flat=True).get() \
+                + self._ledger_offset(seller_id)
+            request = ChargeRequest.objects.create(
+                seller_id=seller_id,
+                phone_number=phone_number,
+                amount=amount
+            )
+            transactions_written(seller_id)
+            transaction_obj = Transaction.objects.create(
+                seller_id=seller_id,
+                amount=-amount,
+                credit_before_transaction=credit+amount,
+                credit_after_transaction=credit,
+                type=Transaction.Type.WITHDRAW,
+                charge_request=request,
+                detail=f'{request.__class__.__name__}-{request.id}'
+            )
+            balance_changed(transaction_obj)
             return transaction_obj
@@ -14,6 +14,9 @@ CREDIT_REQUEST_URL = reverse('request:credit-request')
 ACCEPT_CREDIT_REQUEST_URL = reverse('request:accept-credit-request')
 REJECT_CREDIT_REQUEST_URL = reverse('request:reject-credit-request')
 CHARGE_PHONE_NUMBER_URL = reverse('request:charge-phone-number')
+BULK_CHARGE_PHONE_NUMBERS_URL = reverse('request:bulk-charge-phone-numbers')
+BULK_ACCEPT_CREDIT_REQUESTS_URL = reverse('request:bulk-accept-credit-requests')
+BULK_REJECT_CREDIT_REQUESTS_URL = reverse('request:bulk-reject-credit-requests')
 
 
 def create_seller(email='email@test.com',
@@ -180,3 +183,110 @@ class ChargePhoneNumberApiTests(APITestCase):
         res = self.client.post(CHARGE_PHONE_NUMBER_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_402_PAYMENT_REQUIRED)
+
+
+class BulkChargePhoneNumbersApiTests(APITestCase):
+    """Test charge many phone numbers in one call."""
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('10'))
+        self.client.force_authenticate(user=self.seller)
+        self.payload = {
+            'charges': [
+                {'phone_number': '+989123456781', 'amount': '4.00'},
+                {'phone_number': '+989123456782', 'amount': '8.00'},
+                {'phone_number': '+989123456783', 'amount': '6.00'},
+            ],
+        }
+
+    def test_bulk_charge_all_or_nothing_failed(self):
+        """Test the whole batch is refused when it does not fit."""
+        res = self.client.post(
+            BULK_CHARGE_PHONE_NUMBERS_URL, self.payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_402_PAYMENT_REQUIRED)
+
+    def test_bulk_charge_best_effort(self):
+        """Test per item results are returned in best effort mode."""
+        self.payload['all_or_nothing'] = False
+        res = self.client.post(
+            BULK_CHARGE_PHONE_NUMBERS_URL, self.payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['status'] for item in res.data['results']],
+            ['charged', 'insufficient_credit', 'charged']
+        )
+        self.assertEqual(
+            res.data['results'][2]['transaction']['credit_after_transaction'],
+            '0.00'
+        )
+
+    def test_bulk_charge_empty_failed(self):
+        """Test an empty batch is rejected."""
+        res = self.client.post(
+            BULK_CHARGE_PHONE_NUMBERS_URL, {'charges': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkCreditRequestApiTests(APITestCase):
+    """Test bulk accept and reject credit request apis."""
+
+    def setUp(self):
+        self.seller = create_seller()
+        self.admin_seller = create_seller(
+            email='admin@example.com',
+            is_staff=True)
+        self.credit_requests = [
+            create_credit_request(self.seller, Decimal('10.0'))
+            for _ in range(3)]
+        self.request_ids = [request.id for request in self.credit_requests]
+
+    def test_bulk_accept_requires_admin(self):
+        """Test bulk accept using normal user failed."""
+        self.client.force_authenticate(user=self.seller)
+        res = self.client.post(BULK_ACCEPT_CREDIT_REQUESTS_URL,
+                               {'request_ids': self.request_ids},
+                               format='json')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_accept_success(self):
+        """Test every outcome of a bulk accept is returned in order."""
+        self.client.force_authenticate(user=self.admin_seller)
+        self.client.post(ACCEPT_CREDIT_REQUEST_URL,
+                         {'request_id': self.request_ids[0]})
+
+        res = self.client.post(BULK_ACCEPT_CREDIT_REQUESTS_URL,
+                               {'request_ids': self.request_ids},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in res.data['results']],
+                         ['already_processed', 'accepted', 'accepted'])
+        self.assertEqual(res.data['results'][2]['transaction']['amount'],
+                         '10.00')
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('30.00'))
+
+    def test_bulk_reject_success(self):
+        """Test bulk reject returns the rejected requests."""
+        self.client.force_authenticate(user=self.admin_seller)
+
+        res = self.client.post(BULK_REJECT_CREDIT_REQUESTS_URL,
+                               {'request_ids': self.request_ids + [999999]},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in res.data['results']],
+                         ['rejected'] * 3 + ['not_found'])
+        self.assertEqual(
+            res.data['results'][0]['credit_request']['status'],
+            CreditRequest.Status.REJECTED)
+
+    def test_bulk_accept_empty_failed(self):
+        """Test bulk accept without request ids failed."""
+        self.client.force_authenticate(user=self.admin_seller)
+        res = self.client.post(BULK_ACCEPT_CREDIT_REQUESTS_URL,
+                               {'request_ids': []}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
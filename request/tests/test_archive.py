@@ -0,0 +1,117 @@
+"""
+Tests for archiving and pruning closed ledger months.
+"""
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import (
+    ArchivedMonth,
+    ChargeRequest,
+    Seller,
+    Transaction,
+)
+from request.ledger import LedgerPrunedError, LedgerService
+from request.services import RequestService
+
+
+def create_seller(email='email@test.com', credit=Decimal('100.00')):
+    return Seller.objects.create_user(email=email, password='test1234',
+                                      credit=credit)
+
+
+class ArchiveLedgerTests(APITestCase):
+    """Test archiving old months of the ledger."""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        overrides = override_settings(LEDGER_ARCHIVE={
+            'DIRECTORY': self.directory, 'KEEP_MONTHS': 1})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.seller = create_seller()
+        self.client.force_authenticate(user=self.seller)
+        service = RequestService()
+        self.old = [service.charge_phone_number(
+            self.seller.id, '09123456789', Decimal('10')) for _ in range(3)]
+        old_time = timezone.now() - timedelta(days=120)
+        Transaction.objects.update(transaction_time=old_time)
+        ChargeRequest.objects.update(request_time=old_time)
+        self.recent = service.charge_phone_number(
+            self.seller.id, '09123456789', Decimal('5'))
+
+    def archive(self, *args):
+        call_command('archive_ledger', *args, stdout=StringIO())
+
+    def test_archive_exports_closed_months(self):
+        """Test old rows are exported and kept without --prune."""
+        self.archive()
+
+        archived = ArchivedMonth.objects.get(
+            table=ArchivedMonth.Table.TRANSACTION)
+        with gzip.open(archived.path, 'rt') as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual([row['id'] for row in rows],
+                         [t.id for t in self.old])
+        self.assertEqual(archived.rows, 3)
+        self.assertTrue(ArchivedMonth.objects.filter(
+            table=ArchivedMonth.Table.CHARGE_REQUEST).exists())
+        self.assertEqual(Transaction.objects.count(), 4)
+
+    def test_prune_keeps_recent_rows_and_balance(self):
+        """Test pruning leaves recent rows and balance-at-time intact."""
+        self.archive('--prune')
+
+        self.assertEqual(list(Transaction.objects.values_list('id', flat=True)),
+                         [self.recent.id])
+        self.assertEqual(ChargeRequest.objects.count(), 1)
+        self.assertEqual(
+            LedgerService().get_credit_at(self.seller.id, timezone.now()),
+            Decimal('65.00'))
+
+    def test_balance_in_pruned_month(self):
+        """Test the balance inside a pruned month is refused."""
+        self.archive('--prune')
+        at = timezone.now() - timedelta(days=120)
+
+        with self.assertRaises(LedgerPrunedError):
+            LedgerService().get_credit_at(self.seller.id, at)
+        res = self.client.get(reverse('request:transaction-balance'),
+                              {'at': at.isoformat()})
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_archive_lookup(self):
+        """Test a pruned transaction is still found in the archive."""
+        self.archive('--prune')
+
+        res = self.client.get(reverse('request:transaction-archive',
+                                      args=[self.old[1].id]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['amount'], '-10.00')
+        self.assertEqual(res.data['charge_request_id'],
+                         self.old[1].charge_request_id)
+
+    def test_archive_lookup_other_seller(self):
+        """Test sellers cannot read archived rows of other sellers."""
+        self.archive('--prune')
+        self.client.force_authenticate(
+            user=create_seller(email='other@test.com'))
+
+        res = self.client.get(reverse('request:transaction-archive',
+                                      args=[self.old[1].id]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,164 @@
+"""
+Tests for the async request and seller views.
+"""
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.models import CreditRequest, Transaction
+from request import idempotency
+
+CHARGE_URL = reverse('async-request:charge-phone-number')
+CREDIT_REQUEST_URL = reverse('async-request:credit-request')
+TRANSACTIONS_URL = reverse('async-request:transaction-list')
+ME_URL = reverse('async-seller:me')
+
+
+def transaction_url(pk):
+    return reverse('async-request:transaction-detail', args=[pk])
+
+
+def create_seller(email='test@example.com', credit=Decimal('100.00')):
+    seller = get_user_model().objects.create_user(
+        email=email, password='testpass123', credit=credit)
+    return seller, Token.objects.create(user=seller)
+
+
+class AsyncViewTests(TransactionTestCase):
+    """Test the async views answer like the DRF ones."""
+
+    def setUp(self):
+        idempotency._responses.clear()
+        self.seller, token = create_seller()
+        self.headers = {'authorization': f'Token {token.key}'}
+
+    async def post(self, url, data, headers=None):
+        return await self.async_client.post(
+            url, data, content_type='application/json',
+            headers={**self.headers, **(headers or {})})
+
+    async def test_charge_phone_number(self):
+        """Test charging a phone number."""
+        res = await self.post(CHARGE_URL, {
+            'phone_number': '+989114412191', 'amount': '15.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['amount'], '-15.00')
+        await self.seller.arefresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('85.00'))
+
+    async def test_charge_insufficient_credit(self):
+        """Test a charge above the credit is refused."""
+        res = await self.post(CHARGE_URL, {
+            'phone_number': '+989114412191', 'amount': '150.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_402_PAYMENT_REQUIRED)
+        self.assertEqual(res.json()['error'], 'Insufficient credit.')
+
+    async def test_invalid_charge(self):
+        """Test an invalid charge gets the serializer errors."""
+        res = await self.post(CHARGE_URL, {'amount': '1.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('phone_number', res.json())
+
+    async def test_repeated_idempotency_key(self):
+        """Test a charge retried with the same key is charged once."""
+        payload = {'phone_number': '+989114412191', 'amount': '15.00'}
+        key = {'idempotency-key': 'key-1'}
+
+        first = await self.post(CHARGE_URL, payload, key)
+        second = await self.post(CHARGE_URL, payload, key)
+        changed = await self.post(CHARGE_URL, {**payload, 'amount': '1.00'},
+                                  key)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(changed.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        await self.seller.arefresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('85.00'))
+
+    def test_idempotency_key_shared_with_sync_view(self):
+        """Test a credit request retried on the DRF view is replayed."""
+        res = async_to_sync(self.post)(CREDIT_REQUEST_URL, {'amount': '50.00'},
+                                       {'idempotency-key': 'key-1'})
+        client = APIClient()
+        client.force_authenticate(self.seller)
+
+        retried = client.post(reverse('request:credit-request'),
+                              {'amount': '50.00'}, format='json',
+                              HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(retried.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retried.data, res.json())
+        self.assertEqual(CreditRequest.objects.count(), 1)
+
+    async def test_authentication_required(self):
+        """Test requests without a valid token are refused."""
+        res = await self.async_client.post(
+            CHARGE_URL, {}, content_type='application/json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+        res = await self.async_client.get(
+            ME_URL, headers={'authorization': 'Token invalid'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_create_credit_request(self):
+        """Test creating a credit request."""
+        res = await self.post(CREDIT_REQUEST_URL, {'amount': '50.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json()['seller']['email'], self.seller.email)
+        request = await CreditRequest.objects.aget(id=res.json()['id'])
+        self.assertEqual(request.amount, Decimal('50.00'))
+
+    async def test_me(self):
+        """Test retrieving the authenticated seller."""
+        res = await self.async_client.get(ME_URL, headers=self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['email'], self.seller.email)
+        self.assertEqual(res.json()['credit'], '100.00')
+
+    def test_transactions_match_sync_views(self):
+        """Test transactions are listed and retrieved like the DRF view."""
+        for i in range(3):
+            Transaction.objects.create(
+                seller=self.seller, amount=Decimal('1.00'),
+                credit_before_transaction=Decimal(i),
+                credit_after_transaction=Decimal(i + 1),
+                type=Transaction.Type.DEPOSIT)
+        other, _ = create_seller(email='other@example.com')
+        other_transaction = Transaction.objects.create(
+            seller=other, amount=Decimal('1.00'),
+            credit_before_transaction=Decimal('0'),
+            credit_after_transaction=Decimal('1'),
+            type=Transaction.Type.DEPOSIT)
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        expected = client.get(reverse('request:transaction-list'),
+                              {'page_size': 2}).json()
+
+        async def fetch():
+            page = await self.async_client.get(
+                TRANSACTIONS_URL, {'page_size': 2}, headers=self.headers)
+            detail = await self.async_client.get(
+                transaction_url(expected['results'][0]['id']),
+                headers=self.headers)
+            hidden = await self.async_client.get(
+                transaction_url(other_transaction.id), headers=self.headers)
+            return page, detail, hidden
+        page, detail, hidden = async_to_sync(fetch)()
+
+        self.assertEqual(page.json()['results'], expected['results'])
+        self.assertEqual(page.json()['next'].replace('/async', ''),
+                         expected['next'])
+        self.assertEqual(detail.json(), expected['results'][0])
+        self.assertEqual(hidden.status_code, status.HTTP_404_NOT_FOUND)
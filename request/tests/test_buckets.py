@@ -0,0 +1,210 @@
+"""
+Tests for sharded seller credit.
+"""
+from decimal import Decimal
+from unittest import mock
+from django.db.models import Sum
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from request.buckets import CreditBucketService, split_credit
+from request.checks import check_credit_buckets
+from request.services import RequestService
+from core.models import (
+    CreditBucket,
+    CreditRequest,
+    Seller,
+    Transaction,
+)
+
+ME_URL = reverse('seller:me')
+
+
+def create_seller(email='email@test.com', credit=Decimal('0')):
+    return get_user_model().objects.create_user(
+        email=email, password='test1234', credit=credit)
+
+
+def bucket_credits(seller):
+    return list(CreditBucket.objects.filter(seller=seller)
+                .order_by('index').values_list('credit', flat=True))
+
+
+@override_settings(CREDIT_BUCKETS={'ENABLED': True, 'PICK': 'round-robin'})
+class CreditBucketServiceTest(TransactionTestCase):
+    """Test charging and depositing sellers with credit buckets."""
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('100.00'))
+        self.service = RequestService()
+        self.bucket_service = CreditBucketService()
+        self.bucket_service.shard_seller_credit(self.seller.id, 3)
+
+    def assertLedgerMatchesBuckets(self):
+        """Assert the opening credit plus the ledger is in the buckets."""
+        total = Transaction.objects.filter(seller=self.seller) \
+            .aggregate(total=Sum('amount'))['total']
+        self.assertEqual(Decimal('100.00') + total,
+                         self.bucket_service.get_credit(self.seller.id))
+
+    def test_split_credit(self):
+        """Test shares add up to the total and differ by a cent at most."""
+        self.assertEqual(split_credit(Decimal('100.00'), 3),
+                         [Decimal('33.34'), Decimal('33.33'),
+                          Decimal('33.33')])
+
+    def test_shard_seller_credit(self):
+        """Test sharding moves the credit into the buckets."""
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit_bucket_count, 3)
+        self.assertEqual(bucket_credits(self.seller),
+                         [Decimal('33.34'), Decimal('33.33'),
+                          Decimal('33.33')])
+        self.assertEqual(
+            Transaction.objects.filter(
+                type=Transaction.Type.TRANSFER).count(), 4)
+
+    def test_charge_phone_number_from_one_bucket(self):
+        """Test a charge debits a single bucket."""
+        transaction = self.service.charge_phone_number(
+            self.seller.id, '+989114412191', Decimal('10.00'))
+
+        self.assertIsNotNone(transaction.credit_bucket)
+        self.assertEqual(
+            transaction.credit_before_transaction
+            - transaction.credit_after_transaction, Decimal('10.00'))
+        self.assertEqual(self.bucket_service.get_credit(self.seller.id),
+                         Decimal('90.00'))
+        self.assertLedgerMatchesBuckets()
+
+    def test_charge_larger_than_any_bucket(self):
+        """Test the buckets are rebalanced when none covers the charge."""
+        transaction = self.service.charge_phone_number(
+            self.seller.id, '+989114412191', Decimal('80.00'))
+
+        self.assertEqual(transaction.amount, Decimal('-80.00'))
+        self.assertEqual(self.bucket_service.get_credit(self.seller.id),
+                         Decimal('20.00'))
+        self.assertLedgerMatchesBuckets()
+
+    def test_charge_insufficient_credit(self):
+        """Test charging more than all buckets hold fails."""
+        with self.assertRaises(Seller.InsufficientCreditError):
+            self.service.charge_phone_number(
+                self.seller.id, '+989114412191', Decimal('100.01'))
+
+        self.assertEqual(self.bucket_service.get_credit(self.seller.id),
+                         Decimal('100.00'))
+
+    def test_accept_credit_request_deposits_poorest_bucket(self):
+        """Test accepted credit goes to the bucket with least credit."""
+        request = CreditRequest.objects.create(
+            seller=self.seller, amount=Decimal('5.00'))
+
+        transaction = self.service.accept_credit_request(request.id)
+
+        self.assertEqual(transaction.credit_bucket, 1)
+        self.assertEqual(bucket_credits(self.seller),
+                         [Decimal('33.34'), Decimal('38.33'),
+                          Decimal('33.33')])
+        self.assertLedgerMatchesBuckets()
+
+    def test_rebalance(self):
+        """Test rebalancing evens out buckets and refreshes the seller."""
+        self.service.charge_phone_number(
+            self.seller.id, '+989114412191', Decimal('30.00'))
+
+        self.bucket_service.rebalance(self.seller.id)
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('70.00'))
+        self.assertEqual(bucket_credits(self.seller),
+                         [Decimal('23.34'), Decimal('23.33'),
+                          Decimal('23.33')])
+        self.assertLedgerMatchesBuckets()
+
+    def test_merge_buckets(self):
+        """Test a bucket count of zero moves credit back to the seller."""
+        self.bucket_service.shard_seller_credit(self.seller.id, 0)
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit_bucket_count, 0)
+        self.assertEqual(self.seller.credit, Decimal('100.00'))
+        self.assertFalse(CreditBucket.objects.exists())
+        self.service.charge_phone_number(
+            self.seller.id, '+989114412191', Decimal('10.00'))
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('90.00'))
+
+    def test_disabled_setting_keeps_buckets(self):
+        """Test sharded sellers are charged from buckets when disabled."""
+        with override_settings(CREDIT_BUCKETS={'ENABLED': False,
+                                               'PICK': 'random'}):
+            self.assertTrue(self.bucket_service.is_sharded(self.seller.id))
+            errors = check_credit_buckets(None, databases=['default'])
+            self.service.charge_phone_number(
+                self.seller.id, '+989114412191', Decimal('10.00'))
+
+        self.assertEqual([error.id for error in errors], ['request.E001'])
+        self.assertEqual(self.bucket_service.get_credit(self.seller.id),
+                         Decimal('90.00'))
+        self.assertLedgerMatchesBuckets()
+
+        self.bucket_service.shard_seller_credit(self.seller.id, 0)
+        with override_settings(CREDIT_BUCKETS={'ENABLED': False,
+                                               'PICK': 'random'}):
+            self.assertEqual(
+                check_credit_buckets(None, databases=['default']), [])
+
+    def test_charge_sharded_after_check(self):
+        """Test a charge sharded under its feet is taken from the buckets."""
+        charges = [{'phone_number': '+989114412191',
+                    'amount': Decimal('10.00')}]
+        with mock.patch.object(CreditBucketService, 'is_sharded',
+                               return_value=False):
+            self.service.charge_phone_number(
+                self.seller.id, '+989114412191', Decimal('10.00'))
+            self.service.bulk_charge_phone_numbers(self.seller.id, charges)
+            with override_settings(CHARGE_MODE='conditional'):
+                self.service.charge_phone_number(
+                    self.seller.id, '+989114412191', Decimal('10.00'))
+
+        self.assertEqual(self.bucket_service.get_credit(self.seller.id),
+                         Decimal('70.00'))
+        self.assertLedgerMatchesBuckets()
+        self.bucket_service.rebalance(self.seller.id)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('70.00'))
+
+    def test_lock_observer(self):
+        """Test bucket locks are reported like seller locks."""
+        locks = []
+
+        def observe(seller_id, seconds):
+            locks.append(seller_id)
+
+        self.service.add_lock_observer(observe)
+        try:
+            self.service.charge_phone_number(
+                self.seller.id, '+989114412191', Decimal('10.00'))
+            request = CreditRequest.objects.create(
+                seller=self.seller, amount=Decimal('5.00'))
+            self.service.bulk_accept_credit_requests([request.id])
+        finally:
+            self.service.remove_lock_observer(observe)
+
+        # the charge locks a bucket, the deposit the seller and a bucket.
+        self.assertEqual(locks, [self.seller.id] * 3)
+
+    def test_me_returns_aggregated_credit(self):
+        """Test /me reports the sum of the buckets."""
+        self.service.charge_phone_number(
+            self.seller.id, '+989114412191', Decimal('10.00'))
+        client = APIClient()
+        client.force_authenticate(
+            user=Seller.objects.get(id=self.seller.id))
+
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.data['credit'], '90.00')
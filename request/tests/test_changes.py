@@ -0,0 +1,170 @@
+"""
+Tests for the transaction change feed.
+"""
+import asyncio
+import threading
+import time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from request.async_views import run_in_pool
+from request.changes import TransactionFeed
+from request.services import RequestService
+
+CHANGES_URL = reverse('request:transaction-changes')
+ASYNC_CHANGES_URL = reverse('async-request:transaction-changes')
+
+
+@override_settings(CHANGE_FEED={'RECHECK_SECONDS': 10})
+class TransactionFeedTests(SimpleTestCase):
+    """Test waking the readers of a seller's ledger."""
+
+    async def test_notify_wakes_reader(self):
+        """Test a commit for the seller ends the wait early."""
+        rows = []
+
+        async def fetch():
+            return list(rows)
+
+        started = time.monotonic()
+        waiting = asyncio.ensure_future(
+            TransactionFeed().wait_for(1, fetch, 5))
+        await asyncio.sleep(0.1)
+        rows.append('row')
+        # commits are announced from the threads of the service pool.
+        thread = threading.Thread(target=TransactionFeed().notify,
+                                  args=([1],))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await asyncio.wait_for(waiting, 1), ['row'])
+        self.assertLess(time.monotonic() - started, 1)
+
+    async def test_other_seller_does_not_wake_reader(self):
+        """Test the wait times out when only other sellers change."""
+        fetches = []
+
+        async def fetch():
+            fetches.append(1)
+            return []
+
+        waiting = asyncio.ensure_future(
+            TransactionFeed().wait_for(1, fetch, 0.3))
+        await asyncio.sleep(0.1)
+        TransactionFeed().notify([2])
+
+        self.assertEqual(await waiting, [])
+        self.assertEqual(len(fetches), 2)
+
+
+class ChangesApiTests(TestCase):
+    """Test the transaction/changes endpoint."""
+
+    def setUp(self):
+        self.seller = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def charge(self, seller):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RequestService().charge_phone_number(
+                seller.id, '+989120000000', Decimal('1.00'))
+
+    def test_changes_since_cursor(self):
+        """Test only the seller's rows after the cursor are returned."""
+        first = self.charge(self.seller)
+        second = self.charge(self.seller)
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        self.charge(other)
+
+        res = self.client.get(CHANGES_URL, {'since': first.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in res.data['results']],
+                         [second.id])
+        self.assertEqual(res.data['next'], second.id)
+
+    def test_no_changes_keeps_cursor(self):
+        """Test an empty read returns the cursor it was given."""
+        charged = self.charge(self.seller)
+
+        res = self.client.get(CHANGES_URL, {'since': charged.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'next': charged.id, 'results': []})
+
+    @override_settings(CHANGE_FEED={'MAX_WAIT_SECONDS': 30, 'MAX_ROWS': 2,
+                                    'RECHECK_SECONDS': 2,
+                                    'SHARDED_SETTLE_SECONDS': 2})
+    def test_rows_are_limited(self):
+        """Test at most MAX_ROWS rows are returned, oldest first."""
+        charged = [self.charge(self.seller) for _ in range(3)]
+
+        res = self.client.get(CHANGES_URL)
+
+        self.assertEqual([row['id'] for row in res.data['results']],
+                         [charged[0].id, charged[1].id])
+        self.assertEqual(res.data['next'], charged[1].id)
+
+    def test_wait_is_refused(self):
+        """Test waiting is left to the async feed."""
+        res = self.client.get(CHANGES_URL, {'wait': '5'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncChangesApiTests(TransactionTestCase):
+    """Test waiting for changes on the async transaction/changes view."""
+
+    def setUp(self):
+        self.seller = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        token = Token.objects.create(user=self.seller)
+        self.headers = {'authorization': f'Token {token.key}'}
+
+    async def get(self, params):
+        return await self.async_client.get(ASYNC_CHANGES_URL, params,
+                                           headers=self.headers)
+
+    async def test_no_changes_keeps_cursor(self):
+        """Test an empty wait returns the cursor it was given."""
+        res = await self.get({'since': 7, 'wait': '0.1'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'next': 7, 'results': []})
+
+    async def test_charge_wakes_feed(self):
+        """Test a committed charge ends the wait of its seller."""
+        started = time.monotonic()
+        waiting = asyncio.ensure_future(self.get({'wait': '5'}))
+        await asyncio.sleep(0.2)
+        charged = await run_in_pool(
+            RequestService().charge_phone_number, self.seller.id,
+            '+989120000000', Decimal('1.00'))
+
+        res = await asyncio.wait_for(waiting, 2)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in res.json()['results']],
+                         [charged.id])
+        self.assertLess(time.monotonic() - started, 2)
+
+    async def test_invalid_wait(self):
+        """Test a wait above MAX_WAIT_SECONDS is rejected."""
+        res = await self.get({'wait': '3600'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
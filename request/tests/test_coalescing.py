@@ -0,0 +1,137 @@
+"""
+Tests for charge coalescing.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from decimal import Decimal
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from request.coalescing import ChargeCoalescer, _Batch
+from request.services import RequestService
+from core.models import (
+    Seller,
+    Transaction,
+)
+
+
+def create_seller(email='email@test.com', credit=Decimal('0')):
+    return get_user_model().objects.create_user(
+        email=email, password='test1234', credit=credit)
+
+
+class ChargeCoalescerTest(TransactionTestCase):
+    """Test concurrent charges of a seller are committed together."""
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('30.00'))
+        self.service = RequestService()
+        self.batch_sizes = []
+
+    def execute(self, seller_id, charges):
+        self.batch_sizes.append(len(charges))
+        return self.service.bulk_charge_phone_numbers(
+            seller_id, charges, all_or_nothing=False)
+
+    def charge_concurrently(self, coalescer, count):
+        results = [None] * count
+
+        def charge(index):
+            try:
+                results[index] = coalescer.submit(
+                    self.seller.id, f'+98911000000{index}', Decimal('10.00'))
+            except Seller.InsufficientCreditError as exc:
+                results[index] = exc
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=charge, args=(index,))
+                   for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_charges_committed_in_one_batch(self):
+        """Test charges arriving during a commit share the next one."""
+        committing = threading.Event()
+        release = threading.Event()
+
+        def execute(seller_id, charges):
+            if not self.batch_sizes:
+                self.batch_sizes.append(len(charges))
+                committing.set()
+                release.wait(5)
+                return [Seller.InsufficientCreditError()]
+            return self.execute(seller_id, charges)
+        coalescer = ChargeCoalescer(execute, window=5, max_batch_size=4)
+        first = threading.Thread(target=self.charge_concurrently,
+                                 args=(coalescer, 1))
+        first.start()
+        committing.wait(5)
+
+        results = self.charge_concurrently(coalescer, 4)
+        release.set()
+        first.join()
+
+        self.assertEqual(self.batch_sizes, [1, 4])
+        self.assertEqual(
+            sum(isinstance(r, Transaction) for r in results), 3)
+        self.assertEqual(
+            sum(isinstance(r, Seller.InsufficientCreditError)
+                for r in results), 1)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('0.00'))
+
+    def test_uncontended_charge_does_not_wait(self):
+        """Test a lone charge is committed without waiting the window."""
+        coalescer = ChargeCoalescer(self.execute, window=5,
+                                    max_batch_size=50)
+
+        started = time.monotonic()
+        result = coalescer.submit(
+            self.seller.id, '+989110000000', Decimal('10.00'))
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.batch_sizes, [1])
+        self.assertEqual(result.credit_after_transaction, Decimal('20.00'))
+
+    def test_failed_batch_raised_in_every_caller(self):
+        """Test an error committing the batch reaches all callers."""
+        def execute(seller_id, charges):
+            raise Seller.DoesNotExist
+        coalescer = ChargeCoalescer(execute, window=0.001,
+                                    max_batch_size=50)
+
+        with self.assertRaises(Seller.DoesNotExist):
+            coalescer.submit(self.seller.id, '+989110000000',
+                             Decimal('10.00'))
+
+    def test_leader_interrupted_fails_followers(self):
+        """Test followers are not left waiting when the leader dies."""
+        def execute(seller_id, charges):
+            raise SystemExit
+        coalescer = ChargeCoalescer(execute, window=0.001,
+                                    max_batch_size=50)
+        batch = _Batch()
+        batch.futures = [Future(), Future()]
+
+        with self.assertRaises(SystemExit):
+            coalescer._flush(self.seller.id, batch)
+
+        with self.assertRaises(SystemExit):
+            batch.futures[1].result(timeout=0)
+
+    @override_settings(CHARGE_COALESCING={
+        'ENABLED': True, 'WINDOW_MS': 1, 'MAX_BATCH_SIZE': 50})
+    def test_service_routes_charges_through_coalescer(self):
+        """Test charge_phone_number uses the coalescer when enabled."""
+        transaction = self.service.charge_phone_number(
+            self.seller.id, '+989110000000', Decimal('10.00'))
+
+        self.assertIsNotNone(RequestService._coalescer)
+        self.assertEqual(transaction.amount, Decimal('-10.00'))
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('20.00'))
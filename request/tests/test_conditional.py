@@ -0,0 +1,93 @@
+"""
+Tests for the conditional GET of seller reads.
+"""
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Seller
+from request.services import RequestService
+
+ME_URL = reverse('seller:me')
+TRANSACTION_URL = reverse('request:transaction-list')
+CREDIT_REQUEST_LIST_URL = reverse('request:creditrequest-list')
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETags and 304 responses of the seller reads."""
+
+    def setUp(self):
+        self.seller = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        return response['ETag']
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match is answered with a 304."""
+        for url in (ME_URL, TRANSACTION_URL, CREDIT_REQUEST_LIST_URL):
+            etag = self.get_etag(url)
+
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(response.status_code,
+                             status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+            self.assertFalse(response.content)
+
+    def test_etag_depends_on_query(self):
+        """Test other query params of a view get another ETag."""
+        etag = self.get_etag(TRANSACTION_URL)
+
+        response = self.client.get(TRANSACTION_URL, {'page_size': 1},
+                                   HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_writes_change_etag(self):
+        """Test charges and credit requests change the ETag."""
+        service = RequestService()
+        etags = [self.get_etag(CREDIT_REQUEST_LIST_URL)]
+
+        service.charge_phone_number(self.seller.id, '+989120000000',
+                                    Decimal('10.00'))
+        etags.append(self.get_etag(CREDIT_REQUEST_LIST_URL))
+        credit_request = service.create_credit_request(self.seller.id,
+                                                       Decimal('10.00'))
+        etags.append(self.get_etag(CREDIT_REQUEST_LIST_URL))
+        service.reject_credit_request(credit_request.id)
+        etags.append(self.get_etag(CREDIT_REQUEST_LIST_URL))
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_profile_change_changes_etag(self):
+        """Test saving the seller bumps its version, credit does not."""
+        etag = self.get_etag(ME_URL)
+
+        Seller.objects.filter(id=self.seller.id).update(credit=1)
+        self.seller.save(update_fields=['credit'])
+        self.assertEqual(self.get_etag(ME_URL), etag)
+
+        self.seller.name = 'Changed'
+        self.seller.save()
+        self.assertNotEqual(self.get_etag(ME_URL), etag)
+
+    def test_no_etag_for_staff(self):
+        """Test staff reads are never conditional."""
+        self.seller.is_staff = True
+        self.seller.save()
+
+        response = self.client.get(TRANSACTION_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,103 @@
+"""
+Tests for the hot seller tracker.
+"""
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from request.contention import HotSellerTracker
+from request.services import RequestService
+
+HOT_SELLERS_URL = reverse('request:hot-sellers')
+
+
+@override_settings(HOT_SELLERS={'ENABLED': True, 'CAPACITY': 3})
+class HotSellerTrackerTests(SimpleTestCase):
+    """Test the Space-Saving sketch of contended sellers."""
+
+    def setUp(self):
+        self.tracker = HotSellerTracker()
+        self.tracker.clear()
+
+    def tearDown(self):
+        self.tracker.clear()
+
+    def test_top_sellers(self):
+        """Test sellers are ranked by lock wait with percentiles."""
+        for _ in range(99):
+            self.tracker.observe(1, 0.001)
+        self.tracker.observe(1, 1.0)
+        self.tracker.observe(2, 0.5)
+
+        top = self.tracker.top(2)
+
+        self.assertEqual([row['seller'] for row in top], [1, 2])
+        self.assertEqual(top[0]['locks'], 100)
+        self.assertAlmostEqual(top[0]['lock_wait_seconds'], 1.099)
+        self.assertLessEqual(top[0]['p50'], 0.00125)
+        self.assertGreaterEqual(top[0]['p50'], 0.001)
+        self.assertLessEqual(top[0]['p95'], 0.00125)
+        self.assertEqual(top[0]['error_seconds'], 0)
+
+    def test_capacity_is_bounded(self):
+        """Test a new seller replaces the least contended one."""
+        for seller_id in range(1, 4):
+            self.tracker.observe(seller_id, seller_id)
+        for seller_id in range(4, 1000):
+            self.tracker.observe(seller_id, 0.001)
+        self.tracker.observe(5000, 10)
+
+        top = self.tracker.top(10)
+
+        self.assertEqual(len(top), 3)
+        self.assertEqual(top[0]['seller'], 5000)
+        self.assertEqual(top[1]['seller'], 3)
+        self.assertGreater(top[0]['error_seconds'], 0)
+        self.assertEqual(top[0]['locks'], 1)
+
+
+class HotSellersApiTests(TestCase):
+    """Test the hot sellers API."""
+
+    def setUp(self):
+        self.tracker = HotSellerTracker()
+        self.tracker.clear()
+        self.seller = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        self.client = APIClient()
+
+    def tearDown(self):
+        self.tracker.clear()
+
+    def test_staff_only(self):
+        """Test the hot sellers are only listed to staff."""
+        self.client.force_authenticate(self.seller)
+        res = self.client.get(HOT_SELLERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_seller_locks_are_tracked(self):
+        """Test charges feed the lock waits of their seller."""
+        RequestService().charge_phone_number(
+            self.seller.id, '+989114412191', Decimal('1.00'))
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testadmin123')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(HOT_SELLERS_URL, {'limit': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['seller'], self.seller.id)
+        self.assertEqual(res.data[0]['locks'], 1)
+
+    def test_invalid_limit(self):
+        """Test a limit beyond the capacity is rejected."""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testadmin123')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(HOT_SELLERS_URL, {'limit': 100000})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,208 @@
+"""
+Tests for the live balance events.
+"""
+import asyncio
+import json
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from core.models import Transaction
+from request.async_views import run_in_pool
+from request.events import BalanceBroker, balance_changed
+from request.services import RequestService
+
+BALANCE_EVENTS_URL = reverse('async-seller:balance-events')
+
+BALANCE_EVENTS = {
+    'HEARTBEAT_SECONDS': 5,
+    'BUFFER_SIZE': 2,
+    'RECHECK_SECONDS': None,
+    'RECHECK_ROWS': 1000,
+    'SETTLE_SECONDS': 1,
+}
+
+
+def event(transaction_id):
+    return {'credit': '1.00', 'transaction_id': transaction_id,
+            'amount': '1.00', 'type': 'Deposit'}
+
+
+@override_settings(BALANCE_EVENTS=BALANCE_EVENTS)
+class BalanceBrokerTests(TestCase):
+    """Test the fan-out of balance events."""
+
+    def test_publish_without_subscribers(self):
+        """Test nothing is published for sellers nobody listens to."""
+        seller = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+
+        transaction_obj = RequestService().charge_phone_number(
+            seller.id, '+989120000000', Decimal('1.00'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            balance_changed(transaction_obj)
+
+        self.assertEqual(callbacks, [])
+
+    async def test_slow_consumer_is_dropped(self):
+        """Test a subscriber BUFFER_SIZE events behind is dropped."""
+        broker = BalanceBroker()
+        subscriber = broker.subscribe(1)
+        other = broker.subscribe(1)
+        try:
+            broker.publish([(1, event(i)) for i in range(1, 4)])
+            await asyncio.sleep(0)
+
+            received = [subscriber.queue.get_nowait() for _ in range(3)]
+            self.assertEqual(received, [event(1), event(2), None])
+            self.assertTrue(other.dropped)
+            self.assertTrue(subscriber.dropped)
+        finally:
+            broker.unsubscribe(subscriber)
+            broker.unsubscribe(other)
+        self.assertFalse(broker.has_subscribers(1))
+
+    async def test_older_events_are_skipped(self):
+        """Test an event older than one delivered is not sent again."""
+        broker = BalanceBroker()
+        subscriber = broker.subscribe(1)
+        try:
+            subscriber.deliver(event(5))
+            subscriber.deliver(event(4))
+            subscriber.deliver(event(5))
+
+            self.assertEqual(subscriber.queue.qsize(), 1)
+        finally:
+            broker.unsubscribe(subscriber)
+
+
+@override_settings(BALANCE_EVENTS=BALANCE_EVENTS)
+class BalanceEventsViewTests(TransactionTestCase):
+    """Test the Server-Sent Events stream of a seller's balance."""
+
+    def setUp(self):
+        self.seller = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123',
+            credit=Decimal('100.00'))
+        token = Token.objects.create(user=self.seller)
+        self.headers = {'authorization': f'Token {token.key}'}
+
+    def parse(self, chunk):
+        lines = chunk.decode().strip().split('\n')
+        fields = dict(line.split(': ', 1) for line in lines)
+        return fields['event'], json.loads(fields['data'])
+
+    async def test_stream_balance(self):
+        """Test the stream sends the balance, then every charge."""
+        service = RequestService()
+        await run_in_pool(service.charge_phone_number, self.seller.id,
+                          '+989120000000', Decimal('10.00'))
+
+        res = await self.async_client.get(BALANCE_EVENTS_URL,
+                                          headers=self.headers)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        stream = aiter(res.streaming_content)
+        try:
+            name, data = self.parse(await anext(stream))
+            self.assertEqual(name, 'balance')
+            self.assertEqual(data['credit'], '90.00')
+
+            charged = await run_in_pool(
+                service.charge_phone_number, self.seller.id,
+                '+989120000000', Decimal('5.00'))
+            name, data = self.parse(
+                await asyncio.wait_for(anext(stream), 1))
+            self.assertEqual(data, {'credit': '85.00',
+                                    'transaction_id': charged.id,
+                                    'amount': '-5.00',
+                                    'type': 'Withdraw'})
+
+            # a disconnect cancels the task sending the response.
+            waiting = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            self.assertFalse(BalanceBroker().has_subscribers(self.seller.id))
+        finally:
+            await stream.aclose()
+
+    @override_settings(BALANCE_EVENTS={**BALANCE_EVENTS,
+                                       'HEARTBEAT_SECONDS': 0.01})
+    async def test_heartbeat(self):
+        """Test an idle stream sends comments."""
+        res = await self.async_client.get(BALANCE_EVENTS_URL,
+                                          headers=self.headers)
+        stream = aiter(res.streaming_content)
+        try:
+            self.assertEqual(await anext(stream), b': heartbeat\n\n')
+        finally:
+            await stream.aclose()
+
+    @override_settings(BALANCE_EVENTS={**BALANCE_EVENTS,
+                                       'RECHECK_SECONDS': 0.01,
+                                       'SETTLE_SECONDS': 0})
+    async def test_commits_of_other_processes(self):
+        """Test transactions written without the hooks are published."""
+        broker = BalanceBroker()
+        subscriber = broker.subscribe(self.seller.id)
+        try:
+            await asyncio.sleep(0.05)
+            transaction_obj = await Transaction.objects.acreate(
+                seller=self.seller, amount=Decimal('5.00'),
+                credit_before_transaction=Decimal('100.00'),
+                credit_after_transaction=Decimal('105.00'),
+                type=Transaction.Type.DEPOSIT)
+
+            published = await asyncio.wait_for(subscriber.queue.get(), 1)
+
+            self.assertEqual(published['transaction_id'], transaction_obj.id)
+            self.assertEqual(published['credit'], '105.00')
+        finally:
+            broker.unsubscribe(subscriber)
+
+    @override_settings(BALANCE_EVENTS={**BALANCE_EVENTS,
+                                       'RECHECK_SECONDS': 0.01,
+                                       'SETTLE_SECONDS': 0})
+    async def test_poller_survives_errors(self):
+        """Test a failing poll is logged and retried."""
+        broker = BalanceBroker()
+        fetch = BalanceBroker._fetch
+        failures = []
+
+        def failing_fetch(self, last_id):
+            if not failures:
+                failures.append(last_id)
+                raise OperationalError('server has gone away')
+            return fetch(self, last_id)
+
+        with mock.patch.object(BalanceBroker, '_fetch', failing_fetch), \
+                self.assertLogs('request.events', 'ERROR'):
+            subscriber = broker.subscribe(self.seller.id)
+            try:
+                await asyncio.sleep(0.05)
+                transaction_obj = await Transaction.objects.acreate(
+                    seller=self.seller, amount=Decimal('5.00'),
+                    credit_before_transaction=Decimal('100.00'),
+                    credit_after_transaction=Decimal('105.00'),
+                    type=Transaction.Type.DEPOSIT)
+
+                published = await asyncio.wait_for(subscriber.queue.get(), 1)
+            finally:
+                broker.unsubscribe(subscriber)
+
+        self.assertEqual(published['transaction_id'], transaction_obj.id)
+        self.assertEqual(len(failures), 1)
+
+    async def test_authentication_required(self):
+        """Test the stream needs a valid token."""
+        res = await self.async_client.get(BALANCE_EVENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
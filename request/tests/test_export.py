@@ -0,0 +1,126 @@
+"""
+Tests for the streamed ledger export.
+"""
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import (
+    Seller,
+    Transaction,
+)
+
+EXPORT_URL = reverse('request:transaction-export')
+
+
+def create_seller(email='email@test.com'):
+    return Seller.objects.create_user(email=email, password='test1234')
+
+
+def create_transaction(seller, amount=Decimal('1')):
+    return Transaction.objects.create(
+        seller=seller,
+        amount=amount,
+        credit_before_transaction=Decimal('0'),
+        credit_after_transaction=amount,
+        type=Transaction.Type.DEPOSIT,
+        detail='test'
+    )
+
+
+@override_settings(LEDGER_EXPORT_CHUNK_SIZE=2)
+class LedgerExportTests(APITestCase):
+    """Test exporting the ledger of a seller."""
+
+    def setUp(self):
+        self.seller = create_seller()
+        self.client.force_authenticate(user=self.seller)
+        self.transactions = [create_transaction(self.seller, Decimal(i))
+                             for i in range(1, 6)]
+        create_transaction(create_seller(email='other@test.com'))
+
+    def read(self, res):
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        body = b''.join(res.streaming_content)
+        if res.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body.decode()
+
+    def test_export_ndjson(self):
+        """Test every transaction of the seller is exported in order."""
+        res = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+
+        rows = [json.loads(line) for line in self.read(res).splitlines()]
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([row['id'] for row in rows],
+                         [t.id for t in self.transactions])
+        self.assertEqual(rows[0]['amount'], '1.00')
+        self.assertTrue(all(row['seller_id'] == self.seller.id
+                            for row in rows))
+
+    def test_export_csv(self):
+        """Test the csv export has a header and a line per transaction."""
+        res = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        rows = list(csv.DictReader(io.StringIO(self.read(res))))
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertEqual([int(row['id']) for row in rows],
+                         [t.id for t in self.transactions])
+        self.assertEqual(rows[-1]['amount'], '5.00')
+
+    def test_export_time_range(self):
+        """Test from is inclusive and to is exclusive."""
+        now = timezone.now()
+        Transaction.objects.filter(id=self.transactions[0].id) \
+            .update(transaction_time=now - timedelta(days=2))
+        Transaction.objects.filter(id=self.transactions[-1].id) \
+            .update(transaction_time=now + timedelta(days=2))
+
+        res = self.client.get(EXPORT_URL, {
+            'format': 'ndjson',
+            'from': (now - timedelta(days=1)).isoformat(),
+            'to': (now + timedelta(days=1)).isoformat(),
+        })
+
+        rows = [json.loads(line) for line in self.read(res).splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [t.id for t in self.transactions[1:-1]])
+
+    def test_export_gzip(self):
+        """Test the export is compressed when the client accepts gzip."""
+        res = self.client.get(EXPORT_URL, {'format': 'csv'},
+                              HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(len(self.read(res).splitlines()), 6)
+
+    def test_export_gzip_refused(self):
+        """Test gzip with a zero quality is not used."""
+        for accept_encoding in ('gzip;q=0, deflate', 'br, *;q=0',
+                                'identity'):
+            res = self.client.get(EXPORT_URL, {'format': 'csv'},
+                                  HTTP_ACCEPT_ENCODING=accept_encoding)
+
+            self.assertNotIn('Content-Encoding', res)
+            self.assertEqual(len(self.read(res).splitlines()), 6)
+
+        res = self.client.get(EXPORT_URL, {'format': 'csv'},
+                              HTTP_ACCEPT_ENCODING='br;q=1, *;q=0.5')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    def test_export_invalid_bound(self):
+        """Test a malformed time bound is rejected as csv."""
+        res = self.client.get(EXPORT_URL, {'format': 'csv', 'from': 'nope'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(res.content.decode())))
+        self.assertEqual(rows[0], ['detail'])
+        self.assertIn('Datetime has wrong format', rows[1][0])
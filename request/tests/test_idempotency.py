@@ -0,0 +1,190 @@
+"""
+Tests for Idempotency-Key handling.
+"""
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITransactionTestCase
+from request import idempotency
+from request.services import RequestService
+from core.models import (
+    CreditRequest,
+    IdempotencyKey,
+    Seller,
+    Transaction,
+)
+
+CREDIT_REQUEST_URL = reverse('request:credit-request')
+CHARGE_PHONE_NUMBER_URL = reverse('request:charge-phone-number')
+PAYLOAD = {'phone_number': '+989123456789', 'amount': '5.00'}
+
+
+def create_seller(email='email@test.com', credit=Decimal('0')):
+    return Seller.objects.create_user(
+        email=email, password='test1234', credit=credit)
+
+
+class IdempotencyKeyTests(APITransactionTestCase):
+    """Test repeated POSTs with the same Idempotency-Key."""
+
+    def setUp(self):
+        idempotency._responses.clear()
+        self.seller = create_seller(credit=Decimal('100'))
+        self.client.force_authenticate(user=self.seller)
+
+    def charge(self, key='key-1', payload=PAYLOAD, client=None):
+        return (client or self.client).post(
+            CHARGE_PHONE_NUMBER_URL, payload, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeated_charge_is_replayed(self):
+        """Test a retried charge returns the first response only once."""
+        first = self.charge()
+        second = self.charge()
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_replay_from_database_after_cache_miss(self):
+        """Test the stored response is used when the cache is cold."""
+        first = self.charge()
+        idempotency._responses.clear()
+
+        with mock.patch.object(RequestService, 'charge_phone_number') as charge:
+            second = self.charge()
+
+        charge.assert_not_called()
+        self.assertEqual(second.data, first.data)
+
+    def test_replay_from_cache_skips_database(self):
+        """Test a cached replay does not touch the database."""
+        self.charge()
+
+        with self.assertNumQueries(0):
+            self.charge()
+
+    def test_different_keys_charge_twice(self):
+        """Test distinct keys are separate charges."""
+        self.charge(key='key-1')
+        self.charge(key='key-2')
+
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_key_reused_with_other_payload(self):
+        """Test reusing a key for another payload is refused."""
+        self.charge()
+        res = self.charge(payload=dict(PAYLOAD, amount='6.00'))
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_keys_are_per_endpoint(self):
+        """Test the same key on another endpoint is a new request."""
+        self.charge()
+        res = self.client.post(CREDIT_REQUEST_URL, {'amount': '5.00'},
+                               HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CreditRequest.objects.count(), 1)
+
+    def test_concurrent_requests_with_same_key(self):
+        """Test a request in flight blocks a second one with its key."""
+        started = threading.Event()
+        release = threading.Event()
+        charge = RequestService.charge_phone_number
+
+        def slow_charge(service, *args, **kwargs):
+            started.set()
+            release.wait(5)
+            return charge(service, *args, **kwargs)
+
+        responses = {}
+
+        def first_request():
+            client = APIClient()
+            client.force_authenticate(user=self.seller)
+            try:
+                responses['first'] = self.charge(client=client)
+            finally:
+                connection.close()
+
+        with mock.patch.object(RequestService, 'charge_phone_number',
+                               slow_charge):
+            thread = threading.Thread(target=first_request)
+            thread.start()
+            started.wait(5)
+            responses['second'] = self.charge()
+            release.set()
+            thread.join()
+
+        self.assertEqual(responses['first'].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses['second'].status_code,
+                         status.HTTP_409_CONFLICT)
+        third = self.charge()
+        self.assertEqual(third.data, responses['first'].data)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_racing_requests_charge_once(self):
+        """Test requests racing with one key never charge twice."""
+        barrier = threading.Barrier(4)
+        responses = []
+
+        def request():
+            client = APIClient()
+            client.force_authenticate(user=self.seller)
+            barrier.wait()
+            try:
+                responses.append(self.charge(client=client))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        self.assertTrue(all(res.status_code in (status.HTTP_200_OK,
+                                                status.HTTP_409_CONFLICT)
+                            for res in responses))
+
+    def test_failed_request_can_be_retried(self):
+        """Test a server error does not keep the key."""
+        with mock.patch.object(RequestService, 'charge_phone_number',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.charge()
+
+        res = self.charge()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_abandoned_claim_is_taken_over(self):
+        """Test a claim without a response is taken over after the lease."""
+        record = IdempotencyKey.objects.create(
+            seller=self.seller, scope='ChargePhoneNumberViewSet',
+            key='key-1', request_hash='lost')
+
+        self.assertEqual(self.charge().status_code, status.HTTP_409_CONFLICT)
+
+        IdempotencyKey.objects.filter(id=record.id).update(
+            claimed_at=timezone.now() - timedelta(
+                seconds=settings.IDEMPOTENCY['LEASE_SECONDS'] + 1))
+        res = self.charge()
+        idempotency.finish(record, status.HTTP_200_OK, {'stale': True})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.charge().data, res.data)
+        self.assertEqual(Transaction.objects.count(), 1)
@@ -0,0 +1,234 @@
+"""
+Tests for credit leasing.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from request.leasing import (
+    CreditLeaseManager,
+    PendingCharge,
+    get_outstanding_credit
+)
+from request.services import RequestService
+from core.models import (
+    CreditLease,
+    CreditRequest,
+    Seller,
+    Transaction,
+)
+
+
+def create_seller(email='email@test.com', credit=Decimal('0')):
+    return get_user_model().objects.create_user(
+        email=email, password='test1234', credit=credit)
+
+
+CHARGE_PHONE_NUMBER_URL = reverse('request:charge-phone-number')
+ME_URL = reverse('seller:me')
+ASYNC_ME_URL = reverse('async-seller:me')
+LEASING = {
+    'SELLER_IDS': [],
+    'FRACTION': '0.1',
+    'TTL_SECONDS': 30,
+    'FLUSH_INTERVAL_MS': 5,
+    'FLUSH_BATCH_SIZE': 500,
+    'WAIT_FOR_FLUSH': True,
+}
+
+
+class CreditLeaseTest(TransactionTestCase):
+    """Test charging sellers against leased credit."""
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('100.00'))
+        self.service = RequestService()
+        self.manager = CreditLeaseManager()
+        settings = override_settings(
+            CREDIT_LEASING=dict(LEASING, SELLER_IDS=[self.seller.id]))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(self.manager.shutdown)
+
+    def charge(self, amount):
+        return self.service.charge_phone_number(
+            self.seller.id, '+989114412191', Decimal(amount))
+
+    def assertLedgerBalanced(self):
+        """Assert seller credit plus outstanding leases match the ledger."""
+        self.seller.refresh_from_db()
+        total = Transaction.objects.filter(seller=self.seller) \
+            .aggregate(total=Sum('amount'))['total'] or 0
+        self.assertEqual(
+            self.seller.credit + get_outstanding_credit(self.seller.id),
+            Decimal('100.00') + total)
+
+    def test_charge_leases_a_slice_of_credit(self):
+        """Test the first charge leases a slice of the seller credit."""
+        transaction = self.charge('4.00')
+
+        lease = CreditLease.objects.get()
+        self.assertEqual(lease.amount, Decimal('10.00'))
+        self.assertEqual(lease.used, Decimal('4.00'))
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('90.00'))
+        self.assertIsNotNone(transaction.id)
+        self.assertEqual(transaction.credit_before_transaction,
+                         Decimal('100.00'))
+        self.assertEqual(transaction.credit_after_transaction,
+                         Decimal('96.00'))
+        self.assertLedgerBalanced()
+
+    def test_exhausted_lease_is_renewed(self):
+        """Test a lease that can not cover a charge is swapped."""
+        self.charge('4.00')
+        transaction = self.charge('8.00')
+
+        leases = CreditLease.objects.order_by('id')
+        self.assertEqual(
+            [lease.status for lease in leases],
+            [CreditLease.Status.RELEASED, CreditLease.Status.ACTIVE])
+        self.assertEqual(transaction.credit_before_transaction,
+                         Decimal('96.00'))
+        self.assertEqual(transaction.credit_after_transaction,
+                         Decimal('88.00'))
+        self.assertLedgerBalanced()
+
+    def test_charge_insufficient_credit(self):
+        """Test charging more than the seller has fails."""
+        with self.assertRaises(Seller.InsufficientCreditError):
+            self.charge('100.01')
+
+        self.assertLedgerBalanced()
+
+    def test_deposit_continues_ledger(self):
+        """Test deposits count the credit held by leases."""
+        self.charge('4.00')
+        request = CreditRequest.objects.create(
+            seller=self.seller, amount=Decimal('50.00'))
+
+        transaction = self.service.accept_credit_request(request.id)
+
+        self.assertEqual(transaction.credit_before_transaction,
+                         Decimal('96.00'))
+        self.assertEqual(transaction.credit_after_transaction,
+                         Decimal('146.00'))
+        self.assertLedgerBalanced()
+
+    def test_shutdown_returns_unused_credit(self):
+        """Test shutting down returns the unused lease to the seller."""
+        self.charge('4.00')
+
+        self.manager.shutdown()
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('96.00'))
+        self.assertEqual(get_outstanding_credit(self.seller.id), 0)
+
+    def test_shutdown_takes_leases_before_flushing(self):
+        """Test no charge is approved between the last flush and release."""
+        flush = self.manager.flush
+        leases_at_flush = []
+
+        def record_leases():
+            leases_at_flush.append(dict(self.manager._leases))
+            flush()
+
+        with override_settings(CREDIT_LEASING=dict(
+                LEASING, SELLER_IDS=[self.seller.id],
+                WAIT_FOR_FLUSH=False, FLUSH_INTERVAL_MS=60000)):
+            pending = self.charge('4.00')
+            with mock.patch.object(self.manager, 'flush', record_leases):
+                self.manager.shutdown()
+
+        # the stopping flusher may flush once more before shutdown does.
+        self.assertEqual(leases_at_flush[-1], {})
+        self.assertEqual(pending.future.result().amount, Decimal('-4.00'))
+        self.assertEqual(get_outstanding_credit(self.seller.id), 0)
+        self.assertLedgerBalanced()
+
+    def test_charge_without_waiting_for_flush(self):
+        """Test charges can return before their ledger row is written."""
+        with override_settings(CREDIT_LEASING=dict(
+                LEASING, SELLER_IDS=[self.seller.id],
+                WAIT_FOR_FLUSH=False, FLUSH_INTERVAL_MS=60000)):
+            pending = self.charge('4.00')
+
+            self.assertIsInstance(pending, PendingCharge)
+            self.assertFalse(Transaction.objects.exists())
+            self.manager.flush()
+            self.assertEqual(pending.future.result().amount, Decimal('-4.00'))
+
+        self.assertEqual(Transaction.objects.get().amount, Decimal('-4.00'))
+        self.assertLedgerBalanced()
+
+    def test_charge_api_accepts_pending_charge(self):
+        """Test the charge API answers 202 for a charge not written yet."""
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        with override_settings(CREDIT_LEASING=dict(
+                LEASING, SELLER_IDS=[self.seller.id],
+                WAIT_FOR_FLUSH=False, FLUSH_INTERVAL_MS=60000)):
+            res = client.post(CHARGE_PHONE_NUMBER_URL, {
+                'phone_number': '+989114412191', 'amount': '4.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        lease = CreditLease.objects.get()
+        self.assertEqual(res.data, {'status': 'pending', 'lease': lease.id,
+                                    'phone_number': '+989114412191',
+                                    'amount': '4.00'})
+
+    async def lease_credit(self):
+        """move 10.00 of the seller credit into a lease with 3.00 used."""
+        await CreditLease.objects.acreate(
+            seller=self.seller,
+            owner='other-worker',
+            amount=Decimal('10.00'),
+            used=Decimal('3.00'),
+            expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        await Seller.objects.filter(id=self.seller.id).aupdate(
+            credit=Decimal('90.00'))
+
+    async def test_me_includes_outstanding_lease_credit(self):
+        """Test /me reports the credit still held by active leases."""
+        await self.lease_credit()
+        token = await Token.objects.acreate(user=self.seller)
+
+        res = await self.async_client.get(
+            ASYNC_ME_URL, headers={'authorization': f'Token {token.key}'})
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        sync_res = await sync_to_async(client.get)(ME_URL)
+
+        self.assertEqual(res.json()['credit'], '97.00')
+        self.assertEqual(sync_res.data['credit'], '97.00')
+
+    def test_release_expired_leases_command(self):
+        """Test abandoned leases are returned by the command."""
+        lease = CreditLease.objects.create(
+            seller=self.seller,
+            owner='dead-worker',
+            amount=Decimal('10.00'),
+            used=Decimal('3.00'),
+            expires_at=timezone.now() - timedelta(minutes=5)
+        )
+        Seller.objects.filter(id=self.seller.id).update(
+            credit=Decimal('90.00'))
+
+        call_command('release_credit_leases', grace=60, stdout=StringIO())
+
+        lease.refresh_from_db()
+        self.seller.refresh_from_db()
+        self.assertEqual(lease.status, CreditLease.Status.RELEASED)
+        self.assertEqual(self.seller.credit, Decimal('97.00'))
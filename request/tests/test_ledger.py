@@ -0,0 +1,143 @@
+"""
+Tests for balance checkpoints and the balance-at-time API.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import (
+    BalanceCheckpoint,
+    Seller,
+    Transaction,
+)
+from request.ledger import LedgerService
+
+BALANCE_URL = reverse('request:transaction-balance')
+
+
+def create_seller(email='email@test.com', **params):
+    return Seller.objects.create_user(email=email, password='test1234',
+                                      **params)
+
+
+def create_ledger(seller, amounts, start):
+    """write a chained ledger with a transaction every minute."""
+    credit = Decimal('100.00')
+    for minute, amount in enumerate(amounts):
+        transaction_obj = Transaction.objects.create(
+            seller=seller,
+            amount=amount,
+            credit_before_transaction=credit,
+            credit_after_transaction=credit + amount,
+            type=Transaction.Type.DEPOSIT if amount > 0
+            else Transaction.Type.WITHDRAW,
+            detail='test'
+        )
+        Transaction.objects.filter(id=transaction_obj.id).update(
+            transaction_time=start + timedelta(minutes=minute))
+        credit += amount
+
+
+@override_settings(LEDGER_CHECKPOINTS={'INTERVAL': 3, 'SETTLE_SECONDS': 0})
+class LedgerServiceTests(APITestCase):
+    """Test checkpointing and replaying the ledger."""
+
+    def setUp(self):
+        self.seller = create_seller()
+        self.start = timezone.now() - timedelta(days=1)
+        self.amounts = [Decimal(a) for a in
+                        ['10', '-3', '5', '-7', '20', '-1', '4', '-2']]
+        create_ledger(self.seller, self.amounts, self.start)
+        self.service = LedgerService()
+
+    def expected(self, minutes):
+        return Decimal('100.00') + sum(self.amounts[:minutes + 1],
+                                       Decimal('0'))
+
+    def test_checkpoint_every_interval(self):
+        """Test a checkpoint is added for every full interval only."""
+        self.service.checkpoint(self.seller.id)
+        self.service.checkpoint(self.seller.id)
+
+        checkpoints = BalanceCheckpoint.objects.order_by('last_transaction_id')
+        self.assertEqual([c.credit for c in checkpoints],
+                         [self.expected(2), self.expected(5)])
+
+    def test_credit_at_time(self):
+        """Test the balance matches a full replay at every point in time."""
+        call_command('checkpoint_ledger', stdout=StringIO())
+
+        self.assertEqual(
+            self.service.get_credit_at(
+                self.seller.id, self.start - timedelta(seconds=1)),
+            Decimal('100.00'))
+        for minute in range(len(self.amounts)):
+            at = self.start + timedelta(minutes=minute, seconds=30)
+            self.assertEqual(self.service.get_credit_at(self.seller.id, at),
+                             self.expected(minute))
+
+    def test_credit_without_transactions(self):
+        """Test the balance of a seller without a ledger is its credit."""
+        seller = create_seller(email='other@test.com', credit=Decimal('7'))
+
+        self.assertEqual(
+            self.service.get_credit_at(seller.id, timezone.now()),
+            Decimal('7'))
+
+
+class BalanceApiTests(APITestCase):
+    """Test the balance-at-time API."""
+
+    def setUp(self):
+        self.seller = create_seller()
+        self.start = timezone.now() - timedelta(days=1)
+        create_ledger(self.seller, [Decimal('10'), Decimal('-4')], self.start)
+
+    def test_seller_balance(self):
+        """Test a seller reads its own balance."""
+        self.client.force_authenticate(user=self.seller)
+        res = self.client.get(BALANCE_URL, {
+            'at': (self.start + timedelta(seconds=30)).isoformat()})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['seller'], self.seller.id)
+        self.assertEqual(Decimal(res.data['credit']), Decimal('110.00'))
+
+    def test_seller_cannot_read_other_balance(self):
+        """Test the seller parameter is ignored for sellers."""
+        other = create_seller(email='other@test.com')
+        self.client.force_authenticate(user=other)
+        res = self.client.get(BALANCE_URL, {
+            'at': timezone.now().isoformat(), 'seller': self.seller.id})
+
+        self.assertEqual(res.data['seller'], other.id)
+
+    def test_staff_reads_any_balance(self):
+        """Test staff users pick the seller."""
+        staff = create_seller(email='staff@test.com', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        res = self.client.get(BALANCE_URL, {
+            'at': timezone.now().isoformat(), 'seller': self.seller.id})
+
+        self.assertEqual(Decimal(res.data['credit']), Decimal('106.00'))
+
+    def test_staff_reads_unknown_seller(self):
+        """Test the balance of a seller that does not exist is not found."""
+        staff = create_seller(email='staff@test.com', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        res = self.client.get(BALANCE_URL, {
+            'at': timezone.now().isoformat(), 'seller': staff.id + 1000})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_balance_requires_time(self):
+        """Test the time parameter is required."""
+        self.client.force_authenticate(user=self.seller)
+        res = self.client.get(BALANCE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
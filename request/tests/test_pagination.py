@@ -0,0 +1,90 @@
+"""
+Tests for keyset pagination of the list APIs.
+"""
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import (
+    CreditRequest,
+    Seller,
+    Transaction,
+)
+
+TRANSACTION_URL = reverse('request:transaction-list')
+CREDIT_REQUEST_LIST_URL = reverse('request:creditrequest-list')
+
+
+def create_seller(email='email@test.com'):
+    return Seller.objects.create_user(email=email, password='test1234')
+
+
+def create_transaction(seller, amount=Decimal('1')):
+    return Transaction.objects.create(
+        seller=seller,
+        amount=amount,
+        credit_before_transaction=Decimal('0'),
+        credit_after_transaction=amount,
+        type=Transaction.Type.DEPOSIT,
+        detail='test'
+    )
+
+
+class KeysetPaginationTests(APITestCase):
+    """Test walking the transaction list page by page."""
+
+    def setUp(self):
+        self.seller = create_seller()
+        self.client.force_authenticate(user=self.seller)
+        self.transactions = [create_transaction(self.seller)
+                             for _ in range(5)]
+        create_transaction(create_seller(email='other@test.com'))
+
+    def walk(self, url):
+        ids = []
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in res.data['results'])
+            url = res.data['next']
+        return ids
+
+    def test_pages_cover_all_rows_newest_first(self):
+        """Test every row of the seller is listed exactly once."""
+        ids = self.walk(f'{TRANSACTION_URL}?page_size=2')
+
+        self.assertEqual(ids, [t.id for t in reversed(self.transactions)])
+
+    def test_rows_with_same_time_are_split_by_id(self):
+        """Test ties on the time column are broken by id."""
+        Transaction.objects.update(transaction_time=timezone.now())
+
+        ids = self.walk(f'{TRANSACTION_URL}?page_size=2')
+
+        self.assertEqual(ids, [t.id for t in reversed(self.transactions)])
+
+    def test_pages_do_not_count(self):
+        """Test no COUNT(*) is run for a page."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'{TRANSACTION_URL}?page_size=2')
+
+        self.assertFalse(any('COUNT(' in query['sql'].upper()
+                             for query in queries))
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected."""
+        res = self.client.get(f'{TRANSACTION_URL}?cursor=nonsense')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_credit_requests_paginated(self):
+        """Test the credit request list is paginated by request time."""
+        requests = [CreditRequest.objects.create(
+            seller=self.seller, amount=Decimal('1')) for _ in range(3)]
+
+        ids = self.walk(f'{CREDIT_REQUEST_LIST_URL}?page_size=2')
+
+        self.assertEqual(ids, [r.id for r in reversed(requests)])
@@ -0,0 +1,134 @@
+"""
+Tests for the asynchronous charge queue.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import OperationalError
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+from request.queue import ChargeQueue
+from core.models import (
+    ChargeJob,
+    Seller,
+)
+
+ASYNC_CHARGE_PHONE_NUMBER_URL = reverse('request:async-charge-phone-number')
+
+
+def charge_job_url(job_id):
+    return reverse('request:charge-job', args=[job_id])
+
+
+def create_seller(email='email@test.com', credit=Decimal('0')):
+    return Seller.objects.create_user(
+        email=email, password='test1234', credit=credit)
+
+
+def run_worker():
+    call_command('run_charge_worker', once=True, stdout=StringIO())
+
+
+class AsyncChargeApiTests(APITransactionTestCase):
+    """Test queueing charges and polling their status."""
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('10'))
+        self.client.force_authenticate(user=self.seller)
+
+    def enqueue(self, amount):
+        return self.client.post(ASYNC_CHARGE_PHONE_NUMBER_URL, {
+            'phone_number': '+989123456789',
+            'amount': amount,
+        })
+
+    def test_charge_is_queued(self):
+        """Test the charge is accepted without touching the credit."""
+        res = self.enqueue('4.00')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], ChargeJob.Status.QUEUED)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('10'))
+
+    def test_invalid_amount_rejected(self):
+        """Test a zero amount is refused before it is queued."""
+        res = self.enqueue('0')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChargeJob.objects.exists())
+
+    def test_worker_charges_queued_jobs(self):
+        """Test the worker charges jobs and reports them through status."""
+        first = self.enqueue('4.00').data['id']
+        second = self.enqueue('8.00').data['id']
+
+        run_worker()
+
+        res = self.client.get(charge_job_url(first))
+        self.assertEqual(res.data['status'], ChargeJob.Status.SUCCEEDED)
+        self.assertEqual(res.data['transaction']['amount'], '-4.00')
+        res = self.client.get(charge_job_url(second))
+        self.assertEqual(res.data['status'], ChargeJob.Status.FAILED)
+        self.assertEqual(res.data['error'], 'Seller credit is insufficient.')
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('6.00'))
+
+    def test_other_sellers_job_not_found(self):
+        """Test sellers can only see their own jobs."""
+        job_id = self.enqueue('4.00').data['id']
+        self.client.force_authenticate(
+            user=create_seller(email='other@test.com'))
+
+        res = self.client.get(charge_job_url(job_id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stale_claims_are_requeued(self):
+        """Test jobs of a dead worker go back to the queue."""
+        self.enqueue('4.00')
+        queue = ChargeQueue()
+        queue.claim(10)
+        ChargeJob.objects.update(
+            claimed_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertEqual(queue.requeue_stale(60), 1)
+        self.assertEqual(ChargeJob.objects.get().status,
+                         ChargeJob.Status.QUEUED)
+
+    def test_requeued_job_is_not_charged_by_stale_worker(self):
+        """Test a slow worker skips a job another worker claimed since."""
+        self.enqueue('4.00')
+        queue = ChargeQueue()
+        stale_jobs = queue.claim(10)
+        ChargeJob.objects.update(
+            claimed_at=timezone.now() - timedelta(minutes=10))
+        queue.requeue_stale(60)
+        queue.process(queue.claim(10))
+
+        queue.process(stale_jobs)
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('6.00'))
+        self.assertEqual(ChargeJob.objects.get().status,
+                         ChargeJob.Status.SUCCEEDED)
+
+    def test_failed_seller_releases_jobs(self):
+        """Test jobs of a seller whose charge errors go back to the queue."""
+        self.enqueue('4.00')
+        queue = ChargeQueue()
+        jobs = queue.claim(10)
+
+        with mock.patch('request.services.RequestService'
+                        '.bulk_charge_phone_numbers',
+                        side_effect=OperationalError('deadlock')), \
+                self.assertLogs('request.queue', 'ERROR'):
+            queue.process(jobs)
+
+        job = ChargeJob.objects.get()
+        self.assertEqual(job.status, ChargeJob.Status.QUEUED)
+        self.assertIsNone(job.claimed_at)
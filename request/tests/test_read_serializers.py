@@ -0,0 +1,114 @@
+"""
+Tests for the read only fast path of the list APIs.
+"""
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from core.models import (
+    CreditRequest,
+    Seller,
+    Transaction,
+)
+from request import serializers
+
+TRANSACTION_URL = reverse('request:transaction-list')
+CREDIT_REQUEST_LIST_URL = reverse('request:creditrequest-list')
+
+
+def create_seller(email='email@test.com', **params):
+    return Seller.objects.create_user(email=email, password='test1234',
+                                      **params)
+
+
+def create_transaction(seller, amount, credit_bucket=None):
+    return Transaction.objects.create(
+        seller=seller,
+        amount=amount,
+        credit_before_transaction=Decimal('0'),
+        credit_after_transaction=amount,
+        type=Transaction.Type.DEPOSIT,
+        credit_bucket=credit_bucket,
+        detail='test'
+    )
+
+
+class FastReadTests(APITestCase):
+    """Test the fast path renders exactly what the serializers do."""
+
+    def setUp(self):
+        self.seller = create_seller(name='Seller', about='about')
+        self.client.force_authenticate(user=self.seller)
+        create_transaction(self.seller, Decimal('10'))
+        create_transaction(self.seller, Decimal('0.5'), credit_bucket=3)
+        create_transaction(self.seller, Decimal('-1234.75'))
+        for amount in ['1', '20.25', '300']:
+            CreditRequest.objects.create(seller=self.seller,
+                                         amount=Decimal(amount))
+
+    def expected(self, serializer_class, queryset):
+        data = serializer_class(queryset, many=True).data
+        return JSONRenderer().render({'next': None, 'results': data})
+
+    def test_transaction_list_matches(self):
+        """Test the transaction list is byte for byte the serializer's."""
+        res = self.client.get(TRANSACTION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, self.expected(
+            serializers.TransactionSerializer,
+            Transaction.objects.order_by('-transaction_time', '-id')))
+
+    def test_credit_request_list_matches(self):
+        """Test the nested seller is rendered without a query per row."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(CREDIT_REQUEST_LIST_URL)
+
+        # the seller state of the ETag, then the page.
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(res.content, self.expected(
+            serializers.CreditRequestSerializer,
+            CreditRequest.objects.with_transaction()
+            .order_by('-request_time', '-id')))
+
+    def test_retrieve_matches(self):
+        """Test a single transaction is rendered like the serializer."""
+        transaction_obj = Transaction.objects.last()
+        res = self.client.get(
+            reverse('request:transaction-detail', args=[transaction_obj.id]))
+
+        self.assertEqual(res.content, JSONRenderer().render(
+            serializers.TransactionSerializer(transaction_obj).data))
+
+    def test_retrieve_other_seller(self):
+        """Test a transaction of another seller is not found."""
+        other = create_transaction(create_seller(email='other@test.com'),
+                                   Decimal('1'))
+        res = self.client.get(
+            reverse('request:transaction-detail', args=[other.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_invalid_id(self):
+        """Test an id that is not a number is not found."""
+        for name in ('transaction-detail', 'creditrequest-detail'):
+            res = self.client.get(reverse(f'request:{name}', args=['abc']))
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sparse_fields(self):
+        """Test the fields parameter limits the rendered fields."""
+        res = self.client.get(TRANSACTION_URL, {'fields': 'id,amount'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([list(row) for row in res.data['results']],
+                         [['id', 'amount']] * 3)
+
+    def test_unknown_field(self):
+        """Test an unknown field is rejected."""
+        res = self.client.get(TRANSACTION_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,90 @@
+"""
+Tests for the reconcile_credit command.
+"""
+import json
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from core.models import (
+    ReconciliationMark,
+    Seller,
+    Transaction,
+)
+from request.services import RequestService
+
+
+def create_seller(email='email@test.com', credit=Decimal('100.00')):
+    return Seller.objects.create_user(email=email, password='test1234',
+                                      credit=credit)
+
+
+def reconcile(*args):
+    out = StringIO()
+    call_command('reconcile_credit', *args, '--workers', '1',
+                 '--chunk-size', '2', stdout=out)
+    return json.loads(out.getvalue())
+
+
+@override_settings(RECONCILIATION={'CHUNK_SIZE': 2, 'SETTLE_SECONDS': 0})
+class ReconcileCreditTests(TestCase):
+    """Test reconciling seller credit with the ledger."""
+
+    def setUp(self):
+        self.seller = create_seller()
+        service = RequestService()
+        for _ in range(3):
+            service.charge_phone_number(
+                self.seller.id, '09123456789', Decimal('10'))
+
+    def test_consistent_ledger(self):
+        """Test a consistent ledger reports no discrepancies."""
+        report = reconcile()
+
+        self.assertEqual(report['transactions'], 3)
+        self.assertEqual(report['discrepancy_count'], 0)
+        mark = ReconciliationMark.objects.get(seller=self.seller)
+        self.assertEqual(mark.credit, Decimal('70.00'))
+
+    def test_broken_chain(self):
+        """Test a row not continuing the previous one is reported."""
+        transaction_obj = Transaction.objects.order_by('id').last()
+        Transaction.objects.filter(id=transaction_obj.id).update(
+            credit_before_transaction=Decimal('85.00'),
+            credit_after_transaction=Decimal('75.00'))
+
+        report = reconcile()
+
+        self.assertEqual(
+            [(d['kind'], d['transaction']) for d in report['discrepancies']],
+            [('chain', transaction_obj.id)])
+
+    def test_credit_mismatch(self):
+        """Test a seller credit not matching its ledger is reported."""
+        Seller.objects.filter(id=self.seller.id).update(credit=Decimal('60'))
+
+        report = reconcile()
+
+        self.assertEqual(report['discrepancies'][0]['kind'], 'balance')
+        self.assertEqual(report['discrepancies'][0]['expected'], '70.00')
+
+    def test_incremental_run(self):
+        """Test a later run only checks rows after the mark."""
+        reconcile()
+        RequestService().charge_phone_number(
+            self.seller.id, '09123456789', Decimal('5'))
+
+        report = reconcile()
+
+        self.assertEqual(report['transactions'], 1)
+        self.assertEqual(report['discrepancy_count'], 0)
+        self.assertEqual(reconcile('--full')['transactions'], 4)
+
+    def test_unsettled_rows_are_rechecked(self):
+        """Test the mark does not move over rows that may still change."""
+        with self.settings(RECONCILIATION={'CHUNK_SIZE': 2,
+                                           'SETTLE_SECONDS': 3600}):
+            reconcile()
+
+        self.assertEqual(ReconciliationMark.objects.get(
+            seller=self.seller).last_transaction_id, 0)
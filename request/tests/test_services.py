@@ -2,7 +2,7 @@
 Tests for request services.
 """
 import threading
-from django.test import TransactionTestCase
+from django.test import TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from request.services import RequestService
 from django.db import transaction
@@ -10,6 +10,7 @@ from decimal import Decimal
 from core.models import (
     CreditRequest,
     Seller,
+    Transaction,
 )
 
 
@@ -132,6 +133,208 @@ class ServiceTest(TransactionTestCase):
         self.seller.refresh_from_db()
         self.assertEqual(self.seller.credit, Decimal('100'))
 
+    def test_lock_observer(self):
+        """Test lock observers are told about every seller lock."""
+        locks = []
+
+        def observe(seller_id, seconds):
+            locks.append((seller_id, seconds))
+
+        self.service.add_lock_observer(observe)
+        try:
+            self.service.charge_phone_number(
+                seller_id=self.seller.id,
+                phone_number='+989114412191',
+                amount=Decimal('15.00')
+            )
+        finally:
+            self.service.remove_lock_observer(observe)
+        self.service.charge_phone_number(
+            seller_id=self.seller.id,
+            phone_number='+989114412191',
+            amount=Decimal('15.00')
+        )
+
+        self.assertEqual(len(locks), 1)
+        self.assertEqual(locks[0][0], self.seller.id)
+        self.assertGreaterEqual(locks[0][1], 0)
+
+
+class BulkChargeServiceTest(TransactionTestCase):
+    """Test charging many phone numbers with one seller lock."""
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('100.00'))
+        self.service = RequestService()
+        self.charges = [
+            {'phone_number': '+989110000001', 'amount': Decimal('40.00')},
+            {'phone_number': '+989110000002', 'amount': Decimal('70.00')},
+            {'phone_number': '+989110000003', 'amount': Decimal('60.00')},
+        ]
+
+    def test_bulk_charge_success(self):
+        """Test running credits are recorded for every charge."""
+        results = self.service.bulk_charge_phone_numbers(
+            self.seller.id, self.charges[:1] + self.charges[2:])
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('0.00'))
+        self.assertEqual(
+            [(t.credit_before_transaction, t.credit_after_transaction)
+             for t in results],
+            [(Decimal('100.00'), Decimal('60.00')),
+             (Decimal('60.00'), Decimal('0.00'))]
+        )
+        for result in results:
+            self.assertEqual(
+                Transaction.objects.get(id=result.id).detail, result.detail)
+
+    def test_bulk_charge_all_or_nothing_failed(self):
+        """Test one failing charge rolls the whole batch back."""
+        with self.assertRaises(Seller.InsufficientCreditError):
+            self.service.bulk_charge_phone_numbers(
+                self.seller.id, self.charges)
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_bulk_charge_best_effort(self):
+        """Test best effort skips only the charges that do not fit."""
+        results = self.service.bulk_charge_phone_numbers(
+            self.seller.id, self.charges, all_or_nothing=False)
+
+        self.assertIsInstance(results[0], Transaction)
+        self.assertIsInstance(results[1], Seller.InsufficientCreditError)
+        self.assertIsInstance(results[2], Transaction)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('0.00'))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+
+class BulkCreditRequestServiceTest(TransactionTestCase):
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('100.00'))
+        self.other = create_seller(email='other@example.com')
+        self.service = RequestService()
+
+    def test_bulk_accept_credit_requests(self):
+        """Test accepting requests of several sellers at once."""
+        requests = [
+            create_credit_request(self.seller, Decimal('10.00')),
+            create_credit_request(self.other, Decimal('5.00')),
+            create_credit_request(self.seller, Decimal('20.00')),
+        ]
+
+        results = self.service.bulk_accept_credit_requests(
+            [request.id for request in requests])
+
+        self.seller.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('130.00'))
+        self.assertEqual(self.other.credit, Decimal('5.00'))
+        self.assertEqual(
+            [(t.credit_before_transaction, t.credit_after_transaction)
+             for t in (results[requests[0].id], results[requests[2].id])],
+            [(Decimal('100.00'), Decimal('110.00')),
+             (Decimal('110.00'), Decimal('130.00'))])
+        self.assertEqual(results[requests[1].id].detail,
+                         f'CreditRequest-{requests[1].id}')
+        self.assertFalse(CreditRequest.objects.filter(
+            status=CreditRequest.Status.PENDING).exists())
+
+    def test_bulk_accept_already_processed(self):
+        """Test processed and unknown requests are reported, not applied."""
+        accepted = create_credit_request(self.seller, Decimal('10.00'))
+        self.service.accept_credit_request(accepted.id)
+        pending = create_credit_request(self.seller, Decimal('1.00'))
+
+        results = self.service.bulk_accept_credit_requests(
+            [accepted.id, pending.id, 999999])
+
+        self.assertIsInstance(results[accepted.id],
+                              CreditRequest.AlreadyProcessedError)
+        self.assertIsInstance(results[999999], CreditRequest.DoesNotExist)
+        self.assertIsInstance(results[pending.id], Transaction)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('111.00'))
+
+    def test_bulk_reject_credit_requests(self):
+        """Test rejecting requests leaves seller credit untouched."""
+        requests = [create_credit_request(self.seller, Decimal('10.00'))
+                    for _ in range(2)]
+        self.service.reject_credit_request(requests[0].id)
+
+        results = self.service.bulk_reject_credit_requests(
+            [request.id for request in requests])
+
+        self.assertIsInstance(results[requests[0].id],
+                              CreditRequest.AlreadyProcessedError)
+        self.assertEqual(results[requests[1].id].status,
+                         CreditRequest.Status.REJECTED)
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('100.00'))
+
+
+@override_settings(CHARGE_MODE='conditional')
+class ConditionalChargeServiceTest(TransactionTestCase):
+    """Test charging with the guarded UPDATE debit path."""
+
+    def setUp(self):
+        self.seller = create_seller(credit=Decimal('100.00'))
+        self.service = RequestService()
+
+    def test_charge_phone_number_success(self):
+        """Test charge debits the credit and records the ledger row."""
+        transaction = self.service.charge_phone_number(
+            seller_id=self.seller.id,
+            phone_number='+989114412191',
+            amount=Decimal('15.00')
+        )
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('85.00'))
+        self.assertEqual(transaction.amount, Decimal('-15.00'))
+        self.assertEqual(transaction.credit_before_transaction,
+                         Decimal('100.00'))
+        self.assertEqual(transaction.credit_after_transaction,
+                         Decimal('85.00'))
+        self.assertEqual(transaction.type, Transaction.Type.WITHDRAW)
+
+    def test_charge_phone_number_insufficient_credit(self):
+        """Test an unaffected row is reported as insufficient credit."""
+        with self.assertRaises(Seller.InsufficientCreditError):
+            self.service.charge_phone_number(
+                seller_id=self.seller.id,
+                phone_number='+989114412191',
+                amount=Decimal('100.01')
+            )
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_charge_phone_number_whole_credit(self):
+        """Test the whole credit can be spent down to zero."""
+        self.service.charge_phone_number(
+            seller_id=self.seller.id,
+            phone_number='+989114412191',
+            amount=Decimal('100.00')
+        )
+
+        self.seller.refresh_from_db()
+        self.assertEqual(self.seller.credit, Decimal('0.00'))
+
+    def test_charge_unknown_seller(self):
+        """Test charging a missing seller raises DoesNotExist."""
+        with self.assertRaises(Seller.DoesNotExist):
+            self.service.charge_phone_number(
+                seller_id=self.seller.id + 1,
+                phone_number='+989114412191',
+                amount=Decimal('1.00')
+            )
+
 
 class ServiceParallelTest(TransactionTestCase):
     """Test case for parallel execution of atomic funcions on service."""
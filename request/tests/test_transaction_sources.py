@@ -0,0 +1,85 @@
+"""
+Tests for the links between transactions and their requests.
+"""
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import (
+    ChargeRequest,
+    CreditRequest,
+    Seller,
+    Transaction,
+)
+from request.services import RequestService
+
+CREDIT_REQUEST_LIST_URL = reverse('request:creditrequest-list')
+CHARGE_PHONE_NUMBER_URL = reverse('request:charge-phone-number')
+
+
+def create_seller(email='email@test.com', credit=Decimal('100.00')):
+    return Seller.objects.create_user(email=email, password='test1234',
+                                      credit=credit)
+
+
+class TransactionSourceTests(APITestCase):
+    """Test transactions point to the request they came from."""
+
+    def setUp(self):
+        self.seller = create_seller()
+        self.client.force_authenticate(user=self.seller)
+        self.service = RequestService()
+
+    def test_charge_links_charge_request(self):
+        """Test a charge transaction links its charge request."""
+        res = self.client.post(CHARGE_PHONE_NUMBER_URL, {
+            'phone_number': '09123456789', 'amount': '10.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        request = ChargeRequest.objects.get()
+        self.assertEqual(res.data['charge_request'], request.id)
+        self.assertIsNone(res.data['credit_request'])
+
+    def test_credit_request_lists_its_transaction(self):
+        """Test accepted credit requests show their deposit transaction."""
+        accepted = self.service.create_credit_request(
+            self.seller.id, Decimal('5'))
+        transaction_obj = self.service.accept_credit_request(accepted.id)
+        self.service.create_credit_request(self.seller.id, Decimal('5'))
+
+        res = self.client.get(CREDIT_REQUEST_LIST_URL)
+
+        self.assertEqual([row['transaction'] for row in res.data['results']],
+                         [None, transaction_obj.id])
+
+    def test_backfill_from_detail(self):
+        """Test the backfill links old rows and skips deleted requests."""
+        credit_request = CreditRequest.objects.create(
+            seller=self.seller, amount=Decimal('5'))
+        charge_request = ChargeRequest.objects.create(
+            seller=self.seller, phone_number='0912', amount=Decimal('1'))
+        details = [f'CreditRequest-{credit_request.id}',
+                   f'ChargeRequest-{charge_request.id}',
+                   'ChargeRequest-999999',
+                   f'CreditBucketRebalance-{self.seller.id}']
+        transactions = [Transaction.objects.create(
+            seller=self.seller,
+            amount=Decimal('1'),
+            credit_before_transaction=Decimal('0'),
+            credit_after_transaction=Decimal('1'),
+            type=Transaction.Type.DEPOSIT,
+            detail=detail
+        ) for detail in details]
+
+        call_command('backfill_transaction_sources', '--chunk-size', '2',
+                     stdout=StringIO())
+
+        links = [Transaction.objects.values_list(
+            'credit_request', 'charge_request').get(id=t.id)
+            for t in transactions]
+        self.assertEqual(links, [(credit_request.id, None),
+                                 (None, charge_request.id),
+                                 (None, None),
+                                 (None, None)])
@@ -19,7 +19,25 @@ urlpatterns = [
     path('reject-credit-request',
          views.RejectCreditRequestViewSet.as_view(),
          name='reject-credit-request'),
+    path('accept-credit-requests/bulk',
+         views.BulkAcceptCreditRequestViewSet.as_view(),
+         name='bulk-accept-credit-requests'),
+    path('reject-credit-requests/bulk',
+         views.BulkRejectCreditRequestViewSet.as_view(),
+         name='bulk-reject-credit-requests'),
     path('charge-phone-number',
          views.ChargePhoneNumberViewSet.as_view(),
          name='charge-phone-number'),
+    path('charge-phone-number/async',
+         views.AsyncChargePhoneNumberViewSet.as_view(),
+         name='async-charge-phone-number'),
+    path('hot-sellers',
+         views.HotSellersViewSet.as_view(),
+         name='hot-sellers'),
+    path('charge/<int:pk>',
+         views.ChargeJobViewSet.as_view(),
+         name='charge-job'),
+    path('charge-phone-numbers/bulk',
+         views.BulkChargePhoneNumberViewSet.as_view(),
+         name='bulk-charge-phone-numbers'),
 ]
@@ -1,21 +1,46 @@
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
 from rest_framework import status, generics, mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.fields import DateTimeField, FloatField, IntegerField
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.authentication import TokenAuthentication
-from request import serializers
+from request import export, serializers
+from request.archive import find_archived
+from request.buckets import CreditBucketService
+from request.changes import get_changes
+from request.conditional import ConditionalGetMixin
+from request.contention import HotSellerTracker
+from request.pagination import (
+    CreditRequestPagination,
+    TransactionPagination
+)
+from request.idempotency import idempotent
+from request.ledger import LedgerPrunedError, LedgerService
+from request.leasing import PendingCharge
+from request.queue import ChargeQueue
+from request.read_serializers import FastReadMixin
+from request.renderers import CSVRenderer, NDJSONRenderer
 from request.services import RequestService
+from seller.authentication import CachedTokenAuthentication
 from core.models import (
+    ArchivedMonth,
+    ChargeJob,
     CreditRequest,
     Seller,
     Transaction
 )
+from core.routers import ReplicaReadMixin
 
 
 class CreateCreditRequestViewSet(generics.GenericAPIView):
     serializer_class = serializers.CreateCreditRequestSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
+    @idempotent
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         service = RequestService()
@@ -33,7 +58,7 @@ class CreateCreditRequestViewSet(generics.GenericAPIView):
 class AcceptCreditRequestViewSet(generics.GenericAPIView):
     serializer_class = serializers.AcceptCreditRequestSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -55,7 +80,7 @@ class AcceptCreditRequestViewSet(generics.GenericAPIView):
 class RejectCreditRequestViewSet(generics.GenericAPIView):
     serializer_class = serializers.RejectCreditRequestSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -74,40 +99,209 @@ class RejectCreditRequestViewSet(generics.GenericAPIView):
             return Response(output_serializer.data, status=status.HTTP_200_OK)
 
 
-class CreditRequestViewSet(mixins.RetrieveModelMixin,
+def bulk_credit_request_results(request_ids, results, serializer_class,
+                                done_status, done_key):
+    """return the per request outcome of a bulk accept or reject."""
+    response = []
+    for request_id in request_ids:
+        result = results[request_id]
+        item = {'request_id': request_id}
+        if isinstance(result, CreditRequest.AlreadyProcessedError):
+            item['status'] = 'already_processed'
+        elif isinstance(result, CreditRequest.LockedError):
+            item['status'] = 'locked'
+        elif isinstance(result, CreditRequest.DoesNotExist):
+            item['status'] = 'not_found'
+        else:
+            item['status'] = done_status
+            item[done_key] = serializer_class(result).data
+        response.append(item)
+    return response
+
+
+class BulkAcceptCreditRequestViewSet(generics.GenericAPIView):
+    serializer_class = serializers.BulkCreditRequestSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        service = RequestService()
+        if serializer.is_valid(raise_exception=True):
+            request_ids = list(dict.fromkeys(
+                serializer.validated_data['request_ids']))
+            results = service.bulk_accept_credit_requests(request_ids)
+            response = bulk_credit_request_results(
+                request_ids, results,
+                serializers.AcceptCreditRequestSerializer,
+                'accepted', 'transaction')
+            return Response(data={'results': response}, status=status.HTTP_200_OK)
+
+
+class BulkRejectCreditRequestViewSet(generics.GenericAPIView):
+    serializer_class = serializers.BulkCreditRequestSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        service = RequestService()
+        if serializer.is_valid(raise_exception=True):
+            request_ids = list(dict.fromkeys(
+                serializer.validated_data['request_ids']))
+            results = service.bulk_reject_credit_requests(request_ids)
+            prefetch_related_objects(
+                [result for result in results.values()
+                 if isinstance(result, CreditRequest)], 'seller')
+            response = bulk_credit_request_results(
+                request_ids, results,
+                serializers.RejectCreditRequestSerializer,
+                'rejected', 'credit_request')
+            return Response(data={'results': response}, status=status.HTTP_200_OK)
+
+
+class CreditRequestViewSet(ReplicaReadMixin,
+                           ConditionalGetMixin,
+                           FastReadMixin,
+                           mixins.RetrieveModelMixin,
                            mixins.ListModelMixin,
                            viewsets.GenericViewSet):
     serializer_class = serializers.CreditRequestSerializer
-    queryset = CreditRequest.objects.all()
+    pagination_class = CreditRequestPagination
+    queryset = CreditRequest.objects.with_transaction()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return super().get_queryset()
-        return CreditRequest.objects.filter(seller=self.request.user)
+        return super().get_queryset().filter(seller=self.request.user)
 
 
-class TransactionViewSet(mixins.RetrieveModelMixin,
+class TransactionViewSet(ReplicaReadMixin,
+                         ConditionalGetMixin,
+                         FastReadMixin,
+                         mixins.RetrieveModelMixin,
                          mixins.ListModelMixin,
                          viewsets.GenericViewSet):
     serializer_class = serializers.TransactionSerializer
+    pagination_class = TransactionPagination
     queryset = Transaction.objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return super().get_queryset()
         return Transaction.objects.filter(seller=self.request.user)
 
+    @action(detail=False, methods=['get'], url_path='export',
+            renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """Stream the ledger as NDJSON or CSV, optionally gzipped."""
+        queryset = self.get_queryset()
+        bound = DateTimeField()
+        if 'from' in request.query_params:
+            queryset = queryset.filter(transaction_time__gte=bound.run_validation(
+                request.query_params['from']))
+        if 'to' in request.query_params:
+            queryset = queryset.filter(transaction_time__lt=bound.run_validation(
+                request.query_params['to']))
+
+        rows = export.iter_rows(queryset, settings.LEDGER_EXPORT_CHUNK_SIZE)
+        if request.accepted_renderer.format == 'csv':
+            lines = export.iter_csv(rows)
+        else:
+            lines = export.iter_ndjson(rows)
+        chunks = export.buffered(lines)
+
+        gzip = export.accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        if gzip:
+            chunks = export.gzipped(chunks)
+
+        response = StreamingHttpResponse(
+            chunks, content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = \
+            f'attachment; filename="ledger.{request.accepted_renderer.format}"'
+        response['Vary'] = 'Accept-Encoding'
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+    @action(detail=False, methods=['get'],
+            url_path=r'archive/(?P<transaction_id>[0-9]+)')
+    def archive(self, request, transaction_id):
+        """Return a transaction from the ledger archive."""
+        row = find_archived(ArchivedMonth.Table.TRANSACTION,
+                            int(transaction_id))
+        if row is None or (not request.user.is_staff
+                           and row['seller_id'] != request.user.id):
+            raise NotFound
+        return Response(row, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        """
+        Return the seller's transactions after the `since` cursor.
+
+        `next` is the cursor to ask for the following ones with. Waiting
+        for new transactions is served by the async view of the feed, a
+        waiting request would hold a worker here.
+        """
+        since = IntegerField(min_value=0).run_validation(
+            request.query_params.get('since', 0))
+        wait = FloatField(min_value=0).run_validation(
+            request.query_params.get('wait', 0))
+        if wait:
+            response = {
+                'error': 'Waiting is not supported.',
+                'message': 'Wait for changes at /api/async/request/transaction/changes/.'
+            }
+            return Response(data=response, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_values_serializer()
+        seller_id = request.user.id
+        rows = get_changes(seller_id, since, serializer.columns,
+                           CreditBucketService().is_sharded(seller_id))
+        return Response({
+            'next': rows[-1]['id'] if rows else since,
+            'results': serializer.many(rows),
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='balance',
+            serializer_class=serializers.BalanceSerializer)
+    def balance(self, request):
+        """Return the credit of a seller at a point in time."""
+        serializer = self.get_serializer(data=request.query_params)
+        if serializer.is_valid(raise_exception=True):
+            seller_id = request.user.id
+            if request.user.is_staff:
+                seller_id = serializer.validated_data.get('seller', seller_id)
+            at = serializer.validated_data['at']
+            try:
+                credit = LedgerService().get_credit_at(seller_id, at)
+            except Seller.DoesNotExist:
+                raise NotFound
+            except LedgerPrunedError:
+                response = {
+                    'error': 'Ledger pruned.',
+                    'message': 'The transactions of the requested time were archived and pruned.'
+                }
+                return Response(data=response, status=status.HTTP_409_CONFLICT)
+            return Response(
+                self.get_serializer(
+                    {'seller': seller_id, 'at': at, 'credit': credit}).data,
+                status=status.HTTP_200_OK
+            )
+
 
 class ChargePhoneNumberViewSet(generics.GenericAPIView):
     serializer_class = serializers.ChargePhoneNumberSerializer
     permission_classes = [IsAuthenticated]
     queryset = Transaction.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
+    @idempotent
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         service = RequestService()
@@ -118,6 +312,11 @@ class ChargePhoneNumberViewSet(generics.GenericAPIView):
                 transaction = service.charge_phone_number(
                     request.user.id, phone_number, amount
                 )
+                if isinstance(transaction, PendingCharge):
+                    output_seralizer = serializers.PendingChargeSerializer(
+                        transaction)
+                    return Response(data=output_seralizer.data,
+                                    status=status.HTTP_202_ACCEPTED)
                 output_seralizer = self.serializer_class(transaction)
                 return Response(data=output_seralizer.data, status=status.HTTP_200_OK)
 
@@ -127,3 +326,87 @@ class ChargePhoneNumberViewSet(generics.GenericAPIView):
                     'message': 'The requested process requires more credit than available.'
                 }
                 return Response(data=response, status=status.HTTP_402_PAYMENT_REQUIRED)
+
+
+class BulkChargePhoneNumberViewSet(generics.GenericAPIView):
+    serializer_class = serializers.BulkChargePhoneNumberSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        service = RequestService()
+        if serializer.is_valid(raise_exception=True):
+            charges = serializer.validated_data['charges']
+            try:
+                results = service.bulk_charge_phone_numbers(
+                    request.user.id,
+                    charges,
+                    serializer.validated_data['all_or_nothing']
+                )
+            except Seller.InsufficientCreditError:
+                response = {
+                    'error': 'Insufficient credit.',
+                    'message': 'The requested process requires more credit than available.'
+                }
+                return Response(data=response, status=status.HTTP_402_PAYMENT_REQUIRED)
+
+            response = []
+            for charge, result in zip(charges, results):
+                item = {
+                    'phone_number': charge['phone_number'],
+                    'amount': str(charge['amount']),
+                }
+                if isinstance(result, Seller.InsufficientCreditError):
+                    item['status'] = 'insufficient_credit'
+                else:
+                    item['status'] = 'charged'
+                    item['transaction'] = serializers.ChargePhoneNumberSerializer(
+                        result).data
+                response.append(item)
+            return Response(data={'results': response}, status=status.HTTP_200_OK)
+
+
+class AsyncChargePhoneNumberViewSet(generics.GenericAPIView):
+    serializer_class = serializers.ChargeJobSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        queue = ChargeQueue()
+        if serializer.is_valid(raise_exception=True):
+            job = queue.enqueue(
+                request.user.id,
+                serializer.validated_data['phone_number'],
+                serializer.validated_data['amount']
+            )
+            output_serializer = self.serializer_class(job)
+            return Response(data=output_serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class ChargeJobViewSet(generics.RetrieveAPIView):
+    serializer_class = serializers.ChargeJobSerializer
+    queryset = ChargeJob.objects.select_related('transaction')
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return super().get_queryset()
+        return super().get_queryset().filter(seller=self.request.user)
+
+
+class HotSellersViewSet(generics.GenericAPIView):
+    """List the sellers waiting most on their row lock."""
+    serializer_class = serializers.HotSellerSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def get(self, request):
+        limit = IntegerField(
+            min_value=1, max_value=settings.HOT_SELLERS['CAPACITY']
+        ).run_validation(request.query_params.get('limit', 20))
+        serializer = self.serializer_class(
+            HotSellerTracker().top(limit), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SellerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'seller'
+
+    def ready(self):
+        from seller import signals  # noqa: F401
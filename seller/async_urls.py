@@ -0,0 +1,13 @@
+"""
+URL mapping for the async seller API.
+"""
+from django.urls import path
+from seller import async_views
+
+app_name = 'async-seller'
+
+urlpatterns = [
+    path('me/', async_views.RetrieveSellerView.as_view(), name='me'),
+    path('me/events/', async_views.BalanceEventsView.as_view(),
+         name='balance-events'),
+]
@@ -0,0 +1,85 @@
+"""
+Async views for the seller API.
+"""
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from core.models import Seller, Transaction
+from request.async_views import AsyncAPIView, run_in_pool
+from request.buckets import CreditBucketService
+from request.events import EVENT_COLUMNS, BalanceBroker
+from request.leasing import get_outstanding_credit, is_leased
+from request.serializers import BalanceEventSerializer
+from seller.serializers import SellerDetailSerializer
+
+
+class RetrieveSellerView(AsyncAPIView):
+    """Get authenticated seller."""
+    serializer_class = SellerDetailSerializer
+
+    async def get(self, request):
+        seller = await Seller.objects.aget(id=request.user.id)
+        if seller.credit_bucket_count:
+            seller.credit = await run_in_pool(
+                CreditBucketService().get_credit, seller.id)
+        if is_leased(seller.id):
+            seller.credit += await run_in_pool(
+                get_outstanding_credit, seller.id)
+        return self.serializer_class(seller).data, status.HTTP_200_OK
+
+
+class BalanceEventsView(AsyncAPIView):
+    """
+    Stream the balance of the authenticated seller as Server-Sent Events.
+
+    The stream starts with the balance after the seller's latest
+    transaction, then sends one `balance` event per deposit or withdraw
+    and a comment every HEARTBEAT_SECONDS. A client too slow to keep up
+    gets a `dropped` event and should reconnect. Sellers with credit
+    buckets get no balance events, their transactions hold the balance of
+    a single bucket.
+    """
+    http_method_names = ['get']
+
+    async def get(self, request):
+        # an idle stream holds no database connection.
+        await sync_to_async(connections.close_all)()
+        response = StreamingHttpResponse(self.stream(request.user.id),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def latest_event(self, seller_id):
+        row = Transaction.objects \
+            .filter(seller_id=seller_id, credit_bucket__isnull=True) \
+            .exclude(type=Transaction.Type.TRANSFER) \
+            .order_by('-id').values(*EVENT_COLUMNS).first()
+        return None if row is None else BalanceEventSerializer(row).data
+
+    async def stream(self, seller_id):
+        broker = BalanceBroker()
+        subscriber = broker.subscribe(seller_id)
+        heartbeat = settings.BALANCE_EVENTS['HEARTBEAT_SECONDS']
+        try:
+            event = await run_in_pool(self.latest_event, seller_id)
+            if event is not None:
+                subscriber.deliver(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(),
+                                                   heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+                    continue
+                if event is None:
+                    yield 'event: dropped\ndata: {}\n\n'
+                    return
+                yield (f'id: {event["transaction_id"]}\nevent: balance\n'
+                       f'data: {json.dumps(event)}\n\n')
+        finally:
+            broker.unsubscribe(subscriber)
@@ -0,0 +1,113 @@
+"""
+Authentication classes for the seller API.
+"""
+import copy
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header
+)
+from rest_framework.authtoken.models import Token
+from core.cache import LRUCache
+
+_tokens = LRUCache(settings.TOKEN_AUTH_CACHE['MAX_SIZE'],
+                   settings.TOKEN_AUTH_CACHE['TTL'])
+
+
+def _shared_cache():
+    """return the shared cache backend, if one is configured."""
+    alias = settings.TOKEN_AUTH_CACHE['BACKEND']
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    return f'auth-token:{key}'
+
+
+def invalidate_token(key):
+    """Forget the cached identity of a token."""
+    _tokens.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_key(key))
+
+
+def invalidate_seller(seller_id):
+    """Forget the cached identity of every token of a seller."""
+    for key in Token.objects.filter(user_id=seller_id) \
+            .values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches token -> seller lookups.
+
+    Identities are kept in a per-process LRU cache and, when
+    TOKEN_AUTH_CACHE['BACKEND'] names a cache, in that shared cache too.
+    They are invalidated when the token is deleted or the seller's
+    password, active or staff flags are saved. Other processes see such
+    changes once their local entry expires after TOKEN_AUTH_CACHE['TTL']
+    seconds.
+
+    The cached seller is a copy, only its identity and flags are fresh,
+    views that need the current credit must read it from the database.
+    """
+
+    def authenticate_credentials(self, key):
+        identity = _tokens.get(key)
+        if identity is None:
+            shared = _shared_cache()
+            if shared is not None:
+                identity = shared.get(_shared_key(key))
+            if identity is None:
+                identity = super().authenticate_credentials(key)
+                if shared is not None:
+                    shared.set(_shared_key(key), identity,
+                               settings.TOKEN_AUTH_CACHE['SHARED_TTL'])
+            _tokens.set(key, identity)
+
+        user, token = identity
+        return (copy.copy(user), token)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate for async views, with the async ORM on cache misses.
+
+        Returns (seller, token) or None when no token is sent.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+
+        identity = _tokens.get(key)
+        if identity is None:
+            shared = _shared_cache()
+            if shared is not None:
+                identity = await shared.aget(_shared_key(key))
+            if identity is None:
+                try:
+                    token = await Token.objects.select_related('user') \
+                        .aget(key=key)
+                except Token.DoesNotExist:
+                    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+                if not token.user.is_active:
+                    raise exceptions.AuthenticationFailed(
+                        _('User inactive or deleted.'))
+                identity = (token.user, token)
+                if shared is not None:
+                    await shared.aset(_shared_key(key), identity,
+                                      settings.TOKEN_AUTH_CACHE['SHARED_TTL'])
+            _tokens.set(key, identity)
+
+        user, token = identity
+        return (copy.copy(user), token)
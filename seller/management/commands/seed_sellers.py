@@ -0,0 +1,65 @@
+"""
+Django command to seed sellers and auth tokens for load tests.
+"""
+import json
+from decimal import Decimal
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+from core.models import Seller
+
+
+class Command(BaseCommand):
+    """Django command to seed load test sellers."""
+    help = ('Create sellers with credit and tokens, plus one staff seller, '
+            'and write their tokens to a JSON file for the locustfile.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sellers', type=int, default=1000)
+        parser.add_argument('--credit', type=Decimal,
+                            default=Decimal('1000000.00'))
+        parser.add_argument('--prefix', default='loadtest')
+        parser.add_argument('--output', type=Path,
+                            default=Path('loadtest/sellers.json'))
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        emails = [f'{prefix}-{i}@example.com'
+                  for i in range(options['sellers'])]
+        admin_email = f'{prefix}-admin@example.com'
+
+        existing = set(Seller.objects.filter(
+            email__in=emails + [admin_email]).values_list('email', flat=True))
+        sellers = []
+        for email in emails + [admin_email]:
+            if email in existing:
+                continue
+            seller = Seller(email=email, credit=options['credit'],
+                            is_staff=email == admin_email)
+            # tokens are the only credentials of load test sellers.
+            seller.set_unusable_password()
+            sellers.append(seller)
+        Seller.objects.bulk_create(sellers, batch_size=1000)
+        Seller.objects.filter(email__in=emails) \
+            .update(credit=options['credit'])
+
+        ids = dict(Seller.objects.filter(email__in=emails + [admin_email])
+                   .values_list('email', 'id'))
+        tokens = dict(Token.objects.filter(user_id__in=ids.values())
+                      .values_list('user_id', 'key'))
+        Token.objects.bulk_create([
+            Token(user_id=seller_id, key=Token.generate_key())
+            for seller_id in ids.values() if seller_id not in tokens
+        ], batch_size=1000)
+        tokens = dict(Token.objects.filter(user_id__in=ids.values())
+                      .values_list('user_id', 'key'))
+
+        options['output'].parent.mkdir(parents=True, exist_ok=True)
+        options['output'].write_text(json.dumps({
+            'admin': {'id': ids[admin_email],
+                      'token': tokens[ids[admin_email]]},
+            'sellers': [{'id': ids[email], 'token': tokens[ids[email]]}
+                        for email in emails],
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(emails)} sellers into {options["output"]}.'))
@@ -29,7 +29,7 @@ class SellerDetailSerializer(serializers.ModelSerializer):
     """Serializer for show detail of seller."""
     class Meta:
         model = get_user_model()
-        exclude = ['user_permissions', 'groups', 'password']
+        exclude = ['user_permissions', 'groups', 'password', 'version']
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -0,0 +1,35 @@
+"""
+Signal handlers keeping the authentication cache and seller versions
+coherent.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from core.models import Seller
+from seller.authentication import invalidate_seller, invalidate_token
+
+IDENTITY_FIELDS = {'password', 'is_active', 'is_staff', 'is_superuser'}
+# credit changes come with a transaction, which changes the ETags anyway.
+UNVERSIONED_FIELDS = {'credit', 'version'}
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=Seller)
+def forget_changed_seller(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is None or IDENTITY_FIELDS & set(update_fields):
+        invalidate_seller(instance.id)
+
+
+@receiver(post_save, sender=Seller)
+def bump_changed_seller_version(sender, instance, created, update_fields,
+                                **kwargs):
+    if created:
+        return
+    if update_fields is None or set(update_fields) - UNVERSIONED_FIELDS:
+        Seller.objects.bump_version(instance.id)
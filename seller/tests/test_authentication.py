@@ -0,0 +1,87 @@
+"""
+Tests for cached token authentication.
+"""
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from seller import authentication
+from core.models import Seller
+
+ME_URL = reverse('seller:me')
+CHARGE_PHONE_NUMBER_URL = reverse('request:charge-phone-number')
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """Test token lookups are cached and invalidated."""
+
+    def setUp(self):
+        authentication._tokens.clear()
+        self.seller = Seller.objects.create_user(
+            email='email@test.com', password='test1234',
+            credit=Decimal('100'))
+        self.token = Token.objects.create(user=self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def charge_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(CHARGE_PHONE_NUMBER_URL, {
+                'phone_number': '+989123456789',
+                'amount': '1.00',
+            })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_cached_token_saves_a_query_per_charge(self):
+        """Test only the first charge looks the token up."""
+        first = self.charge_queries()
+        second = self.charge_queries()
+
+        self.assertEqual(first - second, 1)
+
+    def test_me_reads_current_credit(self):
+        """Test /me is not served from the cached seller."""
+        self.client.get(ME_URL)
+        Seller.objects.filter(id=self.seller.id).update(credit=Decimal('7'))
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['credit'], '7.00')
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops authenticating at once."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_seller_rejected(self):
+        """Test deactivating a seller invalidates its cached token."""
+        self.client.get(ME_URL)
+        self.seller.is_active = False
+        self.seller.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """Test changing the password drops the cached identity."""
+        self.client.get(ME_URL)
+        self.seller.set_password('new-pass-123')
+        self.seller.save(update_fields=['password'])
+
+        self.assertIsNone(authentication._tokens.get(self.token.key))
+
+    def test_credit_update_keeps_cache(self):
+        """Test saving the credit does not invalidate the identity."""
+        self.client.get(ME_URL)
+        self.seller.credit = Decimal('1')
+        self.seller.save(update_fields=['credit'])
+
+        self.assertIsNotNone(authentication._tokens.get(self.token.key))
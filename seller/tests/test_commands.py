@@ -0,0 +1,55 @@
+"""
+Tests for the seller management commands.
+"""
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from core.models import Seller
+
+
+class SeedSellersTests(TestCase):
+    """Test the seed_sellers command."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = Path(self.directory.name) / 'sellers.json'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def seed(self, **options):
+        call_command('seed_sellers', output=self.output,
+                     stdout=StringIO(), **options)
+        return json.loads(self.output.read_text())
+
+    def test_seed_sellers(self):
+        """Test seeding sellers with tokens and a staff seller."""
+        seed = self.seed(sellers=5, credit=Decimal('50.00'))
+
+        self.assertEqual(len(seed['sellers']), 5)
+        for entry in seed['sellers']:
+            seller = Seller.objects.get(id=entry['id'])
+            self.assertEqual(seller.credit, Decimal('50.00'))
+            self.assertFalse(seller.is_staff)
+            self.assertFalse(seller.has_usable_password())
+            self.assertEqual(Token.objects.get(user=seller).key,
+                             entry['token'])
+        self.assertTrue(Seller.objects.get(id=seed['admin']['id']).is_staff)
+
+    def test_seed_sellers_again_resets_credit(self):
+        """Test seeding again keeps sellers and tokens and resets credit."""
+        first = self.seed(sellers=3)
+        Seller.objects.filter(id=first['sellers'][0]['id']).update(credit=0)
+
+        second = self.seed(sellers=3)
+
+        self.assertEqual(first, second)
+        self.assertEqual(Seller.objects.count(), 4)
+        self.assertEqual(
+            Seller.objects.get(id=first['sellers'][0]['id']).credit,
+            Decimal('1000000.00'))
@@ -2,16 +2,20 @@
 Views for the seller API.
 """
 from rest_framework import generics, mixins, viewsets
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from seller.authentication import CachedTokenAuthentication
 from seller.serializers import (
     SellerSerializer,
     SellerDetailSerializer,
     AuthTokenSerializer,
 )
 from core.models import Seller
+from core.routers import ReplicaReadMixin
+from request.buckets import CreditBucketService
+from request.conditional import ConditionalGetMixin
+from request.leasing import get_outstanding_credit, is_leased
 
 
 class CreateSellerView(generics.CreateAPIView):
@@ -25,22 +29,28 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class RetrieveSellerView(generics.RetrieveAPIView):
+class RetrieveSellerView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Get authenticated seller."""
     serializer_class = SellerDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
+        seller = Seller.objects.get(id=self.request.user.id)
+        if seller.credit_bucket_count:
+            seller.credit = CreditBucketService().get_credit(seller.id)
+        if is_leased(seller.id):
+            seller.credit += get_outstanding_credit(seller.id)
+        return seller
 
 
-class ListSellerViewSet(mixins.RetrieveModelMixin,
+class ListSellerViewSet(ReplicaReadMixin,
+                        mixins.RetrieveModelMixin,
                         mixins.ListModelMixin,
                         viewsets.GenericViewSet):
     """Retrieve one item or List of sellers."""
     serializer_class = SellerDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsAdminUser]
     queryset = Seller.objects.all()